@@ -1,19 +1,20 @@
-from passlib.context import CryptContext
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from . import models
-from .dependencies import get_db
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+from .dependencies import get_db, get_async_db
+from .principal_cache import Principal, principal_cache
+from .tokens import InvalidToken, create_token, decode_token
+from .crud.base import (
+    get_password_hash,
+    password_pool,
+    verify_password,
+    verify_password_async,
+)
 
 
 def authenticate_user(db: Session, email: str, password: str):
@@ -22,17 +23,147 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     if not verify_password(password, user.hashed_password):
         return False
+    if not user.is_active:
+        # Deactivated users cannot obtain new tokens
+        return False
     return user
 
 
-def get_current_user_by_email(db: Session, email: str):
-    user = db.query(models.User).filter(models.User.email == email).first()
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    user = result.scalars().first()
     if not user:
+        return False
+    if not await verify_password_async(password, user.hashed_password):
+        return False
+    if not user.is_active:
+        return False
+    return user
+
+
+def _principal_query():
+    # Resolve the user and their doctor/assistant profile ids in one statement
+    return (
+        select(
+            models.User.id,
+            models.User.email,
+            models.User.full_name,
+            models.User.role,
+            models.User.is_active,
+            models.Doctor.id,
+            models.Assistant.id,
+        )
+        .outerjoin(models.Doctor, models.Doctor.user_id == models.User.id)
+        .outerjoin(models.Assistant, models.Assistant.user_id == models.User.id)
+    )
+
+
+def _principal_from_row(row):
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
         )
-    return user
+    principal = Principal(*row)
+    principal_cache.set(principal)
+    return principal
+
+
+def get_current_user_by_email(db: Session, email: str):
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    row = db.execute(_principal_query().where(models.User.email == email)).first()
+    return _principal_from_row(row)
+
+
+async def get_current_user_by_email_async(db: AsyncSession, email: str):
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(_principal_query().where(models.User.email == email))
+    return _principal_from_row(result.first())
+
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def create_access_token(principal: Principal):
+    profile_id = principal.doctor_id or principal.assistant_id
+    return create_token(principal.id, principal.role, profile_id)
+
+
+def get_token_principal(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> Optional[Principal]:
+    """Authenticate from a bearer token without touching the database."""
+    if credentials is None:
+        return None
+    try:
+        claims = decode_token(credentials.credentials)
+    except InvalidToken as exc:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(exc),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    role = claims["role"]
+    # Tokens do not carry the email or name
+    return Principal(
+        id=claims["sub"],
+        email=None,
+        full_name=None,
+        role=role,
+        is_active=True,
+        doctor_id=claims["pid"] if role == "doctor" else None,
+        assistant_id=claims["pid"] if role == "assistant" else None,
+    )
+
+
+def get_optional_principal(
+    current_user_email: Optional[str] = None,
+    token_principal: Optional[Principal] = Depends(get_token_principal),
+    db: Session = Depends(get_db),
+) -> Optional[Principal]:
+    """Resolve the caller, if one was given, with their profile ids."""
+    if token_principal is not None:
+        return token_principal
+    if not current_user_email:
+        return None
+    return get_current_user_by_email(db, current_user_email)
+
+
+def get_principal(
+    principal: Optional[Principal] = Depends(get_optional_principal),
+) -> Principal:
+    """Resolve the caller, rejecting anonymous requests."""
+    if principal is None:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    return principal
+
+
+async def get_optional_principal_async(
+    current_user_email: Optional[str] = None,
+    token_principal: Optional[Principal] = Depends(get_token_principal),
+    db: AsyncSession = Depends(get_async_db),
+) -> Optional[Principal]:
+    """Resolve the caller for async routes, if one was given."""
+    if token_principal is not None:
+        return token_principal
+    if not current_user_email:
+        return None
+    return await get_current_user_by_email_async(db, current_user_email)
+
+
+async def get_principal_async(
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+) -> Principal:
+    """Resolve the caller for async routes, rejecting anonymous requests."""
+    if principal is None:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    return principal
 
 
 def check_general_manager(user: models.User):
@@ -0,0 +1,143 @@
+import json
+import os
+from functools import lru_cache
+from typing import List
+
+from fastapi import HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "1000"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(4 * 1024 * 1024)))
+NDJSON_CONTENT_TYPES = (
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+)
+
+# Request body documentation for endpoints that read rows with read_bulk_rows
+BULK_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {}}},
+            "application/x-ndjson": {"schema": {"type": "string"}},
+        },
+    }
+}
+
+
+def _check_size(count):
+    if count > BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may contain at most {BULK_MAX_ROWS} rows",
+        )
+
+
+def _body_too_large():
+    return HTTPException(
+        status_code=413,
+        detail=f"A batch may be at most {BULK_MAX_BYTES} bytes",
+    )
+
+
+async def _stream_body(request: Request):
+    """Yield the body's chunks, stopping as soon as it exceeds BULK_MAX_BYTES.
+
+    A declared Content-Length is checked before anything is read; chunked
+    bodies are counted as they arrive.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > BULK_MAX_BYTES:
+        raise _body_too_large()
+
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > BULK_MAX_BYTES:
+            raise _body_too_large()
+        yield chunk
+
+
+async def read_bulk_rows(request: Request):
+    """Read a JSON array or an NDJSON stream of rows from the request body.
+
+    Returns the rows and a dict of per-row errors; NDJSON lines that are not
+    valid JSON are kept as None placeholders so row indexes stay aligned.
+    Bodies over BULK_MAX_BYTES are rejected with 413 without being read in
+    full.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in NDJSON_CONTENT_TYPES:
+        body = b"".join([chunk async for chunk in _stream_body(request)])
+        try:
+            rows = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array")
+        _check_size(len(rows))
+        return rows, {}
+
+    rows, errors = [], {}
+
+    def add_line(line):
+        if not line.strip():
+            return
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            errors[len(rows)] = [
+                {"loc": [], "msg": "Invalid JSON", "type": "json_invalid"}
+            ]
+            rows.append(None)
+        _check_size(len(rows))
+
+    buffer = b""
+    async for chunk in _stream_body(request):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            add_line(line)
+    add_line(buffer)
+    return rows, errors
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema):
+    return TypeAdapter(List[schema])
+
+
+def validate_bulk_rows(schema, rows, errors=None):
+    """Validate a whole batch in one pydantic pass.
+
+    Returns a list of (index, model) pairs for the valid rows and a dict of
+    errors keyed by row index.
+    """
+    adapter = _list_adapter(schema)
+    errors = dict(errors or {})
+    try:
+        return list(enumerate(adapter.validate_python(rows))), errors
+    except ValidationError as exc:
+        for error in exc.errors(include_url=False, include_context=False):
+            index, *loc = error["loc"]
+            errors.setdefault(index, [])
+            if rows[index] is not None:
+                errors[index].append({**error, "loc": loc})
+
+    # The remaining rows are known to be valid
+    valid_indexes = [i for i in range(len(rows)) if i not in errors]
+    models = adapter.validate_python([rows[i] for i in valid_indexes])
+    return list(zip(valid_indexes, models)), errors
+
+
+def bulk_errors(errors):
+    return [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+
+
+def bulk_result(row_count, valid, ids, errors):
+    """Line the assigned ids up with the input rows."""
+    row_ids = [None] * row_count
+    for (index, _), row_id in zip(valid, ids):
+        row_ids[index] = row_id
+    return {"created": len(ids), "ids": row_ids, "errors": bulk_errors(errors)}
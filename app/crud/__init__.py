@@ -4,3 +4,9 @@ from . import patients
 from . import assistants
 from . import treatments
 from . import reports
+from . import rollups
+from . import doctor_stats
+from . import staff
+from . import exports
+from . import report_jobs
+from . import aio
@@ -0,0 +1,6 @@
+# Async counterparts of the crud modules, for use with an AsyncSession
+from . import users
+from . import doctors
+from . import patients
+from . import assistants
+from . import treatments
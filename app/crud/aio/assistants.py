@@ -0,0 +1,179 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from ... import models, schemas
+from ..base import async_unit_of_work, get_password_hash_async, update_returning_async
+from ...tokens import revocation_list
+
+
+# Async sessions cannot lazy load, so the nested user is always loaded up front
+async def get_assistant(db: AsyncSession, assistant_id: int):
+    result = await db.execute(
+        select(models.Assistant)
+        .options(joinedload(models.Assistant.user))
+        .where(models.Assistant.id == assistant_id)
+    )
+    return result.scalars().first()
+
+
+async def get_assistants(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after_id: int = None
+):
+    query = (
+        select(models.Assistant)
+        .options(joinedload(models.Assistant.user))
+        .order_by(models.Assistant.id)
+    )
+    if after_id is not None:
+        query = query.where(models.Assistant.id > after_id)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def create_assistant(db: AsyncSession, assistant: schemas.AssistantCreate):
+    hashed_password = await get_password_hash_async(assistant.password)
+
+    # The user and its profile are written together: flushing the profile
+    # assigns both ids and the single commit leaves no orphan user behind
+    async with async_unit_of_work(db):
+        db_user = models.User(
+            email=assistant.email,
+            hashed_password=hashed_password,
+            full_name=assistant.full_name,
+            role="assistant",
+        )
+        db_assistant = models.Assistant(
+            user=db_user,
+            age=assistant.age,
+            specialization=assistant.specialization,
+        )
+        db.add(db_assistant)
+        await db.flush()
+    return db_assistant
+
+
+async def update_assistant(
+    db: AsyncSession, assistant_id: int, assistant: schemas.AssistantUpdate
+):
+    update_data = assistant.dict(exclude_unset=True)
+    # Profile columns; is_active lives on the user
+    values = {
+        key: value
+        for key, value in update_data.items()
+        if key != "is_active" and value is not None
+    }
+    is_active = update_data.get("is_active")
+
+    async with async_unit_of_work(db):
+        if values:
+            db_assistant = await update_returning_async(
+                db, models.Assistant, assistant_id, values
+            )
+        else:
+            db_assistant = await get_assistant(db, assistant_id)
+        if db_assistant is None:
+            return None
+
+        if is_active is not None:
+            await update_returning_async(
+                db, models.User, db_assistant.user_id, {"is_active": is_active}
+            )
+
+    # The response embeds the user; loading it here keeps the lazy load (an
+    # identity map hit after the updates above) inside the session's greenlet
+    await db.run_sync(lambda session: db_assistant.user)
+
+    # Deactivated users lose their outstanding session tokens, for good:
+    # once reactivated they log in again
+    if is_active is False:
+        revocation_list.revoke(db_assistant.user_id)
+
+    return db_assistant
+
+
+async def delete_assistant(db: AsyncSession, assistant_id: int):
+    db_assistant = await get_assistant(db, assistant_id)
+    if db_assistant:
+        # Deactivate instead of deleting
+        async with async_unit_of_work(db):
+            db_user = db_assistant.user
+            if db_user:
+                db_user.is_active = False
+
+        revocation_list.revoke(db_assistant.user_id)
+        return True
+    return False
+
+
+async def get_assistant_by_user_id(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.Assistant).where(models.Assistant.user_id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def get_patients_by_assistant(db: AsyncSession, assistant_id: int):
+    result = await db.execute(
+        select(models.Patient)
+        .join(
+            models.PatientAssistant,
+            models.PatientAssistant.patient_id == models.Patient.id,
+        )
+        .where(
+            models.PatientAssistant.assistant_id == assistant_id,
+            models.PatientAssistant.is_active == True,
+        )
+    )
+    return result.scalars().unique().all()
+
+
+# Patient-Assistant Assignment CRUD
+async def get_active_assignment(db: AsyncSession, assistant_id: int, patient_id: int):
+    result = await db.execute(
+        select(models.PatientAssistant).where(
+            models.PatientAssistant.assistant_id == assistant_id,
+            models.PatientAssistant.patient_id == patient_id,
+            models.PatientAssistant.is_active == True,
+        )
+    )
+    return result.scalars().first()
+
+
+async def get_patient_assistants(
+    db: AsyncSession, patient_id: int = None, assistant_id: int = None
+):
+    query = select(models.PatientAssistant)
+
+    if patient_id:
+        query = query.where(models.PatientAssistant.patient_id == patient_id)
+
+    if assistant_id:
+        query = query.where(models.PatientAssistant.assistant_id == assistant_id)
+
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def assign_patient_to_assistant(
+    db: AsyncSession, assignment: schemas.PatientAssistantCreate, doctor_id: int
+):
+    db_assignment = models.PatientAssistant(
+        patient_id=assignment.patient_id,
+        assistant_id=assignment.assistant_id,
+        assigned_by_doctor_id=doctor_id,
+    )
+    async with async_unit_of_work(db):
+        db.add(db_assignment)
+    return db_assignment
+
+
+async def update_patient_assistant_assignment(
+    db: AsyncSession, assignment_id: int, update: schemas.PatientAssistantUpdate
+):
+    async with async_unit_of_work(db):
+        return await update_returning_async(
+            db,
+            models.PatientAssistant,
+            assignment_id,
+            update.dict(exclude_unset=True),
+        )
@@ -0,0 +1,113 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from ... import models, schemas
+from ..base import async_unit_of_work, get_password_hash_async, update_returning_async
+from ..doctor_stats import set_doctor_active_async
+from ...tokens import revocation_list
+
+
+# Async sessions cannot lazy load, so the nested user is always loaded up front
+async def get_doctor(db: AsyncSession, doctor_id: int):
+    result = await db.execute(
+        select(models.Doctor)
+        .options(joinedload(models.Doctor.user))
+        .where(models.Doctor.id == doctor_id)
+    )
+    return result.scalars().first()
+
+
+async def get_doctors(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after_id: int = None
+):
+    query = (
+        select(models.Doctor)
+        .options(joinedload(models.Doctor.user))
+        .order_by(models.Doctor.id)
+    )
+    if after_id is not None:
+        query = query.where(models.Doctor.id > after_id)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def get_doctor_by_user_id(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.Doctor).where(models.Doctor.user_id == user_id)
+    )
+    return result.scalars().first()
+
+
+async def create_doctor(db: AsyncSession, doctor: schemas.DoctorCreate):
+    hashed_password = await get_password_hash_async(doctor.password)
+
+    # The user and its profile are written together: flushing the profile
+    # assigns both ids and the single commit leaves no orphan user behind
+    async with async_unit_of_work(db):
+        db_user = models.User(
+            email=doctor.email,
+            hashed_password=hashed_password,
+            full_name=doctor.full_name,
+            role="doctor",
+        )
+        db_doctor = models.Doctor(
+            user=db_user,
+            specialization=doctor.specialization,
+            experience=doctor.experience,
+        )
+        db.add(db_doctor)
+        await db.flush()
+    return db_doctor
+
+
+async def update_doctor(db: AsyncSession, doctor_id: int, doctor: schemas.DoctorUpdate):
+    update_data = doctor.dict(exclude_unset=True)
+    # Profile columns; is_active lives on the user
+    values = {
+        key: value
+        for key, value in update_data.items()
+        if key != "is_active" and value is not None
+    }
+    is_active = update_data.get("is_active")
+
+    async with async_unit_of_work(db):
+        if values:
+            db_doctor = await update_returning_async(
+                db, models.Doctor, doctor_id, values
+            )
+        else:
+            db_doctor = await get_doctor(db, doctor_id)
+        if db_doctor is None:
+            return None
+
+        if is_active is not None:
+            await update_returning_async(
+                db, models.User, db_doctor.user_id, {"is_active": is_active}
+            )
+            await set_doctor_active_async(db, doctor_id, is_active)
+
+    # The response embeds the user; loading it here keeps the lazy load (an
+    # identity map hit after the updates above) inside the session's greenlet
+    await db.run_sync(lambda session: db_doctor.user)
+
+    # Deactivated users lose their outstanding session tokens, for good:
+    # once reactivated they log in again
+    if is_active is False:
+        revocation_list.revoke(db_doctor.user_id)
+
+    return db_doctor
+
+
+async def delete_doctor(db: AsyncSession, doctor_id: int):
+    db_doctor = await get_doctor(db, doctor_id)
+    if db_doctor:
+        async with async_unit_of_work(db):
+            db_doctor.is_active = False
+
+            db_user = db_doctor.user
+            if db_user:
+                db_user.is_active = False
+
+        revocation_list.revoke(db_doctor.user_id)
+        return True
+    return False
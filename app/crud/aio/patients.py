@@ -0,0 +1,62 @@
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ... import models, schemas
+from ..base import async_unit_of_work, update_returning_async
+from ..patients import _bulk_insert_statement, _bulk_rows
+
+
+async def get_patients(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after_id: int = None
+):
+    query = select(models.Patient).order_by(models.Patient.id)
+    if after_id is not None:
+        query = query.where(models.Patient.id > after_id)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def get_patient(db: AsyncSession, patient_id: int):
+    return await db.get(models.Patient, patient_id)
+
+
+async def create_patient(db: AsyncSession, patient: schemas.PatientCreate):
+    db_patient = models.Patient(
+        first_name=patient.first_name,
+        last_name=patient.last_name,
+        age=patient.age,
+    )
+    async with async_unit_of_work(db):
+        db.add(db_patient)
+    return db_patient
+
+
+async def create_patients_bulk(
+    db: AsyncSession, patients: List[schemas.PatientCreate]
+) -> List[int]:
+    """AsyncSession counterpart of crud.patients.create_patients_bulk."""
+    if not patients:
+        return []
+    async with async_unit_of_work(db):
+        result = await db.execute(_bulk_insert_statement(), _bulk_rows(patients))
+        return list(result.scalars())
+
+
+async def update_patient(
+    db: AsyncSession, patient_id: int, patient: schemas.PatientUpdate
+):
+    # Update only provided fields
+    async with async_unit_of_work(db):
+        return await update_returning_async(
+            db, models.Patient, patient_id, patient.dict(exclude_unset=True)
+        )
+
+
+async def delete_patient(db: AsyncSession, patient_id: int):
+    db_patient = await get_patient(db, patient_id)
+    if db_patient:
+        async with async_unit_of_work(db):
+            db_patient.is_active = False
+        return True
+    return False
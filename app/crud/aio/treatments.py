@@ -0,0 +1,199 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ... import models, schemas
+from ..base import async_unit_of_work, update_returning_async
+from ..rollups import to_utc
+from ..treatments import NOT_ASSIGNED_ERROR, TREATMENT_NOT_FOUND_ERROR
+
+
+async def get_treatment(db: AsyncSession, treatment_id: int):
+    result = await db.execute(
+        select(models.Treatment).where(models.Treatment.id == treatment_id)
+    )
+    return result.scalars().first()
+
+
+async def get_treatments(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    doctor_id: int = None,
+    patient_id: int = None,
+    active_only: bool = True,
+    current_user=None,
+    after_id: int = None,
+):
+    # current_user is a Principal carrying the caller's doctor/assistant ids
+    query = select(models.Treatment).order_by(models.Treatment.id)
+
+    # Apply filters based on current user's role
+    if current_user:
+        if current_user.role == "doctor":
+            # Doctors can only see treatments they created
+            if current_user.doctor_id is None:
+                return []
+            query = query.where(models.Treatment.doctor_id == current_user.doctor_id)
+        elif current_user.role == "assistant":
+            # Assistants can only see treatments for patients assigned to them
+            if current_user.assistant_id is None:
+                return []
+            assigned = select(models.PatientAssistant.patient_id).where(
+                models.PatientAssistant.assistant_id == current_user.assistant_id,
+                models.PatientAssistant.is_active == True,
+            )
+            query = query.where(models.Treatment.patient_id.in_(assigned))
+
+    # Apply additional filters
+    if doctor_id:
+        query = query.where(models.Treatment.doctor_id == doctor_id)
+
+    if patient_id:
+        query = query.where(models.Treatment.patient_id == patient_id)
+
+    if active_only:
+        query = query.where(models.Treatment.is_active == True)
+
+    if after_id is not None:
+        query = query.where(models.Treatment.id > after_id)
+
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def create_treatment(
+    db: AsyncSession, treatment: schemas.TreatmentCreate, doctor_id: int
+):
+    db_treatment = models.Treatment(
+        name=treatment.name,
+        description=treatment.description,
+        doctor_id=doctor_id,
+        patient_id=treatment.patient_id,
+    )
+    async with async_unit_of_work(db):
+        db.add(db_treatment)
+    return db_treatment
+
+
+async def update_treatment(
+    db: AsyncSession, treatment_id: int, treatment: schemas.TreatmentUpdate
+):
+    async with async_unit_of_work(db):
+        return await update_returning_async(
+            db, models.Treatment, treatment_id, treatment.dict(exclude_unset=True)
+        )
+
+
+async def delete_treatment(db: AsyncSession, treatment_id: int):
+    db_treatment = await get_treatment(db, treatment_id)
+
+    if db_treatment:
+        async with async_unit_of_work(db):
+            db_treatment.is_active = False
+        return True
+
+    return False
+
+
+async def apply_treatment(
+    db: AsyncSession,
+    application: schemas.TreatmentApplicationCreate,
+    assistant_id: int,
+):
+    db_application = models.TreatmentApplication(
+        treatment_id=application.treatment_id,
+        assistant_id=assistant_id,
+        notes=application.notes,
+        application_date=to_utc(application.application_date),
+    )
+    async with async_unit_of_work(db):
+        db.add(db_application)
+    return db_application
+
+
+async def get_treatment_assignments(db: AsyncSession, assistant_id: int, treatment_ids):
+    """Async counterpart of crud.treatments.get_treatment_assignments."""
+    if not treatment_ids:
+        return {}
+    result = await db.execute(
+        select(models.Treatment.id, models.PatientAssistant.id)
+        .outerjoin(
+            models.PatientAssistant,
+            (models.PatientAssistant.patient_id == models.Treatment.patient_id)
+            & (models.PatientAssistant.assistant_id == assistant_id)
+            & (models.PatientAssistant.is_active == True),
+        )
+        .where(models.Treatment.id.in_(set(treatment_ids)))
+    )
+    assigned = {}
+    for treatment_id, assignment_id in result:
+        assigned[treatment_id] = assigned.get(treatment_id, False) or (
+            assignment_id is not None
+        )
+    return assigned
+
+
+async def apply_treatments_bulk(
+    db: AsyncSession, applications, assistant_id: int, all_or_nothing=False
+):
+    """Async counterpart of crud.treatments.apply_treatments_bulk."""
+    assigned = await get_treatment_assignments(
+        db, assistant_id, [application.treatment_id for _, application in applications]
+    )
+    errors, accepted = {}, []
+    for index, application in applications:
+        if application.treatment_id not in assigned:
+            errors[index] = [TREATMENT_NOT_FOUND_ERROR]
+        elif not assigned[application.treatment_id]:
+            errors[index] = [NOT_ASSIGNED_ERROR]
+        else:
+            accepted.append((index, application))
+
+    if not accepted or (errors and all_or_nothing):
+        return [], [], errors
+
+    db_applications = [
+        models.TreatmentApplication(
+            treatment_id=application.treatment_id,
+            assistant_id=assistant_id,
+            notes=application.notes,
+            application_date=to_utc(application.application_date),
+        )
+        for _, application in accepted
+    ]
+    async with async_unit_of_work(db):
+        db.add_all(db_applications)
+        await db.flush()
+    return accepted, [application.id for application in db_applications], errors
+
+
+async def get_treatment_applications(
+    db: AsyncSession, treatment_id: int = None, assistant_id: int = None
+):
+    query = select(models.TreatmentApplication)
+
+    if treatment_id:
+        query = query.where(models.TreatmentApplication.treatment_id == treatment_id)
+
+    if assistant_id:
+        query = query.where(models.TreatmentApplication.assistant_id == assistant_id)
+
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def get_treatment_application(db: AsyncSession, application_id: int):
+    return await db.get(models.TreatmentApplication, application_id)
+
+
+async def update_treatment_application(
+    db: AsyncSession,
+    application_id: int,
+    update: schemas.TreatmentApplicationUpdate,
+):
+    async with async_unit_of_work(db):
+        return await update_returning_async(
+            db,
+            models.TreatmentApplication,
+            application_id,
+            update.dict(exclude_unset=True),
+        )
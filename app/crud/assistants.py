@@ -1,63 +1,79 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from .. import models, schemas
-from .base import get_password_hash
-from .users import get_user
+from .base import get_password_hash, unit_of_work, update_returning
+from ..tokens import revocation_list
 
 
+# Responses embed the user, so it is joined into the same query
 def get_assistant(db: Session, assistant_id: int):
-    return (
-        db.query(models.Assistant).filter(models.Assistant.id == assistant_id).first()
+    return db.get(
+        models.Assistant, assistant_id, options=[joinedload(models.Assistant.user)]
     )
 
 
-def get_assistants(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Assistant).offset(skip).limit(limit).all()
+def get_assistants(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    query = (
+        db.query(models.Assistant)
+        .options(joinedload(models.Assistant.user))
+        .order_by(models.Assistant.id)
+    )
+    if after_id is not None:
+        query = query.filter(models.Assistant.id > after_id)
+    return query.offset(skip).limit(limit).all()
 
 
 def create_assistant(db: Session, assistant: schemas.AssistantCreate):
-    # First create the user
     hashed_password = get_password_hash(assistant.password)
-    db_user = models.User(
-        email=assistant.email,
-        hashed_password=hashed_password,
-        full_name=assistant.full_name,
-        role="assistant",
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    # Then create the assistant
-    db_assistant = models.Assistant(
-        user_id=db_user.id,
-        age=assistant.age,
-        specialization=assistant.specialization,
-    )
-    db.add(db_assistant)
-    db.commit()
-    db.refresh(db_assistant)
+
+    # The user and its profile are written together: flushing the profile
+    # assigns both ids and the single commit leaves no orphan user behind
+    with unit_of_work(db):
+        db_user = models.User(
+            email=assistant.email,
+            hashed_password=hashed_password,
+            full_name=assistant.full_name,
+            role="assistant",
+        )
+        db_assistant = models.Assistant(
+            user=db_user,
+            age=assistant.age,
+            specialization=assistant.specialization,
+        )
+        db.add(db_assistant)
+        db.flush()
     return db_assistant
 
 
 def update_assistant(
     db: Session, assistant_id: int, assistant: schemas.AssistantUpdate
 ):
-    db_assistant = get_assistant(db, assistant_id)
-    if db_assistant:
-        update_data = assistant.dict(exclude_unset=True)
-
-        # Update the assistant record
-        for key, value in update_data.items():
-            if hasattr(db_assistant, key) and value is not None:
-                setattr(db_assistant, key, value)
-
-        if "is_active" in update_data:
-            db_user = get_user(db, db_assistant.user_id)
-            if db_user:
-                db_user.is_active = update_data["is_active"]
-
-        db.commit()
-        db.refresh(db_assistant)
+    update_data = assistant.dict(exclude_unset=True)
+    # Profile columns; is_active lives on the user
+    values = {
+        key: value
+        for key, value in update_data.items()
+        if key != "is_active" and value is not None
+    }
+    is_active = update_data.get("is_active")
+
+    with unit_of_work(db):
+        if values:
+            db_assistant = update_returning(db, models.Assistant, assistant_id, values)
+        else:
+            db_assistant = get_assistant(db, assistant_id)
+        if db_assistant is None:
+            return None
+
+        if is_active is not None:
+            # Leaves the updated user in the identity map for the response
+            update_returning(
+                db, models.User, db_assistant.user_id, {"is_active": is_active}
+            )
+
+    # Deactivated users lose their outstanding session tokens, for good:
+    # once reactivated they log in again
+    if is_active is False:
+        revocation_list.revoke(db_assistant.user_id)
 
     return db_assistant
 
@@ -66,11 +82,12 @@ def delete_assistant(db: Session, assistant_id: int):
     db_assistant = get_assistant(db, assistant_id)
     if db_assistant:
         # Deactivate instead of deleting
-        db_user = get_user(db, db_assistant.user_id)
-        if db_user:
-            db_user.is_active = False
+        with unit_of_work(db):
+            db_user = db_assistant.user
+            if db_user:
+                db_user.is_active = False
 
-        db.commit()
+        revocation_list.revoke(db_assistant.user_id)
         return True
     return False
 
@@ -99,6 +116,18 @@ def get_patients_by_assistant(db: Session, assistant_id: int):
 
 
 # Patient-Assistant Assignment CRUD
+def get_active_assignment(db: Session, assistant_id: int, patient_id: int):
+    return (
+        db.query(models.PatientAssistant)
+        .filter(
+            models.PatientAssistant.assistant_id == assistant_id,
+            models.PatientAssistant.patient_id == patient_id,
+            models.PatientAssistant.is_active == True,
+        )
+        .first()
+    )
+
+
 def get_patient_assistants(
     db: Session, patient_id: int = None, assistant_id: int = None
 ):
@@ -121,27 +150,18 @@ def assign_patient_to_assistant(
         assistant_id=assignment.assistant_id,
         assigned_by_doctor_id=doctor_id,
     )
-    db.add(db_assignment)
-    db.commit()
-    db.refresh(db_assignment)
+    with unit_of_work(db):
+        db.add(db_assignment)
     return db_assignment
 
 
 def update_patient_assistant_assignment(
     db: Session, assignment_id: int, update: schemas.PatientAssistantUpdate
 ):
-    db_assignment = (
-        db.query(models.PatientAssistant)
-        .filter(models.PatientAssistant.id == assignment_id)
-        .first()
-    )
-
-    if db_assignment:
-        update_data = update.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_assignment, key, value)
-
-        db.commit()
-        db.refresh(db_assignment)
-
-    return db_assignment
+    with unit_of_work(db):
+        return update_returning(
+            db,
+            models.PatientAssistant,
+            assignment_id,
+            update.dict(exclude_unset=True),
+        )
@@ -1,8 +1,218 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
 from passlib.context import CryptContext
+from sqlalchemy import update
+
+
+@contextmanager
+def unit_of_work(db):
+    """Run a block of writes as one transaction with a single commit.
+
+    Use flush() inside the block when generated ids are needed. Any exception
+    rolls the whole unit back. Units nest: an inner unit joins the outer one
+    and only the outermost commits, so crud writers can be composed into a
+    larger atomic write.
+    """
+    depth = db.info.get("unit_of_work_depth", 0)
+    db.info["unit_of_work_depth"] = depth + 1
+    try:
+        yield db
+        if depth == 0:
+            db.commit()
+    except Exception:
+        if depth == 0:
+            db.rollback()
+        raise
+    finally:
+        db.info["unit_of_work_depth"] = depth
+
+
+@asynccontextmanager
+async def async_unit_of_work(db):
+    """AsyncSession counterpart of unit_of_work."""
+    depth = db.info.get("unit_of_work_depth", 0)
+    db.info["unit_of_work_depth"] = depth + 1
+    try:
+        yield db
+        if depth == 0:
+            await db.commit()
+    except Exception:
+        if depth == 0:
+            await db.rollback()
+        raise
+    finally:
+        db.info["unit_of_work_depth"] = depth
+
+
+def _update_statement(model, ident, values):
+    return (
+        update(model)
+        .where(model.id == ident)
+        .values(**values)
+        .returning(model)
+        .execution_options(populate_existing=True)
+    )
+
+
+def update_returning(db, model, ident, values):
+    """Update one row by primary key and return the updated object.
+
+    Uses a single UPDATE ... RETURNING where the dialect supports it, so the
+    row is neither fetched first nor refreshed afterwards. Otherwise the
+    object comes from the identity map (Session.get) and is flushed. Returns
+    None when the row does not exist.
+    """
+    if not values:
+        return db.get(model, ident)
+    if db.get_bind().dialect.update_returning:
+        return db.scalars(_update_statement(model, ident, values)).first()
+
+    obj = db.get(model, ident)
+    if obj is not None:
+        for key, value in values.items():
+            setattr(obj, key, value)
+        db.flush()
+    return obj
+
+
+async def update_returning_async(db, model, ident, values):
+    """AsyncSession counterpart of update_returning."""
+    if not values:
+        return await db.get(model, ident)
+    if db.bind.dialect.update_returning:
+        return (await db.scalars(_update_statement(model, ident, values))).first()
+
+    obj = await db.get(model, ident)
+    if obj is not None:
+        for key, value in values.items():
+            setattr(obj, key, value)
+        await db.flush()
+    return obj
+
 
 # Password hashing utilities
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
-def get_password_hash(password):
+class PasswordPoolFull(Exception):
+    """Raised when the password hashing pool has no free slot."""
+
+
+class PasswordHashingPool:
+    """Bounded worker pool for bcrypt hashing and verification.
+
+    bcrypt releases the GIL while it works, so threads give real
+    parallelism. At most max_workers hashes run at once and at most
+    max_queue more may wait; anything beyond that is rejected immediately
+    instead of tying up request threads.
+    """
+
+    def __init__(self, max_workers=2, max_queue=32):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hash"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolFull("Password hashing pool is saturated")
+
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(self._run, fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    def _run(self, fn, *args):
+        with self._lock:
+            self.pending -= 1
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def _release(self, future):
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending,
+                "utilization": round(self.running / self.max_workers, 3),
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+password_pool = PasswordHashingPool(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2))),
+    max_queue=int(os.getenv("PASSWORD_HASH_QUEUE", "32")),
+)
+
+
+def _hash_password(password):
+    # Module-level so process pool workers can unpickle it
     return pwd_context.hash(password)
+
+
+def get_password_hash(password):
+    return password_pool.run(pwd_context.hash, password)
+
+
+async def get_password_hash_async(password):
+    # Waits on the pool without blocking the event loop
+    future = password_pool.submit(pwd_context.hash, password)
+    return await asyncio.wrap_future(future)
+
+
+def hash_passwords(passwords, executor=None):
+    """Hash a batch of passwords in parallel, preserving order.
+
+    By default the batch runs on the shared hashing pool, at most max_workers
+    at a time so logins can still queue behind it. An executor (e.g. a
+    ProcessPoolExecutor in offline tools) can be passed instead.
+    """
+    if executor is not None:
+        return list(executor.map(_hash_password, passwords))
+
+    hashes = []
+    step = password_pool.max_workers
+    for start in range(0, len(passwords), step):
+        futures = [
+            password_pool.submit(_hash_password, password)
+            for password in passwords[start : start + step]
+        ]
+        hashes.extend(future.result() for future in futures)
+    return hashes
+
+
+def verify_password(plain_password, hashed_password):
+    return password_pool.run(pwd_context.verify, plain_password, hashed_password)
+
+
+async def verify_password_async(plain_password, hashed_password):
+    # Waits on the pool without holding a thread from the request limiter
+    future = password_pool.submit(pwd_context.verify, plain_password, hashed_password)
+    return await asyncio.wrap_future(future)
@@ -0,0 +1,289 @@
+from collections import defaultdict
+
+from sqlalchemy import bindparam, delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+from .. import models
+
+DoctorStat = models.DoctorStat
+
+COUNTED_FIELDS = ("is_active", "active_patient_count", "treatment_count")
+
+
+def _previous(obj, key):
+    """The value an attribute had before the pending changes were flushed."""
+    history = inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        # Changed from None (or from a value that was never loaded)
+        return None
+    return history.unchanged[0] if history.unchanged else None
+
+
+def _count_patient(deltas, doctor_id, is_active, delta):
+    if doctor_id is not None and is_active:
+        deltas[doctor_id][0] += delta
+
+
+def _count_treatment(deltas, doctor_id, delta):
+    if doctor_id is not None:
+        deltas[doctor_id][1] += delta
+
+
+# Patients, treatments and doctors written through the ORM adjust their
+# doctor's counters in the same transaction. UPDATE statements that bypass
+# the unit of work call set_doctor_active themselves (patient and treatment
+# updates never change the counted columns); bulk patient inserts never carry
+# a doctor, so they cannot move the counters.
+@event.listens_for(Session, "after_flush")
+def _maintain_doctor_stats(session, flush_context):
+    deltas = defaultdict(lambda: [0, 0])
+    new_doctor_ids = []
+    user_activity = {}
+
+    for obj in session.new:
+        if isinstance(obj, models.Patient):
+            _count_patient(deltas, obj.doctor_id, obj.is_active, 1)
+        elif isinstance(obj, models.Treatment):
+            _count_treatment(deltas, obj.doctor_id, 1)
+        elif isinstance(obj, models.Doctor):
+            new_doctor_ids.append(obj.id)
+
+    for obj in session.dirty:
+        if isinstance(obj, models.Patient):
+            _count_patient(
+                deltas, _previous(obj, "doctor_id"), _previous(obj, "is_active"), -1
+            )
+            _count_patient(deltas, obj.doctor_id, obj.is_active, 1)
+        elif isinstance(obj, models.Treatment):
+            _count_treatment(deltas, _previous(obj, "doctor_id"), -1)
+            _count_treatment(deltas, obj.doctor_id, 1)
+        elif isinstance(obj, models.User) and obj.role == "doctor":
+            if inspect(obj).attrs.is_active.history.has_changes():
+                user_activity[obj.id] = bool(obj.is_active)
+
+    deleted_doctor_ids = []
+    for obj in session.deleted:
+        if isinstance(obj, models.Patient):
+            _count_patient(
+                deltas, _previous(obj, "doctor_id"), _previous(obj, "is_active"), -1
+            )
+        elif isinstance(obj, models.Treatment):
+            _count_treatment(deltas, _previous(obj, "doctor_id"), -1)
+        elif isinstance(obj, models.Doctor):
+            deleted_doctor_ids.append(obj.id)
+
+    if not (new_doctor_ids or deltas or user_activity or deleted_doctor_ids):
+        return
+
+    connection = session.connection()
+    table = DoctorStat.__table__
+    if new_doctor_ids:
+        # New doctors start at zero; counts for their first patients and
+        # treatments are applied just below
+        rows = connection.execute(
+            select(models.Doctor.id, models.User.is_active)
+            .outerjoin(models.User, models.Doctor.user_id == models.User.id)
+            .where(models.Doctor.id.in_(new_doctor_ids))
+        )
+        connection.execute(
+            insert(table),
+            [
+                {
+                    "doctor_id": doctor_id,
+                    "is_active": bool(is_active),
+                    "active_patient_count": 0,
+                    "treatment_count": 0,
+                }
+                for doctor_id, is_active in rows
+            ],
+        )
+    _apply_deltas(connection, deltas)
+    if deleted_doctor_ids:
+        # SQLite only cascades the foreign key with foreign_keys=ON
+        connection.execute(
+            delete(table).where(table.c.doctor_id.in_(deleted_doctor_ids))
+        )
+    for is_active in (True, False):
+        user_ids = [user_id for user_id, v in user_activity.items() if v is is_active]
+        if user_ids:
+            connection.execute(
+                update(table)
+                .where(
+                    table.c.doctor_id.in_(
+                        select(models.Doctor.id).where(
+                            models.Doctor.user_id.in_(user_ids)
+                        )
+                    )
+                )
+                .values(is_active=is_active)
+            )
+
+
+def _apply_deltas(connection, deltas):
+    """Add {doctor_id: [patients, treatments]} to the stored counters."""
+    changes = [
+        {"b_doctor_id": doctor_id, "b_patients": patients, "b_treatments": treatments}
+        for doctor_id, (patients, treatments) in deltas.items()
+        if patients or treatments
+    ]
+    if changes:
+        table = DoctorStat.__table__
+        connection.execute(
+            update(table)
+            .where(table.c.doctor_id == bindparam("b_doctor_id"))
+            .values(
+                active_patient_count=table.c.active_patient_count
+                + bindparam("b_patients"),
+                treatment_count=table.c.treatment_count + bindparam("b_treatments"),
+            ),
+            changes,
+        )
+
+
+# Statement-level deletes (query(...).delete()) bypass the flush, so the rows
+# they are about to remove are counted per doctor first
+@event.listens_for(Session, "do_orm_execute")
+def _count_deleted_rows(orm_execute_state):
+    if not orm_execute_state.is_delete:
+        return
+    model = orm_execute_state.bind_mapper.class_
+    whereclause = orm_execute_state.statement.whereclause
+    if model is models.Doctor:
+        # Drop the deleted doctors' rows; SQLite only cascades with
+        # foreign_keys=ON
+        doctor_ids = select(models.Doctor.id)
+        if whereclause is not None:
+            doctor_ids = doctor_ids.where(whereclause)
+        orm_execute_state.session.connection().execute(
+            delete(DoctorStat).where(DoctorStat.doctor_id.in_(doctor_ids))
+        )
+        return
+    if model is models.Patient:
+        query = select(models.Patient.doctor_id, func.count()).where(
+            models.Patient.is_active == True
+        )
+        column = 0
+    elif model is models.Treatment:
+        query = select(models.Treatment.doctor_id, func.count())
+        column = 1
+    else:
+        return
+
+    if whereclause is not None:
+        query = query.where(whereclause)
+    connection = orm_execute_state.session.connection()
+    deltas = defaultdict(lambda: [0, 0])
+    for doctor_id, count in connection.execute(query.group_by(model.doctor_id)):
+        if doctor_id is not None:
+            deltas[doctor_id][column] -= count
+    _apply_deltas(connection, deltas)
+
+
+def _set_doctor_active_statement(doctor_id: int, is_active: bool):
+    return (
+        update(DoctorStat.__table__)
+        .where(DoctorStat.doctor_id == doctor_id)
+        .values(is_active=is_active)
+    )
+
+
+def set_doctor_active(db: Session, doctor_id: int, is_active: bool):
+    """Record a doctor's (de)activation that was written without the ORM."""
+    db.execute(_set_doctor_active_statement(doctor_id, is_active))
+
+
+async def set_doctor_active_async(db, doctor_id: int, is_active: bool):
+    """AsyncSession counterpart of set_doctor_active."""
+    await db.execute(_set_doctor_active_statement(doctor_id, is_active))
+
+
+def get_doctor_stats(db: Session, active_only: bool = True):
+    query = db.query(DoctorStat).order_by(DoctorStat.doctor_id)
+    if active_only:
+        query = query.filter(DoctorStat.is_active == True)
+    return query.all()
+
+
+def _expected_doctor_stats(db: Session):
+    """Compute every doctor's counters from the raw tables."""
+    patient_counts = dict(
+        db.query(models.Patient.doctor_id, func.count(models.Patient.id))
+        .filter(models.Patient.is_active == True)
+        .group_by(models.Patient.doctor_id)
+    )
+    treatment_counts = dict(
+        db.query(models.Treatment.doctor_id, func.count(models.Treatment.id)).group_by(
+            models.Treatment.doctor_id
+        )
+    )
+    doctors = db.query(models.Doctor.id, models.User.is_active).outerjoin(
+        models.User, models.Doctor.user_id == models.User.id
+    )
+    return {
+        doctor_id: {
+            "doctor_id": doctor_id,
+            "is_active": bool(is_active),
+            "active_patient_count": patient_counts.get(doctor_id, 0),
+            "treatment_count": treatment_counts.get(doctor_id, 0),
+        }
+        for doctor_id, is_active in doctors
+    }
+
+
+def rebuild_doctor_stats(db: Session):
+    """Recompute the doctor_stats table from the raw rows.
+
+    Used to backfill or repair it; returns the number of doctors written.
+    """
+    expected = _expected_doctor_stats(db)
+    db.execute(delete(DoctorStat))
+    if expected:
+        db.execute(insert(DoctorStat), list(expected.values()))
+    db.commit()
+    return len(expected)
+
+
+def ensure_doctor_stats(db: Session):
+    """Backfill doctor_stats when it is empty but doctors exist.
+
+    A database whose tables came from create_all rather than the migrations
+    gets an empty doctor_stats next to doctors written before it existed,
+    and the report would silently leave them out. Returns the number of
+    doctors backfilled, 0 when the table was already populated.
+    """
+    if db.query(DoctorStat.doctor_id).first() is not None:
+        return 0
+    if db.query(models.Doctor.id).first() is None:
+        return 0
+    return rebuild_doctor_stats(db)
+
+
+def check_doctor_stats(db: Session):
+    """Compare doctor_stats with counts taken from the raw rows.
+
+    Returns one entry per disagreement: the doctor id, the field and the
+    expected and stored values (None when the row is missing or unexpected).
+    """
+    expected = _expected_doctor_stats(db)
+    stored = {
+        row.doctor_id: {field: getattr(row, field) for field in COUNTED_FIELDS}
+        for row in get_doctor_stats(db, active_only=False)
+    }
+
+    mismatches = []
+    for doctor_id in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get(doctor_id), stored.get(doctor_id)
+        for field in COUNTED_FIELDS:
+            want_value = want[field] if want else None
+            have_value = have[field] if have else None
+            if want_value != have_value:
+                mismatches.append(
+                    {
+                        "doctor_id": doctor_id,
+                        "field": field,
+                        "expected": want_value,
+                        "actual": have_value,
+                    }
+                )
+    return mismatches
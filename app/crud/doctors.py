@@ -1,59 +1,77 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from .. import models, schemas
-from .base import get_password_hash
-from .users import get_user
+from .base import get_password_hash, unit_of_work, update_returning
+from .doctor_stats import set_doctor_active
+from ..tokens import revocation_list
 
 
+# Responses embed the user, so it is joined into the same query
 def get_doctor(db: Session, doctor_id: int):
-    return db.query(models.Doctor).filter(models.Doctor.id == doctor_id).first()
+    return db.get(models.Doctor, doctor_id, options=[joinedload(models.Doctor.user)])
 
 
-def get_doctors(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Doctor).offset(skip).limit(limit).all()
+def get_doctors(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    query = (
+        db.query(models.Doctor)
+        .options(joinedload(models.Doctor.user))
+        .order_by(models.Doctor.id)
+    )
+    if after_id is not None:
+        query = query.filter(models.Doctor.id > after_id)
+    return query.offset(skip).limit(limit).all()
 
 
 def create_doctor(db: Session, doctor: schemas.DoctorCreate):
-    # First create the user
     hashed_password = get_password_hash(doctor.password)
-    db_user = models.User(
-        email=doctor.email,
-        hashed_password=hashed_password,
-        full_name=doctor.full_name,
-        role="doctor",
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    # Then create the doctor
-    db_doctor = models.Doctor(
-        user_id=db_user.id,
-        specialization=doctor.specialization,
-        experience=doctor.experience,
-    )
-    db.add(db_doctor)
-    db.commit()
-    db.refresh(db_doctor)
+
+    # The user and its profile are written together: flushing the profile
+    # assigns both ids and the single commit leaves no orphan user behind
+    with unit_of_work(db):
+        db_user = models.User(
+            email=doctor.email,
+            hashed_password=hashed_password,
+            full_name=doctor.full_name,
+            role="doctor",
+        )
+        db_doctor = models.Doctor(
+            user=db_user,
+            specialization=doctor.specialization,
+            experience=doctor.experience,
+        )
+        db.add(db_doctor)
+        db.flush()
     return db_doctor
 
 
 def update_doctor(db: Session, doctor_id: int, doctor: schemas.DoctorUpdate):
-    db_doctor = get_doctor(db, doctor_id)
-    if db_doctor:
-        update_data = doctor.dict(exclude_unset=True)
-
-        # Update the doctor record
-        for key, value in update_data.items():
-            if hasattr(db_doctor, key) and value is not None:
-                setattr(db_doctor, key, value)
-
-        if "is_active" in update_data:
-            db_user = get_user(db, db_doctor.user_id)
-            if db_user:
-                db_user.is_active = update_data["is_active"]
-
-        db.commit()
-        db.refresh(db_doctor)
+    update_data = doctor.dict(exclude_unset=True)
+    # Profile columns; is_active lives on the user
+    values = {
+        key: value
+        for key, value in update_data.items()
+        if key != "is_active" and value is not None
+    }
+    is_active = update_data.get("is_active")
+
+    with unit_of_work(db):
+        if values:
+            db_doctor = update_returning(db, models.Doctor, doctor_id, values)
+        else:
+            db_doctor = get_doctor(db, doctor_id)
+        if db_doctor is None:
+            return None
+
+        if is_active is not None:
+            # Leaves the updated user in the identity map for the response
+            update_returning(
+                db, models.User, db_doctor.user_id, {"is_active": is_active}
+            )
+            set_doctor_active(db, doctor_id, is_active)
+
+    # Deactivated users lose their outstanding session tokens, for good:
+    # once reactivated they log in again
+    if is_active is False:
+        revocation_list.revoke(db_doctor.user_id)
 
     return db_doctor
 
@@ -61,13 +79,14 @@ def update_doctor(db: Session, doctor_id: int, doctor: schemas.DoctorUpdate):
 def delete_doctor(db: Session, doctor_id: int):
     db_doctor = get_doctor(db, doctor_id)
     if db_doctor:
-        db_doctor.is_active = False
+        with unit_of_work(db):
+            db_doctor.is_active = False
 
-        db_user = get_user(db, db_doctor.user_id)
-        if db_user:
-            db_user.is_active = False
+            db_user = db_doctor.user
+            if db_user:
+                db_user.is_active = False
 
-        db.commit()
+        revocation_list.revoke(db_doctor.user_id)
         return True
     return False
 
@@ -0,0 +1,91 @@
+import os
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .. import models
+
+# Rows fetched per round trip; also the rows encoded per streamed chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+
+# Every export selects plain columns (no ORM objects, so nothing piles up in
+# the identity map) and is executed with yield_per, which streams rows from a
+# server-side cursor where the driver has one.
+def _execute(db: Session, statement, batch_size=None):
+    return db.execute(
+        statement.execution_options(yield_per=batch_size or EXPORT_BATCH_SIZE)
+    )
+
+
+def export_patients(db: Session, batch_size: int = None):
+    return _execute(
+        db,
+        select(
+            models.Patient.id,
+            models.Patient.first_name,
+            models.Patient.last_name,
+            models.Patient.age,
+            models.Patient.is_active,
+            models.Patient.doctor_id,
+        ).order_by(models.Patient.id),
+        batch_size,
+    )
+
+
+def export_treatments(db: Session, doctor_id: int = None, batch_size: int = None):
+    statement = select(
+        models.Treatment.id,
+        models.Treatment.name,
+        models.Treatment.description,
+        models.Treatment.doctor_id,
+        models.Treatment.patient_id,
+        models.Treatment.is_active,
+    ).order_by(models.Treatment.id)
+    if doctor_id is not None:
+        statement = statement.where(models.Treatment.doctor_id == doctor_id)
+    return _execute(db, statement, batch_size)
+
+
+def export_treatment_applications(
+    db: Session,
+    doctor_id: int = None,
+    assistant_id: int = None,
+    batch_size: int = None,
+):
+    statement = select(
+        models.TreatmentApplication.id,
+        models.TreatmentApplication.treatment_id,
+        models.TreatmentApplication.assistant_id,
+        models.TreatmentApplication.application_date,
+        models.TreatmentApplication.notes,
+    ).order_by(models.TreatmentApplication.id)
+    if doctor_id is not None:
+        statement = statement.join(
+            models.Treatment,
+            models.TreatmentApplication.treatment_id == models.Treatment.id,
+        ).where(models.Treatment.doctor_id == doctor_id)
+    if assistant_id is not None:
+        statement = statement.where(
+            models.TreatmentApplication.assistant_id == assistant_id
+        )
+    return _execute(db, statement, batch_size)
+
+
+def export_doctors_patients(db: Session, batch_size: int = None):
+    """One row per active doctor, with the counts of the doctors report."""
+    return _execute(
+        db,
+        select(
+            models.Doctor.id.label("doctor_id"),
+            models.User.full_name.label("name"),
+            models.User.email,
+            models.Doctor.specialization,
+            models.DoctorStat.active_patient_count.label("patient_count"),
+            models.DoctorStat.treatment_count,
+        )
+        .join(models.Doctor, models.DoctorStat.doctor_id == models.Doctor.id)
+        .join(models.User, models.Doctor.user_id == models.User.id)
+        .where(models.DoctorStat.is_active == True)
+        .order_by(models.DoctorStat.doctor_id),
+        batch_size,
+    )
@@ -1,13 +1,20 @@
+from typing import List
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from .. import models, schemas
+from .base import unit_of_work, update_returning
 
 
-def get_patients(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Patient).offset(skip).limit(limit).all()
+def get_patients(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    query = db.query(models.Patient).order_by(models.Patient.id)
+    if after_id is not None:
+        query = query.filter(models.Patient.id > after_id)
+    return query.offset(skip).limit(limit).all()
 
 
 def get_patient(db: Session, patient_id: int):
-    return db.query(models.Patient).filter(models.Patient.id == patient_id).first()
+    return db.get(models.Patient, patient_id)
 
 
 def create_patient(db: Session, patient: schemas.PatientCreate):
@@ -16,29 +23,49 @@ def create_patient(db: Session, patient: schemas.PatientCreate):
         last_name=patient.last_name,
         age=patient.age,
     )
-    db.add(db_patient)
-    db.commit()
-    db.refresh(db_patient)
+    with unit_of_work(db):
+        db.add(db_patient)
     return db_patient
 
 
-def update_patient(db: Session, patient_id: int, patient: schemas.PatientUpdate):
-    db_patient = get_patient(db, patient_id)
+def _bulk_insert_statement():
+    # sort_by_parameter_order lines the returned ids up with the input rows.
+    # Where the dialect cannot guarantee that for a batched INSERT (SQLite)
+    # SQLAlchemy sends one statement per row, still in one transaction;
+    # render_nulls keeps rows with and without optional fields in one batch
+    return (
+        insert(models.Patient)
+        .returning(models.Patient.id, sort_by_parameter_order=True)
+        .execution_options(render_nulls=True)
+    )
 
-    # Update only provided fields
-    update_data = patient.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_patient, key, value)
 
-    db.commit()
-    db.refresh(db_patient)
-    return db_patient
+def _bulk_rows(patients):
+    return [patient.dict() for patient in patients]
+
+
+def create_patients_bulk(
+    db: Session, patients: List[schemas.PatientCreate]
+) -> List[int]:
+    """Insert many patients in one transaction; ids keep input order."""
+    if not patients:
+        return []
+    with unit_of_work(db):
+        return list(db.scalars(_bulk_insert_statement(), _bulk_rows(patients)))
+
+
+def update_patient(db: Session, patient_id: int, patient: schemas.PatientUpdate):
+    # Update only provided fields
+    with unit_of_work(db):
+        return update_returning(
+            db, models.Patient, patient_id, patient.dict(exclude_unset=True)
+        )
 
 
 def delete_patient(db: Session, patient_id: int):
     db_patient = get_patient(db, patient_id)
     if db_patient:
-        db_patient.is_active = False
-        db.commit()
+        with unit_of_work(db):
+            db_patient.is_active = False
         return True
     return False
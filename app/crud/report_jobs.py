@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from .. import models
+from .base import unit_of_work
+
+ReportJob = models.ReportJob
+
+# progress marks the phase a job is in, not a share of the work done: each
+# report is computed by a few set-based queries, with no per-row loop whose
+# steps could be counted
+PROGRESS_QUEUED = 0
+PROGRESS_RUNNING = 10
+PROGRESS_COMPUTED = 90
+PROGRESS_DONE = 100
+
+
+def _now():
+    # Naive UTC, like the other stored timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def create_report_job(db: Session, report: str, params: dict, requested_by: int):
+    db_job = ReportJob(
+        report=report,
+        params=params,
+        status="queued",
+        progress=PROGRESS_QUEUED,
+        requested_by=requested_by,
+        created_at=_now(),
+    )
+    with unit_of_work(db):
+        db.add(db_job)
+    return db_job
+
+
+def get_report_job(db: Session, job_id: int):
+    return db.get(ReportJob, job_id)
+
+
+def _update_job_where(db: Session, job_id: int, values: dict, *conditions):
+    statement = (
+        update(ReportJob).where(ReportJob.id == job_id, *conditions).values(**values)
+    )
+    with unit_of_work(db):
+        result = db.execute(statement, execution_options={"synchronize_session": False})
+    return result.rowcount == 1
+
+
+def _update_job(db: Session, job_id: int, values: dict, status: str = None):
+    conditions = () if status is None else (ReportJob.status == status,)
+    return _update_job_where(db, job_id, values, *conditions)
+
+
+def claim_report_job(db: Session, job_id: int):
+    """Move a queued job to running; False if another worker got it first."""
+    return _update_job(
+        db,
+        job_id,
+        {
+            "status": "running",
+            "progress": PROGRESS_RUNNING,
+            "started_at": _now(),
+            "heartbeat_at": _now(),
+        },
+        status="queued",
+    )
+
+
+def beat_report_jobs(db: Session, job_ids):
+    """Refresh the heartbeat of the running jobs among job_ids."""
+    with unit_of_work(db):
+        db.execute(
+            update(ReportJob)
+            .where(ReportJob.id.in_(job_ids), ReportJob.status == "running")
+            .values(heartbeat_at=_now()),
+            execution_options={"synchronize_session": False},
+        )
+
+
+def set_report_job_progress(db: Session, job_id: int, progress: int):
+    _update_job(db, job_id, {"progress": progress}, status="running")
+
+
+def finish_report_job(db: Session, job_id: int, result=None, error: str = None):
+    values = {"finished_at": _now()}
+    if error is None:
+        values.update(status="succeeded", progress=PROGRESS_DONE, result=result)
+    else:
+        values.update(status="failed", error=error)
+    _update_job(db, job_id, values, status="running")
+
+
+def requeue_stale_report_jobs(db: Session, stale_before: datetime):
+    """Queue again the running jobs whose last heartbeat is before stale_before.
+
+    Returns the ids of the jobs this call requeued, oldest first.
+    """
+    # Jobs claimed before heartbeats were recorded fall back to started_at
+    last_seen = func.coalesce(ReportJob.heartbeat_at, ReportJob.started_at)
+    stale = (ReportJob.status == "running", last_seen < stale_before)
+    job_ids = list(
+        db.scalars(select(ReportJob.id).where(*stale).order_by(ReportJob.id))
+    )
+    # Each job is requeued with the same conditions, so when several
+    # processes sweep at once only one of them gets it
+    return [
+        job_id
+        for job_id in job_ids
+        if _update_job_where(
+            db,
+            job_id,
+            {
+                "status": "queued",
+                "progress": PROGRESS_QUEUED,
+                "started_at": None,
+                "heartbeat_at": None,
+            },
+            *stale,
+        )
+    ]
+
+
+def requeue_report_jobs(db: Session, stale_before: datetime):
+    """Queue again the jobs whose run was interrupted before stale_before.
+
+    Returns the ids of every queued job, oldest first.
+    """
+    requeue_stale_report_jobs(db, stale_before)
+    return list(
+        db.scalars(
+            select(ReportJob.id)
+            .where(ReportJob.status == "queued")
+            .order_by(ReportJob.id)
+        )
+    )
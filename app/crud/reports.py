@@ -1,23 +1,15 @@
-from sqlalchemy.orm import Session
+from collections import defaultdict
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, aliased
 from .. import models
 from .patients import get_patient
-from .treatments import get_treatments
-
-
-def get_patient_treatment_report(db: Session, patient_id: int):
-    treatments = get_treatments(db, patient_id=patient_id, active_only=False)
-
-    report = []
-    for treatment in treatments:
-        applications = (
-            db.query(models.TreatmentApplication)
-            .filter(models.TreatmentApplication.treatment_id == treatment.id)
-            .all()
-        )
 
-        report.append({"treatment": treatment, "applications": applications})
-
-    return report
+# Applications listed per treatment in the patient treatment report; the
+# rest are only counted, so one long-running treatment cannot blow up the
+# response
+APPLICATIONS_PER_TREATMENT = 100
+MAX_APPLICATIONS_PER_TREATMENT = 1000
 
 
 def get_doctor_patient_statistics(db: Session):
@@ -69,15 +61,44 @@ def get_doctor_patient_statistics(db: Session):
     }
 
 
-def get_doctor_patient_report(db: Session):
-    # Get all active doctors with their user information
+def get_doctor_patient_report(db: Session, include_patients: bool = True):
+    # Active doctors with their counters, read from the maintained
+    # doctor_stats table: one row per doctor however many patients and
+    # treatments there are
     doctors_query = (
-        db.query(models.Doctor, models.User)
+        db.query(models.DoctorStat, models.Doctor, models.User)
+        .join(models.Doctor, models.DoctorStat.doctor_id == models.Doctor.id)
         .join(models.User, models.Doctor.user_id == models.User.id)
-        .filter(models.User.is_active == True)
+        .filter(models.DoctorStat.is_active == True)
+        .order_by(models.DoctorStat.doctor_id)
         .all()
     )
 
+    # Fetch the names of every active patient of an active doctor at once
+    patients_by_doctor = defaultdict(list)
+    if include_patients:
+        patient_rows = (
+            db.query(
+                models.Patient.id,
+                models.Patient.first_name,
+                models.Patient.last_name,
+                models.Patient.doctor_id,
+            )
+            .join(
+                models.DoctorStat,
+                models.Patient.doctor_id == models.DoctorStat.doctor_id,
+            )
+            .filter(
+                models.Patient.is_active == True, models.DoctorStat.is_active == True
+            )
+            .order_by(models.Patient.doctor_id, models.Patient.id)
+            .all()
+        )
+        for patient_id, first_name, last_name, doctor_id in patient_rows:
+            patients_by_doctor[doctor_id].append(
+                {"id": patient_id, "name": f"{first_name} {last_name}"}
+            )
+
     report = {
         "doctors": [],
         "statistics": {
@@ -89,57 +110,28 @@ def get_doctor_patient_report(db: Session):
         },
     }
 
-    doctor_treatment_counts = {}
     all_patients_count = 0
 
-    # Process each doctor and their patients
-    for doctor_obj, user_obj in doctors_query:
+    for stats_obj, doctor_obj, user_obj in doctors_query:
         doctor_id = doctor_obj.id
+        patient_count = stats_obj.active_patient_count
+        treatment_count = stats_obj.treatment_count
 
-        # Get patients for this doctor
-        patients = (
-            db.query(models.Patient)
-            .filter(
-                models.Patient.doctor_id == doctor_id, models.Patient.is_active == True
-            )
-            .all()
-        )
-
-        # Get treatments created by this doctor
-        treatments = (
-            db.query(models.Treatment)
-            .filter(models.Treatment.doctor_id == doctor_id)
-            .all()
-        )
-
-        doctor_data = {
+        doctor_entry = {
             "id": doctor_id,
             "name": user_obj.full_name,
             "email": user_obj.email,
-            "specialization": (
-                doctor_obj.specialization
-                if hasattr(doctor_obj, "specialization")
-                else ""
-            ),
-            "patients": [],
-            "patient_count": len(patients),
-            "treatment_count": len(treatments),
+            "specialization": doctor_obj.specialization,
+            "patient_count": patient_count,
+            "treatment_count": treatment_count,
         }
+        if include_patients:
+            doctor_entry["patients"] = patients_by_doctor.get(doctor_id, [])
+        report["doctors"].append(doctor_entry)
+        all_patients_count += patient_count
 
-        # Add patient details
-        for patient in patients:
-            doctor_data["patients"].append(
-                {
-                    "id": patient.id,
-                    "name": f"{patient.first_name} {patient.last_name}",
-                    "email": patient.email,
-                    "phone": patient.phone,
-                }
-            )
-
-        report["doctors"].append(doctor_data)
-        doctor_treatment_counts[doctor_id] = len(treatments)
-        all_patients_count += len(patients)
+        report["statistics"]["patients_per_doctor"][str(doctor_id)] = patient_count
+        report["statistics"]["treatments_per_doctor"][str(doctor_id)] = treatment_count
 
     # Calculate statistics
     total_doctors = len(doctors_query)
@@ -151,87 +143,129 @@ def get_doctor_patient_report(db: Session):
             all_patients_count / total_doctors, 2
         )
 
-    # Add patient count per doctor
-    for doc in report["doctors"]:
-        report["statistics"]["patients_per_doctor"][doc["id"]] = doc["patient_count"]
-        report["statistics"]["treatments_per_doctor"][doc["id"]] = doc[
-            "treatment_count"
-        ]
-
     return report
 
 
-def get_patient_treatment_report(db: Session, patient_id: int):
+def get_patient_treatment_report(
+    db: Session,
+    patient_id: int,
+    skip: int = 0,
+    limit: int = None,
+    applications_limit: int = APPLICATIONS_PER_TREATMENT,
+):
     # Get the patient with all basic information
     patient = get_patient(db, patient_id)
     if not patient:
         return []
 
-    # Get all treatments for this patient
-    treatments = (
-        db.query(models.Treatment)
-        .filter(models.Treatment.patient_id == patient_id)
-        .all()
+    doctor_user = aliased(models.User)
+    assistant_user = aliased(models.User)
+
+    # Number each treatment's applications (oldest first) and count them, so
+    # only the first applications_limit are joined in
+    application = models.TreatmentApplication
+    applications = (
+        select(
+            application.id,
+            application.treatment_id,
+            application.assistant_id,
+            application.notes,
+            func.row_number()
+            .over(partition_by=application.treatment_id, order_by=application.id)
+            .label("position"),
+            func.count().over(partition_by=application.treatment_id).label("total"),
+        )
+        .where(
+            application.treatment_id.in_(
+                select(models.Treatment.id).where(
+                    models.Treatment.patient_id == patient_id
+                )
+            )
+        )
+        .subquery()
     )
 
-    report_data = []
-
-    # Process each treatment
-    for treatment in treatments:
-        # Get treatment applications
-        applications = (
-            db.query(models.TreatmentApplication)
-            .filter(models.TreatmentApplication.treatment_id == treatment.id)
-            .all()
+    # Fetch treatments, prescribing doctors, applications and the assistants
+    # that applied them in one statement
+    query = (
+        db.query(
+            models.Treatment.id,
+            models.Treatment.name,
+            models.Treatment.description,
+            models.Treatment.is_active,
+            doctor_user.full_name,
+            applications.c.id,
+            applications.c.notes,
+            assistant_user.full_name,
+            applications.c.total,
         )
-
-        # Get doctor information
-        doctor_query = (
-            db.query(models.Doctor, models.User)
-            .join(models.User, models.Doctor.user_id == models.User.id)
-            .filter(models.Doctor.id == treatment.doctor_id)
-            .first()
+        .outerjoin(models.Doctor, models.Treatment.doctor_id == models.Doctor.id)
+        .outerjoin(doctor_user, models.Doctor.user_id == doctor_user.id)
+        .outerjoin(
+            applications,
+            and_(
+                applications.c.treatment_id == models.Treatment.id,
+                # Treatments whose applications are all cut off still get
+                # their count from the first row
+                applications.c.position <= max(applications_limit, 1),
+            ),
         )
+        .outerjoin(
+            models.Assistant,
+            applications.c.assistant_id == models.Assistant.id,
+        )
+        .outerjoin(assistant_user, models.Assistant.user_id == assistant_user.id)
+        .filter(models.Treatment.patient_id == patient_id)
+        .order_by(models.Treatment.id, applications.c.id)
+    )
 
-        doctor_name = "Unknown"
-        if doctor_query:
-            doctor_obj, user_obj = doctor_query
-            doctor_name = user_obj.full_name
-
-        # Create treatment entry
-        treatment_entry = {
-            "id": treatment.id,
-            "name": treatment.name,
-            "description": treatment.description,
-            "prescribed_by": doctor_name,
-            "is_active": treatment.is_active,
-            "applications": [],
-        }
-
-        # Add application details
-        for app in applications:
-            # Get assistant information
-            assistant_query = (
-                db.query(models.Assistant, models.User)
-                .join(models.User, models.Assistant.user_id == models.User.id)
-                .filter(models.Assistant.id == app.assistant_id)
-                .first()
-            )
-
-            assistant_name = "Unknown"
-            if assistant_query:
-                assistant_obj, user_obj = assistant_query
-                assistant_name = user_obj.full_name
+    # Paginate over treatments, not over joined rows
+    if skip or limit is not None:
+        page = (
+            db.query(models.Treatment.id)
+            .filter(models.Treatment.patient_id == patient_id)
+            .order_by(models.Treatment.id)
+            .offset(skip)
+        )
+        if limit is not None:
+            page = page.limit(limit)
+        query = query.filter(models.Treatment.id.in_(page.scalar_subquery()))
 
-            # Add application entry
-            application_entry = {
-                "id": app.id,
-                "applied_by": assistant_name,
-                "notes": app.notes,
+    report_data = []
+    entries = {}
+
+    for (
+        treatment_id,
+        name,
+        description,
+        is_active,
+        doctor_name,
+        application_id,
+        notes,
+        assistant_name,
+        application_count,
+    ) in query:
+        treatment_entry = entries.get(treatment_id)
+        if treatment_entry is None:
+            treatment_entry = {
+                "id": treatment_id,
+                "name": name,
+                "description": description,
+                "prescribed_by": doctor_name or "Unknown",
+                "is_active": is_active,
+                "application_count": application_count or 0,
+                "applications": [],
             }
+            entries[treatment_id] = treatment_entry
+            report_data.append(treatment_entry)
 
-            treatment_entry["applications"].append(application_entry)
-
-        report_data.append(treatment_entry)
+        if application_id is not None and applications_limit > 0:
+            treatment_entry["applications"].append(
+                {
+                    "id": application_id,
+                    "applied_by": assistant_name or "Unknown",
+                    "notes": notes,
+                }
+            )
 
     return report_data
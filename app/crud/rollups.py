@@ -0,0 +1,185 @@
+from collections import defaultdict
+from datetime import timedelta, timezone
+
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.orm import Session
+from .. import models
+
+Rollup = models.TreatmentApplicationRollup
+
+GRANULARITIES = ("hour", "day", "week")
+GROUP_BY_COLUMNS = {
+    "treatment": Rollup.treatment_id,
+    "assistant": Rollup.assistant_id,
+    "doctor": Rollup.doctor_id,
+}
+
+
+def to_utc(value):
+    """Store timestamps as naive UTC; naive input is taken to be UTC already."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def truncate(value, granularity):
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if granularity in ("day", "week"):
+        value = value.replace(hour=0)
+    if granularity == "week":
+        # Weeks start on Monday
+        value -= timedelta(days=value.weekday())
+    return value
+
+
+def _upsert_counts(connection, rows):
+    """Add each row's count to its hourly bucket, creating missing buckets."""
+    table = Rollup.__table__
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=["bucket_start", "treatment_id", "assistant_id"],
+            set_={"count": table.c.count + statement.excluded.count},
+        )
+        connection.execute(statement, rows)
+        return
+
+    for row in rows:
+        result = connection.execute(
+            update(table)
+            .where(
+                table.c.bucket_start == row["bucket_start"],
+                table.c.treatment_id == row["treatment_id"],
+                table.c.assistant_id == row["assistant_id"],
+            )
+            .values(count=table.c.count + row["count"])
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table), row)
+
+
+def _rollup_rows(counts, doctor_ids):
+    return [
+        {
+            "bucket_start": bucket_start,
+            "treatment_id": treatment_id,
+            "assistant_id": assistant_id,
+            "doctor_id": doctor_ids.get(treatment_id),
+            "count": count,
+        }
+        for (bucket_start, treatment_id, assistant_id), count in counts.items()
+        if count
+    ]
+
+
+def _doctor_ids(connection, treatment_ids):
+    rows = connection.execute(
+        select(models.Treatment.id, models.Treatment.doctor_id).where(
+            models.Treatment.id.in_(treatment_ids)
+        )
+    )
+    return dict(rows.all())
+
+
+# Every flushed application (single, bulk or direct session writes) moves its
+# hourly bucket in the same transaction, so the rollup never drifts from the
+# raw rows and reads never have to scan them.
+@event.listens_for(Session, "after_flush")
+def _maintain_application_rollups(session, flush_context):
+    counts = defaultdict(int)
+    for objects, delta in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            if (
+                isinstance(obj, models.TreatmentApplication)
+                and obj.application_date is not None
+            ):
+                key = (
+                    truncate(obj.application_date, "hour"),
+                    obj.treatment_id,
+                    obj.assistant_id,
+                )
+                counts[key] += delta
+    if not counts:
+        return
+
+    connection = session.connection()
+    doctor_ids = _doctor_ids(connection, {key[1] for key in counts})
+    rows = _rollup_rows(counts, doctor_ids)
+    if rows:
+        _upsert_counts(connection, rows)
+
+
+def get_application_rollup(
+    db: Session,
+    granularity: str = "day",
+    group_by: str = "treatment",
+    start=None,
+    end=None,
+    treatment_id: int = None,
+    assistant_id: int = None,
+    doctor_id: int = None,
+):
+    """Count applications per hour, day or week for each treatment, assistant
+    or doctor, read from the hourly rollup table.
+
+    start and end (exclusive) bound the hourly buckets that are included.
+    """
+    key = GROUP_BY_COLUMNS[group_by]
+    query = db.query(Rollup.bucket_start, key, Rollup.count).filter(Rollup.count != 0)
+    if start is not None:
+        query = query.filter(Rollup.bucket_start >= to_utc(start))
+    if end is not None:
+        query = query.filter(Rollup.bucket_start < to_utc(end))
+    if treatment_id:
+        query = query.filter(Rollup.treatment_id == treatment_id)
+    if assistant_id:
+        query = query.filter(Rollup.assistant_id == assistant_id)
+    if doctor_id:
+        query = query.filter(Rollup.doctor_id == doctor_id)
+
+    totals = defaultdict(int)
+    for bucket_start, key_id, count in query:
+        totals[(truncate(bucket_start, granularity), key_id)] += count
+
+    return [
+        {"bucket_start": bucket_start, "key": key_id, "count": count}
+        for (bucket_start, key_id), count in sorted(
+            totals.items(), key=lambda item: (item[0][0], item[0][1] or 0)
+        )
+        if count
+    ]
+
+
+def rebuild_application_rollups(db: Session):
+    """Recompute the rollup table from the raw applications.
+
+    Used to backfill after the table is introduced or to repair it; returns
+    the number of hourly buckets written.
+    """
+    counts = defaultdict(int)
+    rows = db.execute(
+        select(
+            models.TreatmentApplication.application_date,
+            models.TreatmentApplication.treatment_id,
+            models.TreatmentApplication.assistant_id,
+        )
+        .where(models.TreatmentApplication.application_date.is_not(None))
+        .execution_options(yield_per=1000)
+    )
+    for application_date, treatment_id, assistant_id in rows:
+        counts[(truncate(application_date, "hour"), treatment_id, assistant_id)] += 1
+
+    db.execute(delete(Rollup))
+    buckets = _rollup_rows(
+        counts, _doctor_ids(db.connection(), {key[1] for key in counts})
+    )
+    if buckets:
+        db.execute(insert(Rollup), buckets)
+    db.commit()
+    return len(buckets)
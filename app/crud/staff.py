@@ -0,0 +1,66 @@
+from sqlalchemy.orm import Session
+from .. import models
+from .base import hash_passwords, unit_of_work
+from .users import get_existing_emails
+
+DUPLICATE_EMAIL_ERROR = {
+    "loc": ["email"],
+    "msg": "Email already registered",
+    "type": "duplicate_email",
+}
+
+
+def onboard_staff(db: Session, members, all_or_nothing=False, executor=None):
+    """Create the users and doctor/assistant profiles of a validated batch.
+
+    members is a list of (index, StaffOnboarding) pairs. Emails that are
+    already registered, or repeated within the batch, are rejected with a
+    per-row error. Passwords are hashed in parallel and every user and profile
+    row is written in a single transaction.
+
+    Returns the (index, member) pairs that were created, their profile ids and
+    a dict of errors keyed by row index. With all_or_nothing nothing is written
+    when any row is rejected.
+    """
+    existing = get_existing_emails(db, [member.email for _, member in members])
+    errors, accepted = {}, []
+    for index, member in members:
+        if member.email in existing:
+            errors[index] = [DUPLICATE_EMAIL_ERROR]
+        else:
+            existing.add(member.email)
+            accepted.append((index, member))
+
+    if not accepted or (errors and all_or_nothing):
+        return [], [], errors
+
+    hashes = hash_passwords(
+        [member.password for _, member in accepted], executor=executor
+    )
+
+    profiles = []
+    for (_, member), hashed_password in zip(accepted, hashes):
+        user = models.User(
+            email=member.email,
+            hashed_password=hashed_password,
+            full_name=member.full_name,
+            role=member.role,
+        )
+        if member.role == "doctor":
+            profile = models.Doctor(
+                user=user,
+                specialization=member.specialization,
+                experience=member.experience,
+            )
+        else:
+            profile = models.Assistant(
+                user=user, age=member.age, specialization=member.specialization
+            )
+        profiles.append(profile)
+
+    # One flush batches the user and profile INSERTs per table
+    with unit_of_work(db):
+        db.add_all(profiles)
+        db.flush()
+        ids = [profile.id for profile in profiles]
+    return accepted, ids, errors
@@ -1,13 +1,11 @@
 from sqlalchemy.orm import Session
 from .. import models, schemas
-from .doctors import get_doctor_by_user_id
-from .assistants import get_assistant_by_user_id
+from .base import unit_of_work, update_returning
+from .rollups import to_utc
 
 
 def get_treatment(db: Session, treatment_id: int):
-    return (
-        db.query(models.Treatment).filter(models.Treatment.id == treatment_id).first()
-    )
+    return db.get(models.Treatment, treatment_id)
 
 
 def get_treatments(
@@ -18,42 +16,31 @@ def get_treatments(
     patient_id: int = None,
     active_only: bool = True,
     current_user=None,
+    after_id: int = None,
 ):
-    query = db.query(models.Treatment)
+    # current_user is a Principal carrying the caller's doctor/assistant ids
+    query = db.query(models.Treatment).order_by(models.Treatment.id)
 
     # Apply filters based on current user's role
     if current_user:
         if current_user.role == "doctor":
             # Doctors can only see treatments they created
-            doctor = get_doctor_by_user_id(db, current_user.id)
-            if doctor:
-                query = query.filter(models.Treatment.doctor_id == doctor.id)
-            else:
+            if current_user.doctor_id is None:
                 # If doctor profile not found, return empty list
                 return []
+            query = query.filter(models.Treatment.doctor_id == current_user.doctor_id)
         elif current_user.role == "assistant":
             # Assistants can only see treatments for patients assigned to them
-            assistant = get_assistant_by_user_id(db, current_user.id)
-            if assistant:
-                # Get patient IDs assigned to this assistant
-                assignments = (
-                    db.query(models.PatientAssistant)
-                    .filter(
-                        models.PatientAssistant.assistant_id == assistant.id,
-                        models.PatientAssistant.is_active == True,
-                    )
-                    .all()
-                )
-
-                patient_ids = [assignment.patient_id for assignment in assignments]
-                if patient_ids:
-                    query = query.filter(models.Treatment.patient_id.in_(patient_ids))
-                else:
-                    # If no assigned patients, return empty list
-                    return []
-            else:
+            if current_user.assistant_id is None:
                 # If assistant profile not found, return empty list
                 return []
+            assigned_patient_ids = db.query(models.PatientAssistant.patient_id).filter(
+                models.PatientAssistant.assistant_id == current_user.assistant_id,
+                models.PatientAssistant.is_active == True,
+            )
+            query = query.filter(
+                models.Treatment.patient_id.in_(assigned_patient_ids.scalar_subquery())
+            )
 
     # Apply additional filters
     if doctor_id:
@@ -65,6 +52,9 @@ def get_treatments(
     if active_only:
         query = query.filter(models.Treatment.is_active == True)
 
+    if after_id is not None:
+        query = query.filter(models.Treatment.id > after_id)
+
     return query.offset(skip).limit(limit).all()
 
 
@@ -75,35 +65,26 @@ def create_treatment(db: Session, treatment: schemas.TreatmentCreate, doctor_id:
         doctor_id=doctor_id,
         patient_id=treatment.patient_id,
     )
-    db.add(db_treatment)
-    db.commit()
-    db.refresh(db_treatment)
+    with unit_of_work(db):
+        db.add(db_treatment)
     return db_treatment
 
 
 def update_treatment(
     db: Session, treatment_id: int, treatment: schemas.TreatmentUpdate
 ):
-    db_treatment = get_treatment(db, treatment_id)
-
-    if db_treatment:
-        update_data = treatment.dict(exclude_unset=True)
-
-        for key, value in update_data.items():
-            setattr(db_treatment, key, value)
-
-        db.commit()
-        db.refresh(db_treatment)
-
-    return db_treatment
+    with unit_of_work(db):
+        return update_returning(
+            db, models.Treatment, treatment_id, treatment.dict(exclude_unset=True)
+        )
 
 
 def delete_treatment(db: Session, treatment_id: int):
     db_treatment = get_treatment(db, treatment_id)
 
     if db_treatment:
-        db_treatment.is_active = False
-        db.commit()
+        with unit_of_work(db):
+            db_treatment.is_active = False
         return True
 
     return False
@@ -116,13 +97,95 @@ def apply_treatment(
         treatment_id=application.treatment_id,
         assistant_id=assistant_id,
         notes=application.notes,
+        application_date=to_utc(application.application_date),
     )
-    db.add(db_application)
-    db.commit()
-    db.refresh(db_application)
+    with unit_of_work(db):
+        db.add(db_application)
     return db_application
 
 
+def get_treatment_assignments(db: Session, assistant_id: int, treatment_ids):
+    """Check a batch of treatments against an assistant's assignments.
+
+    One query joins each treatment to the assistant's active assignment for
+    its patient. Returns {treatment_id: assigned} for the treatments that
+    exist; ids missing from the result do not exist.
+    """
+    if not treatment_ids:
+        return {}
+    rows = (
+        db.query(models.Treatment.id, models.PatientAssistant.id)
+        .outerjoin(
+            models.PatientAssistant,
+            (models.PatientAssistant.patient_id == models.Treatment.patient_id)
+            & (models.PatientAssistant.assistant_id == assistant_id)
+            & (models.PatientAssistant.is_active == True),
+        )
+        .filter(models.Treatment.id.in_(set(treatment_ids)))
+    )
+    assigned = {}
+    for treatment_id, assignment_id in rows:
+        assigned[treatment_id] = assigned.get(treatment_id, False) or (
+            assignment_id is not None
+        )
+    return assigned
+
+
+TREATMENT_NOT_FOUND_ERROR = {
+    "loc": ["treatment_id"],
+    "msg": "Treatment not found",
+    "type": "not_found",
+}
+NOT_ASSIGNED_ERROR = {
+    "loc": ["treatment_id"],
+    "msg": "You are not assigned to the patient receiving this treatment",
+    "type": "not_assigned",
+}
+
+
+def apply_treatments_bulk(
+    db: Session, applications, assistant_id: int, all_or_nothing=False
+):
+    """Record a validated batch of applications by one assistant.
+
+    applications is a list of (index, TreatmentApplicationCreate) pairs. Every
+    assignment is checked with one query and the accepted rows are inserted in
+    a single transaction.
+
+    Returns the (index, application) pairs that were recorded, their ids and a
+    dict of errors keyed by row index. With all_or_nothing nothing is written
+    when any row is rejected.
+    """
+    assigned = get_treatment_assignments(
+        db, assistant_id, [application.treatment_id for _, application in applications]
+    )
+    errors, accepted = {}, []
+    for index, application in applications:
+        if application.treatment_id not in assigned:
+            errors[index] = [TREATMENT_NOT_FOUND_ERROR]
+        elif not assigned[application.treatment_id]:
+            errors[index] = [NOT_ASSIGNED_ERROR]
+        else:
+            accepted.append((index, application))
+
+    if not accepted or (errors and all_or_nothing):
+        return [], [], errors
+
+    db_applications = [
+        models.TreatmentApplication(
+            treatment_id=application.treatment_id,
+            assistant_id=assistant_id,
+            notes=application.notes,
+            application_date=to_utc(application.application_date),
+        )
+        for _, application in accepted
+    ]
+    with unit_of_work(db):
+        db.add_all(db_applications)
+        db.flush()
+    return accepted, [application.id for application in db_applications], errors
+
+
 def get_treatment_applications(
     db: Session, treatment_id: int = None, assistant_id: int = None
 ):
@@ -148,14 +211,10 @@ def get_treatment_application(db: Session, application_id: int):
 def update_treatment_application(
     db: Session, application_id: int, update: schemas.TreatmentApplicationUpdate
 ):
-    db_application = get_treatment_application(db, application_id)
-
-    if db_application:
-        update_data = update.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_application, key, value)
-
-        db.commit()
-        db.refresh(db_application)
-
-    return db_application
+    with unit_of_work(db):
+        return update_returning(
+            db,
+            models.TreatmentApplication,
+            application_id,
+            update.dict(exclude_unset=True),
+        )
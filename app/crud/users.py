@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from .. import models, schemas
-from .base import get_password_hash
+from .base import get_password_hash, unit_of_work
 
 
 def get_user(db: Session, user_id: int):
@@ -11,8 +11,19 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_existing_emails(db: Session, emails):
+    """Return which of the given emails are already registered, in one query."""
+    if not emails:
+        return set()
+    rows = db.query(models.User.email).filter(models.User.email.in_(set(emails)))
+    return {email for (email,) in rows}
+
+
+def get_users(db: Session, skip: int = 0, limit: int = 100, after_id: int = None):
+    query = db.query(models.User).order_by(models.User.id)
+    if after_id is not None:
+        query = query.filter(models.User.id > after_id)
+    return query.offset(skip).limit(limit).all()
 
 
 def create_user(db: Session, user: schemas.UserCreate):
@@ -23,7 +34,6 @@ def create_user(db: Session, user: schemas.UserCreate):
         full_name=user.full_name,
         role=user.role,
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    with unit_of_work(db):
+        db.add(db_user)
     return db_user
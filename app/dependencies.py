@@ -1,4 +1,4 @@
-from .database import SessionLocal
+from .database import SessionLocal, AsyncSessionLocal
 
 
 # Dependency to get the database session
@@ -8,3 +8,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency to get an async database session for `async def` routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
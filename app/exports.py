@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from fastapi.responses import StreamingResponse
+
+from .database import SessionLocal
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _encode_ndjson(columns, rows):
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_json_value) + "\n" for row in rows
+    )
+
+
+def stream_export(query, export_format, filename):
+    """Stream the rows of query(db) as CSV or NDJSON.
+
+    query runs in a session opened by the response itself, because the
+    request's session is closed before the body is sent. Rows are encoded
+    one yield_per batch at a time, so memory stays flat however many rows
+    there are and the first chunk goes out as soon as the first batch is
+    read.
+    """
+
+    def generate():
+        with SessionLocal() as db:
+            result = query(db)
+            columns = list(result.keys())
+            if export_format == "csv":
+                yield _encode_csv([columns])
+            for rows in result.partitions():
+                if export_format == "csv":
+                    yield _encode_csv(rows)
+                else:
+                    yield _encode_ndjson(columns, rows)
+
+    return StreamingResponse(
+        generate(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{filename}.{export_format}"'
+            )
+        },
+    )
@@ -0,0 +1,92 @@
+import logging
+from contextlib import contextmanager
+
+from starlette.datastructures import MutableHeaders
+
+from .database import track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    """Report the statements each request executed.
+
+    Adds X-DB-Queries and X-DB-Time-ms to every HTTP response, and
+    X-DB-N-Plus-One (the number of repeated statement shapes) when the
+    request looks like an N+1. Streamed bodies may run more statements
+    after the headers are sent; those are included in the log line written
+    when the response ends.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_with_stats(message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Queries"] = str(stats.count)
+                    headers["X-DB-Time-ms"] = str(stats.time_ms)
+                    repeated = stats.suspected_n_plus_one()
+                    if repeated:
+                        headers["X-DB-N-Plus-One"] = str(len(repeated))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                log_query_stats(scope["method"], scope["path"], stats)
+
+
+def log_query_stats(method, path, stats):
+    fields = {
+        "http_method": method,
+        "http_path": path,
+        "db_queries": stats.count,
+        "db_time_ms": stats.time_ms,
+    }
+    logger.info(
+        "%s %s: %d queries in %.2f ms",
+        method,
+        path,
+        stats.count,
+        stats.time_ms,
+        extra=fields,
+    )
+    for statement, count in stats.suspected_n_plus_one():
+        logger.warning(
+            "Suspected N+1 in %s %s: %d executions of %s",
+            method,
+            path,
+            count,
+            statement,
+            extra={**fields, "db_repeated_statement": statement, "db_repeats": count},
+        )
+
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """Fail if the block executes more than max_queries statements.
+
+    Counts statements from every thread, so it can wrap TestClient calls:
+
+        with assert_max_queries(2):
+            client.get("/doctors/", params=...)
+    """
+    with track_queries(all_threads=True) as stats:
+        yield stats
+    if stats.count > max_queries:
+        executed = "\n".join(
+            f"  {count} x {statement}"
+            for statement, count in stats.statements.most_common()
+        )
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, {stats.count} were "
+            f"executed:\n{executed}"
+        )
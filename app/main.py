@@ -1,110 +1,220 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Form
-from sqlalchemy.orm import Session
-import sys
-
-from . import schemas, crud
-from .database import engine, Base, SessionLocal
-from .dependencies import get_db
-from .auth_utils import (
-    authenticate_user,
-    get_current_user_by_email,
-    check_general_manager,
-)
-from .routers import doctors, patients, assistants, treatment, reports
-from .fixtures import create_initial_fixtures
-
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-# Check for --with-fixtures command line argument
-if "--with-fixtures" in sys.argv:
-    with SessionLocal() as db:
-        create_initial_fixtures(db)
-
-app = FastAPI()
-
-# Include routers
-app.include_router(doctors.router)
-app.include_router(patients.router)
-app.include_router(assistants.router)
-app.include_router(treatment.router)
-app.include_router(reports.router)
-
-
-@app.post("/login")
-def login(
-    email: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)
-):
-    user = authenticate_user(db, email, password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-        )
-    return {
-        "id": user.id,
-        "email": user.email,
-        "full_name": user.full_name,
-        "role": user.role,
-    }
-
-
-@app.get("/health")
-def health_check():
-    return {"status": "ok"}
-
-
-# Protected endpoints
-@app.get("/me")
-def read_own_data(email: str, db: Session = Depends(get_db)):
-    user = get_current_user_by_email(db, email)
-    return {
-        "id": user.id,
-        "email": user.email,
-        "full_name": user.full_name,
-        "role": user.role,
-    }
-
-
-@app.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.users.get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.users.create_user(db=db, user=user)
-
-
-@app.get("/users/", response_model=list[schemas.User])
-def read_users(
-    skip: int = 0,
-    limit: int = 100,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
-):
-    # If current_user_email is provided, check permissions
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        # Only general managers can get all users
-        check_general_manager(current_user)
-
-    users = crud.users.get_users(db, skip=skip, limit=limit)
-    return users
-
-
-@app.get("/users/{user_id}", response_model=schemas.User)
-def read_user(
-    user_id: int, current_user_email: str = None, db: Session = Depends(get_db)
-):
-    # If current_user_email is provided, check permissions
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        # General managers can access any user, others can only access themselves
-        if current_user.role != "general_manager" and current_user.id != user_id:
-            raise HTTPException(
-                status_code=403, detail="Not authorized to access this user"
-            )
-
-    db_user = crud.users.get_user(db, user_id=user_id)
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+from fastapi import FastAPI, Depends, HTTPException, Response, status, Form
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Optional
+from contextlib import asynccontextmanager
+import anyio
+import sys
+
+from . import schemas, crud
+from .database import (
+    engine,
+    Base,
+    SessionLocal,
+    get_pool_status,
+    get_sqlite_pragmas,
+)
+from .dependencies import get_db, get_async_db
+from .auth_utils import (
+    authenticate_user_async,
+    create_access_token,
+    get_current_user_by_email_async,
+    get_current_user_by_email,
+    get_optional_principal,
+    check_general_manager,
+)
+from .routers import (
+    doctors,
+    patients,
+    assistants,
+    treatment,
+    reports,
+    staff,
+    exports,
+    profiles,
+)
+from .crud.base import PasswordPoolFull, password_pool
+from .fixtures import create_initial_fixtures
+from .pagination import decode_cursor, set_next_cursor
+from .tokens import TOKEN_TTL_SECONDS
+from .principal_cache import Principal, principal_cache
+from .report_cache import report_cache
+from .report_jobs import report_job_runner
+from .instrumentation import QueryStatsMiddleware
+from .metrics import MetricsMiddleware, mark_process_dead, render_metrics, sample_pools
+from .profiling import ProfilingMiddleware
+
+# Create tables
+Base.metadata.create_all(bind=engine)
+
+# create_all leaves a newly added doctor_stats empty; fill it from the doctors
+# that predate it so the doctor report does not miss them
+with SessionLocal() as db:
+    crud.doctor_stats.ensure_doctor_stats(db)
+
+# Check for --with-fixtures command line argument
+if "--with-fixtures" in sys.argv:
+    with SessionLocal() as db:
+        create_initial_fixtures(db)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Pick up report jobs queued or interrupted before this process started
+    await anyio.to_thread.run_sync(report_job_runner.resume)
+    yield
+    await anyio.to_thread.run_sync(report_job_runner.stop)
+    mark_process_dead()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+# Include routers
+app.include_router(doctors.router)
+app.include_router(patients.router)
+app.include_router(assistants.router)
+app.include_router(treatment.router)
+app.include_router(reports.router)
+app.include_router(staff.router)
+app.include_router(exports.router)
+app.include_router(profiles.router)
+
+
+@app.exception_handler(PasswordPoolFull)
+def password_pool_full_handler(request, exc):
+    # Shed load quickly instead of queueing more bcrypt work
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.post("/login")
+async def login(
+    email: str = Form(...),
+    password: str = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    user = await authenticate_user_async(db, email, password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+        )
+    principal = await get_current_user_by_email_async(db, user.email)
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": user.role,
+        "access_token": create_access_token(principal),
+        "token_type": "bearer",
+        "expires_in": TOKEN_TTL_SECONDS,
+    }
+
+
+@app.get("/health")
+def health_check():
+    return {"status": "ok"}
+
+
+@app.get("/health/pools")
+async def pool_status():
+    # Sync routes run on this limiter; size the DB pool against its tokens
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "database": get_pool_status(),
+        "password_hashing": password_pool.stats(),
+        "report_jobs": report_job_runner.stats(),
+        "threads": {
+            "total": limiter.total_tokens,
+            "in_use": limiter.borrowed_tokens,
+        },
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus scrape target; aggregates all workers in multiprocess mode
+    sample_pools()
+    body, content_type = await anyio.to_thread.run_sync(render_metrics)
+    return Response(body, media_type=content_type)
+
+
+@app.get("/health/caches")
+def cache_status():
+    return {"principals": principal_cache.stats(), "reports": report_cache.stats()}
+
+
+@app.get("/health/database")
+def database_status():
+    status = {"dialect": engine.dialect.name}
+    if engine.dialect.name == "sqlite":
+        status["pragmas"] = get_sqlite_pragmas()
+    return status
+
+
+# Protected endpoints
+@app.get("/me")
+def read_own_data(email: str, db: Session = Depends(get_db)):
+    user = get_current_user_by_email(db, email)
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": user.role,
+    }
+
+
+@app.post("/users/", response_model=schemas.User)
+def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = crud.users.get_user_by_email(db, email=user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    return crud.users.create_user(db=db, user=user)
+
+
+@app.get("/users/", response_model=list[schemas.User])
+def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    principal: Optional[Principal] = Depends(get_optional_principal),
+    db: Session = Depends(get_db),
+):
+    # If current_user_email is provided, check permissions
+    if principal:
+        # Only general managers can get all users
+        check_general_manager(principal)
+
+    users = crud.users.get_users(
+        db, skip=skip, limit=limit, after_id=decode_cursor(after)
+    )
+    set_next_cursor(response, users, limit)
+    return users
+
+
+@app.get("/users/{user_id}", response_model=schemas.User)
+def read_user(
+    user_id: int,
+    principal: Optional[Principal] = Depends(get_optional_principal),
+    db: Session = Depends(get_db),
+):
+    # If current_user_email is provided, check permissions
+    if principal:
+        # General managers can access any user, others can only access themselves
+        if principal.role != "general_manager" and principal.id != user_id:
+            raise HTTPException(
+                status_code=403, detail="Not authorized to access this user"
+            )
+
+    db_user = crud.users.get_user(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
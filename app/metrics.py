@@ -0,0 +1,140 @@
+import os
+import time
+
+import anyio
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .crud.base import password_pool
+from .database import get_pool_status
+
+# With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory shared by the workers; every process then writes its samples
+# there and /metrics, whichever worker serves it, reports them all.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route and status",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+THREADPOOL_IN_USE = Gauge(
+    "threadpool_threads_in_use",
+    "Worker threads running sync endpoints",
+    multiprocess_mode="livesum",
+)
+THREADPOOL_SIZE = Gauge(
+    "threadpool_threads_total",
+    "Worker threads available to sync endpoints",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Database connections in use",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Database connections open above the pool size",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_QUEUED = Gauge(
+    "password_hash_queue_depth",
+    "Password hashes waiting for a bcrypt worker",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_RUNNING = Gauge(
+    "password_hash_running",
+    "Password hashes in progress",
+    multiprocess_mode="livesum",
+)
+
+
+def sample_pools():
+    """Record the current occupancy of this process's pools.
+
+    Called after every request and on each scrape, so an idle worker keeps
+    reporting the state it was last left in. Must run on the event loop,
+    which owns the thread limiter.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    THREADPOOL_IN_USE.set(limiter.borrowed_tokens)
+    THREADPOOL_SIZE.set(limiter.total_tokens)
+
+    database = get_pool_status()
+    if "checked_out" in database:
+        DB_POOL_CHECKED_OUT.set(database["checked_out"])
+        DB_POOL_OVERFLOW.set(database["overflow"])
+
+    hashing = password_pool.stats()
+    PASSWORD_HASH_QUEUED.set(hashing["queued"])
+    PASSWORD_HASH_RUNNING.set(hashing["running"])
+
+
+def render_metrics():
+    """Return the Prometheus text exposition and its content type."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the shared multiprocess directory."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """Time every HTTP request and count the ones in progress.
+
+    Latency is labelled with the route template (e.g. /doctors/{doctor_id}),
+    not the raw path, so ids do not create new series; requests that match
+    no route are labelled "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                method, route.path if route is not None else "unmatched", str(status)
+            ).observe(elapsed)
+            sample_pools()
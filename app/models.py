@@ -1,4 +1,15 @@
-from sqlalchemy import Boolean, Column, Integer, String, Enum, ForeignKey
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Enum,
+    ForeignKey,
+    Index,
+    JSON,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 import enum
 
@@ -48,6 +59,10 @@ class Patient(Base):
     is_active = Column(Boolean, default=True)
     doctor_id = Column(Integer, ForeignKey("doctors.id"))
 
+    __table_args__ = (
+        Index("ix_patients_doctor_id_is_active", "doctor_id", "is_active"),
+    )
+
     # Relationships
     doctor = relationship("Doctor", back_populates="patients")
     treatments = relationship("Treatment", back_populates="patient")
@@ -78,6 +93,16 @@ class PatientAssistant(Base):
     assigned_by_doctor_id = Column(Integer, ForeignKey("doctors.id"))
     is_active = Column(Boolean, default=True)
 
+    __table_args__ = (
+        Index(
+            "ix_patient_assistants_assistant_id_patient_id_is_active",
+            "assistant_id",
+            "patient_id",
+            "is_active",
+        ),
+        Index("ix_patient_assistants_patient_id", "patient_id"),
+    )
+
     # Relationships
     patient = relationship("Patient", backref="assistant_assignments")
     assistant = relationship("Assistant", back_populates="patient_assignments")
@@ -94,6 +119,11 @@ class Treatment(Base):
     patient_id = Column(Integer, ForeignKey("patients.id"))
     is_active = Column(Boolean, default=True)
 
+    __table_args__ = (
+        Index("ix_treatments_patient_id_is_active", "patient_id", "is_active"),
+        Index("ix_treatments_doctor_id_is_active", "doctor_id", "is_active"),
+    )
+
     # Relationships
     doctor = relationship("Doctor", back_populates="treatments")
     patient = relationship("Patient", back_populates="treatments")
@@ -104,10 +134,105 @@ class TreatmentApplication(Base):
     __tablename__ = "treatment_applications"
 
     id = Column(Integer, primary_key=True, index=True)
-    treatment_id = Column(Integer, ForeignKey("treatments.id"))
-    assistant_id = Column(Integer, ForeignKey("assistants.id"))
+    treatment_id = Column(Integer, ForeignKey("treatments.id"), index=True)
+    assistant_id = Column(Integer, ForeignKey("assistants.id"), index=True)
     notes = Column(String)
+    application_date = Column(DateTime, index=True)
 
     # Relationships
     treatment = relationship("Treatment", back_populates="applications")
     assistant = relationship("Assistant", back_populates="treatment_applications")
+
+
+class TreatmentApplicationRollup(Base):
+    """Applications counted per hour, treatment and assistant.
+
+    Maintained alongside every application write (see crud.rollups); day and
+    week rollups are summed from these hourly buckets.
+    """
+
+    __tablename__ = "treatment_application_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_start = Column(DateTime, nullable=False)
+    treatment_id = Column(Integer, ForeignKey("treatments.id"), nullable=False)
+    assistant_id = Column(Integer, ForeignKey("assistants.id"), nullable=False)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"))
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "bucket_start",
+            "treatment_id",
+            "assistant_id",
+            name="uq_treatment_application_rollups_bucket",
+        ),
+        # Time series of one treatment, assistant or doctor
+        Index(
+            "ix_treatment_application_rollups_treatment_id",
+            "treatment_id",
+            "bucket_start",
+        ),
+        Index(
+            "ix_treatment_application_rollups_assistant_id",
+            "assistant_id",
+            "bucket_start",
+        ),
+        Index(
+            "ix_treatment_application_rollups_doctor_id", "doctor_id", "bucket_start"
+        ),
+    )
+
+
+class DoctorStat(Base):
+    """Active patient and treatment counts per doctor.
+
+    Maintained in the same transaction as the patient, treatment and doctor
+    writes (see crud.doctor_stats) so the doctors report reads one row per
+    doctor instead of counting the raw tables.
+    """
+
+    __tablename__ = "doctor_stats"
+
+    doctor_id = Column(
+        Integer, ForeignKey("doctors.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Mirrors the doctor's user.is_active
+    is_active = Column(Boolean, nullable=False, default=True, index=True)
+    active_patient_count = Column(Integer, nullable=False, default=0)
+    treatment_count = Column(Integer, nullable=False, default=0)
+
+
+class ReportJob(Base):
+    """A report run queued for the background worker pool (see app.report_jobs)."""
+
+    __tablename__ = "report_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report = Column(String, nullable=False)
+    params = Column(JSON, nullable=False, default=dict)
+    # queued, running, succeeded or failed
+    status = Column(String, nullable=False, default="queued", index=True)
+    # Phase indicator: 0 queued, 10 running, 90 computed, 100 succeeded
+    progress = Column(Integer, nullable=False, default=0)
+    result = Column(JSON)
+    error = Column(String)
+    requested_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    # Refreshed while a worker runs the job; a stale one means it died
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class TableVersion(Base):
+    """Write counter per table, shared by every worker process.
+
+    Bumped in the same transaction as each committed write (see
+    app.report_cache), so cached reports in other processes notice it.
+    """
+
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Identity of an authenticated user, detached from any database session."""
+
+    id: int
+    email: Optional[str]  # not carried by session tokens
+    full_name: Optional[str]
+    role: str
+    is_active: bool
+    doctor_id: Optional[int] = None
+    assistant_id: Optional[int] = None
+
+
+class PrincipalCache:
+    """Bounded LRU cache of principals keyed by email, with TTL expiry."""
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._emails_by_user_id = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, email):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            principal, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(email)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return principal
+
+    def set(self, principal):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._remove(principal.email)
+            self._entries[principal.email] = (
+                principal,
+                time.monotonic() + self.ttl,
+            )
+            self._emails_by_user_id[principal.id] = principal.email
+            while len(self._entries) > self.maxsize:
+                oldest_email = next(iter(self._entries))
+                self._remove(oldest_email)
+                self.evictions += 1
+
+    def invalidate(self, email=None, user_id=None):
+        with self._lock:
+            if email is None and user_id is not None:
+                email = self._emails_by_user_id.get(user_id)
+            if email is not None and self._remove(email):
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._emails_by_user_id.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, email):
+        entry = self._entries.pop(email, None)
+        if entry is None:
+            return False
+        principal = entry[0]
+        if self._emails_by_user_id.get(principal.id) == email:
+            del self._emails_by_user_id[principal.id]
+        return True
+
+
+principal_cache = PrincipalCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
+
+
+# Any flushed change to a user or to a doctor/assistant profile (the crud
+# writers as well as direct session writes) drops the affected entries once
+# the transaction commits.
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session, flush_context):
+    changed = session.info.setdefault("changed_principals", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, models.User):
+            changed.add(("email", obj.email))
+            changed.add(("user_id", obj.id))
+        elif isinstance(obj, (models.Doctor, models.Assistant)):
+            changed.add(("user_id", obj.user_id))
+
+
+# UPDATE statements (crud.base.update_returning) bypass the flush, so a
+# statement-level change to users drops every cached principal on commit
+@event.listens_for(Session, "do_orm_execute")
+def _collect_user_update_statements(orm_execute_state):
+    if (
+        orm_execute_state.is_update
+        and orm_execute_state.bind_mapper.class_ is models.User
+    ):
+        changed = orm_execute_state.session.info.setdefault("changed_principals", set())
+        changed.add(("all", None))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session):
+    for kind, value in session.info.pop("changed_principals", ()):
+        if kind == "all":
+            principal_cache.clear()
+        elif kind == "email":
+            principal_cache.invalidate(email=value)
+        else:
+            principal_cache.invalidate(user_id=value)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_principals(session):
+    session.info.pop("changed_principals", None)
@@ -0,0 +1,329 @@
+import contextvars
+import functools
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs
+
+import anyio
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.datastructures import MutableHeaders
+
+from .auth_utils import get_current_user_by_email, get_token_principal
+from .database import SessionLocal
+
+PROFILE_DIR = os.getenv(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "hospital-profiles")
+)
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+
+# Layers a sample's time is charged to, by the module of the innermost frame
+# that matches one; checked in order
+CATEGORIES = (
+    ("sql", ("sqlalchemy", "sqlite3", "aiosqlite")),
+    ("serialization", ("pydantic", "pydantic_core", "fastapi.encoders", "json")),
+    ("crud", ("app.crud",)),
+    ("endpoint", ("app.routers", "app.main")),
+    ("dependencies", ("fastapi.dependencies", "app.auth_utils", "app.dependencies")),
+    ("routing", ("fastapi.routing", "starlette", "app.instrumentation", "app.metrics")),
+)
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Set while a request is profiled; worker threads see it through the context
+# the request's sync work runs in
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+
+def _module_names():
+    """Map source files to module names, to label sampled code objects."""
+    names = {}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path:
+            names.setdefault(path, name)
+    return names
+
+
+def _code_label(code, modules):
+    module = modules.get(code.co_filename, code.co_filename)
+    return f"{module}.{code.co_qualname}"
+
+
+def _category(modules):
+    for module in reversed(modules):
+        for name, prefixes in CATEGORIES:
+            if any(module == p or module.startswith(p + ".") for p in prefixes):
+                return name
+    return "other"
+
+
+def _run_in_request_thread(profile, func, args):
+    # Worker stacks are sampled from here down; the thread only counts for
+    # the profile while it runs the request's function
+    thread_id = threading.get_ident()
+    profile.threads.add(thread_id)
+    try:
+        return func(*args)
+    finally:
+        profile.threads.discard(thread_id)
+
+
+_REQUEST_THREAD_ROOT = _run_in_request_thread.__code__
+_run_sync = anyio.to_thread.run_sync
+
+
+async def _run_sync_in_profiled_request(func, *args, **kwargs):
+    profile = _active_profile.get()
+    if profile is not None:
+        func, args = functools.partial(_run_in_request_thread, profile, func, args), ()
+    return await _run_sync(func, *args, **kwargs)
+
+
+# Sync endpoints and dependencies reach the worker threads through
+# anyio.to_thread.run_sync (looked up at call time by Starlette), so this is
+# where a profiled request's worker threads register; other calls only pay
+# for the context variable lookup
+anyio.to_thread.run_sync = _run_sync_in_profiled_request
+
+
+class RequestProfile:
+    """Samples the stacks running one request's code.
+
+    A background thread reads the stacks of the threads registered for the
+    request each interval: the event loop thread while it is inside the
+    request's middleware frame, and worker threads while they run a function
+    the request handed to the thread pool. Requests handled concurrently do
+    not show up. Samples keep only code objects and line numbers; they are
+    labelled when the report is built. Nothing is sampled while the request
+    waits on I/O or for a free worker thread; that time is reported as
+    "waiting". Samples are weighted by the time between passes.
+    """
+
+    def __init__(self, root_frame, interval=PROFILE_INTERVAL_MS / 1000):
+        self.id = uuid.uuid4().hex
+        self.root_frame = root_frame
+        self.loop_thread = threading.get_ident()
+        # Worker threads currently running this request's code
+        self.threads = set()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sample_until_stopped, name="request-profiler", daemon=True
+        )
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.started
+        self._stop.set()
+        self._thread.join()
+
+    def _sample_until_stopped(self):
+        own_thread = threading.get_ident()
+        last = self.started
+        while not self._stop.wait(self.interval):
+            # Charge each stack with the time since the previous pass, which
+            # may be longer than the interval under load
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            threads = (self.loop_thread, *self.threads)
+            frames = sys._current_frames()
+            if self._stop.is_set():
+                break
+            for thread_id in threads:
+                if thread_id == own_thread or thread_id not in frames:
+                    continue
+                stack = self._request_stack(thread_id, frames[thread_id])
+                if stack:
+                    self.samples += 1
+                    self.seconds += elapsed
+                    self.stacks[stack] += elapsed
+
+    def _request_stack(self, thread_id, frame):
+        # Collect innermost first, stopping at the frame the request entered
+        stack = []
+        while frame is not None:
+            if thread_id == self.loop_thread:
+                if frame is self.root_frame:
+                    return tuple(stack[::-1])
+            elif frame.f_code is _REQUEST_THREAD_ROOT:
+                return tuple(stack[::-1])
+            stack.append((frame.f_code, frame.f_lineno))
+            frame = frame.f_back
+        return None
+
+    def report(self, method, path):
+        duration_ms = self.duration * 1000
+        modules = _module_names()
+        stacks, categories = Counter(), Counter()
+        for stack, seconds in self.stacks.items():
+            codes = [code for code, _ in stack]
+            stacks[";".join(_code_label(code, modules) for code in codes)] += seconds
+            names = [modules.get(code.co_filename, "") for code in codes]
+            categories[_category(names)] += seconds
+        categories = {
+            name: round(seconds * 1000, 2) for name, seconds in categories.most_common()
+        }
+        categories["waiting"] = round(max(duration_ms - self.seconds * 1000, 0), 2)
+        return {
+            "id": self.id,
+            "method": method,
+            "path": path,
+            "duration_ms": round(duration_ms, 2),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "categories_ms": categories,
+            "tree": _call_tree(stacks),
+            "folded": [
+                f"{stack} {round(seconds * 1e6)}" for stack, seconds in stacks.items()
+            ],
+        }
+
+
+def _call_tree(stacks):
+    # Times are in milliseconds; folded stacks are weighted in microseconds
+    root = {"name": "request", "ms": 0.0, "children": {}}
+    for stack, seconds in stacks.items():
+        root["ms"] += seconds * 1000
+        node = root
+        for label in stack.split(";"):
+            node = node["children"].setdefault(
+                label, {"name": label, "ms": 0.0, "children": {}}
+            )
+            node["ms"] += seconds * 1000
+
+    def finish(node):
+        node["ms"] = round(node["ms"], 3)
+        children = sorted(node["children"].values(), key=lambda c: -c["ms"])
+        node["children"] = [finish(child) for child in children]
+        return node
+
+    return finish(root)
+
+
+def save_profile(profile):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{profile['id']}.json")
+    with open(path, "w") as f:
+        json.dump(profile, f)
+
+    # Keep only the newest PROFILE_KEEP profiles
+    saved = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in saved[:-PROFILE_KEEP]:
+        os.remove(entry.path)
+
+
+def load_profile(profile_id):
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _wants_profile(scope):
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value not in (b"", b"0", b"false")
+    if b"profile=" not in scope["query_string"]:
+        return False
+    values = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [])
+    return bool(values) and values[-1] not in ("", "0", "false")
+
+
+def _principal_by_email(email):
+    with SessionLocal() as db:
+        return get_current_user_by_email(db, email)
+
+
+async def _request_principal(scope):
+    headers = dict(scope["headers"])
+    scheme, _, token = headers.get(b"authorization", b"").decode().partition(" ")
+    try:
+        if scheme.lower() == "bearer" and token:
+            return get_token_principal(
+                HTTPAuthorizationCredentials(scheme=scheme, credentials=token)
+            )
+        query = parse_qs(scope["query_string"].decode("latin-1"))
+        if query.get("current_user_email"):
+            return await anyio.to_thread.run_sync(
+                _principal_by_email, query["current_user_email"][-1]
+            )
+    except HTTPException:
+        return None
+    return None
+
+
+class ProfilingMiddleware:
+    """Profile a single request when a general manager asks for it.
+
+    Requests with an `X-Profile: 1` header or a `profile=1` query parameter
+    are sampled and answered normally, with an `X-Profile` header naming the
+    stored profile. Other requests only pay for the header check.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        principal = await _request_principal(scope)
+        if principal is None or principal.role != "general_manager":
+            response = JSONResponse(
+                status_code=403,
+                content={"detail": "Only general managers can profile requests"},
+            )
+            await response(scope, receive, send)
+            return
+
+        profile = RequestProfile(sys._getframe())
+        finished = False
+
+        async def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                profile.stop()
+                report = profile.report(scope["method"], scope["path"])
+                await anyio.to_thread.run_sync(save_profile, report)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile"] = f"/profiles/{profile.id}"
+            elif message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                # Store the profile before the client can ask for it
+                await finish()
+            await send(message)
+
+        token = _active_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _active_profile.reset(token)
+            await finish()
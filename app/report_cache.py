@@ -0,0 +1,276 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from .database import _env_bool
+from .models import TableVersion
+
+
+class ReportCache:
+    """Bounded LRU cache of report results, invalidated by table writes.
+
+    Every entry remembers the version of each table its report reads. A
+    committed write to one of those tables bumps its version, so the entry
+    is recomputed on the next request. Across worker processes the TTL
+    bounds how long a result may outlive writes made elsewhere. With
+    shared_versions the versions of the registered report tables are also
+    kept in the table_versions table and read through the caller's session,
+    so such writes invalidate entries everywhere at the cost of a row update
+    per written report table and commit.
+
+    Concurrent requests for a key that is not cached share one computation:
+    the first caller computes and the others wait for its result.
+    """
+
+    def __init__(self, maxsize=256, ttl=300.0, shared_versions=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared_versions = shared_versions
+        # Tables some report reads; only these get shared versions
+        self.report_tables = set()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+        self._reports = defaultdict(
+            lambda: {
+                "hits": 0,
+                "misses": 0,
+                "shared": 0,
+                "computations": 0,
+                "compute_seconds": 0.0,
+                "max_compute_seconds": 0.0,
+            }
+        )
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def _table_versions(self, tables, shared=()):
+        return tuple(self._versions[table] for table in tables) + shared
+
+    def _shared_table_versions(self, db, tables):
+        # Read outside the lock; a missing row means the table was never written
+        if db is None or not self.shared_versions:
+            return ()
+        rows = dict(
+            db.execute(
+                select(TableVersion.name, TableVersion.version).where(
+                    TableVersion.name.in_(tables)
+                )
+            ).all()
+        )
+        return tuple(rows.get(table, 0) for table in tables)
+
+    def get_or_compute(self, name, params, tables, compute, db=None):
+        """Return the cached result of report name for params, or compute it.
+
+        tables lists every table the report reads; compute is called without
+        arguments. db is the caller's session, used to read the shared table
+        versions. Errors are raised to every caller waiting on the
+        computation and nothing is cached.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = (name, tuple(sorted(params.items())))
+        tables = tuple(sorted(tables))
+        shared = self._shared_table_versions(db, tables)
+        leader = False
+        with self._lock:
+            report = self._reports[name]
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, versions = entry
+                if versions != self._table_versions(tables, shared):
+                    del self._entries[key]
+                    self.invalidations += 1
+                elif expires_at <= time.monotonic():
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    report["hits"] += 1
+                    return value
+
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                report["shared"] += 1
+            else:
+                flight = self._in_flight[key] = Future()
+                # Taken before computing, so a write committed meanwhile
+                # leaves the stored result already stale (in other
+                # processes, through the shared versions read above)
+                versions = self._table_versions(tables, shared)
+                report["misses"] += 1
+                leader = True
+        if not leader:
+            return flight.result()
+
+        start = time.perf_counter()
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                del self._in_flight[key]
+            flight.set_exception(exc)
+            raise
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            del self._in_flight[key]
+            report["computations"] += 1
+            report["compute_seconds"] += elapsed
+            report["max_compute_seconds"] = max(report["max_compute_seconds"], elapsed)
+            if versions == self._table_versions(tables, shared):
+                self._entries[key] = (value, time.monotonic() + self.ttl, versions)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        flight.set_result(value)
+        return value
+
+    def register_tables(self, tables):
+        """Declare tables a report reads, so writes to them bump shared versions."""
+        with self._lock:
+            self.report_tables.update(tables)
+
+    def invalidate_tables(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            reports = {}
+            hits = misses = shared = 0
+            for name, report in self._reports.items():
+                lookups = report["hits"] + report["shared"] + report["misses"]
+                computations = report["computations"]
+                reports[name] = {
+                    "hits": report["hits"],
+                    "misses": report["misses"],
+                    "shared": report["shared"],
+                    "hit_rate": (
+                        round((report["hits"] + report["shared"]) / lookups, 3)
+                        if lookups
+                        else 0.0
+                    ),
+                    "computations": computations,
+                    "avg_compute_ms": (
+                        round(report["compute_seconds"] / computations * 1000, 3)
+                        if computations
+                        else 0.0
+                    ),
+                    "max_compute_ms": round(report["max_compute_seconds"] * 1000, 3),
+                }
+                hits += report["hits"]
+                misses += report["misses"]
+                shared += report["shared"]
+            lookups = hits + misses + shared
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "shared_versions": self.shared_versions,
+                "hits": hits,
+                "misses": misses,
+                "shared": shared,
+                "hit_rate": round((hits + shared) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "reports": reports,
+            }
+
+
+report_cache = ReportCache(
+    maxsize=int(os.getenv("REPORT_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("REPORT_CACHE_TTL", "300")),
+    shared_versions=_env_bool("REPORT_CACHE_SHARED_VERSIONS", False),
+)
+
+
+def bump_table_versions(connection, tables):
+    """Increment the shared version of each table, creating missing rows."""
+    table = TableVersion.__table__
+    tables = sorted(tables)
+    result = connection.execute(
+        update(table)
+        .where(table.c.name.in_(tables))
+        .values(version=table.c.version + 1)
+    )
+    if result.rowcount < len(tables):
+        existing = set(
+            connection.execute(
+                select(table.c.name).where(table.c.name.in_(tables))
+            ).scalars()
+        )
+        connection.execute(
+            insert(table),
+            [{"name": name, "version": 1} for name in tables if name not in existing],
+        )
+
+
+# Tables written by a session, through the unit of work or with UPDATE,
+# DELETE and INSERT statements, invalidate the reports that read them once
+# the transaction commits.
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    written = session.info.setdefault("written_tables", set())
+    for obj in (*session.new, *session.deleted):
+        written.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            written.add(obj.__table__.name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_tables(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        written = orm_execute_state.session.info.setdefault("written_tables", set())
+        written.add(orm_execute_state.statement.table.name)
+
+
+# The shared versions are bumped inside the committing transaction, so no
+# other process can see the write without also seeing the new versions.
+# Tables no report reads (report job heartbeats, patient assignments) are skipped, so
+# their commits do not queue on the table_versions rows.
+@event.listens_for(Session, "before_commit")
+def _bump_shared_table_versions(session):
+    if not (report_cache.enabled and report_cache.shared_versions):
+        return
+    # Flush first so tables written by the commit's own flush are included
+    session.flush()
+    written = session.info.get("written_tables", set()) & report_cache.report_tables
+    if written:
+        bump_table_versions(session.connection(), written)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_tables(session):
+    written = session.info.pop("written_tables", None)
+    if written:
+        report_cache.invalidate_tables(written)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_tables(session):
+    session.info.pop("written_tables", None)
@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+
+from . import crud
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def _doctors_patients(db, params):
+    return crud.reports.get_doctor_patient_report(
+        db, include_patients=params["include_patients"]
+    )
+
+
+def _patient_treatments(db, params):
+    return crud.reports.get_patient_treatment_report(
+        db,
+        params["patient_id"],
+        skip=params["skip"],
+        limit=params["limit"],
+        # Jobs queued before the cap existed do not carry it
+        applications_limit=params.get(
+            "applications_limit", crud.reports.APPLICATIONS_PER_TREATMENT
+        ),
+    )
+
+
+# Reports that can run as jobs: name -> (compute, parameters it takes)
+REPORTS = {
+    "doctors-patients": (_doctors_patients, ("include_patients",)),
+    "patient-treatments": (
+        _patient_treatments,
+        ("patient_id", "skip", "limit", "applications_limit"),
+    ),
+}
+
+
+class ReportJobRunner:
+    """Runs queued report jobs on a worker pool of its own.
+
+    Job state lives in the report_jobs table, so a job queued or interrupted
+    before a restart is picked up again by resume(). Workers claim a job
+    with a conditional UPDATE, so each job runs once even when several
+    processes resume the same table.
+
+    While a job runs its heartbeat is refreshed every heartbeat_interval
+    seconds. A sweeper thread started by resume() requeues running jobs
+    whose heartbeat is older than stale_after, so a job whose process died
+    is run again even if no process restarts after it.
+
+    A job's progress is a phase indicator (see crud.report_jobs): claimed,
+    computed and stored, not a measure of how much of the report is done.
+    """
+
+    def __init__(self, max_workers=2, stale_after=60, heartbeat_interval=10):
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="report-job"
+        )
+        self._lock = threading.Lock()
+        self._active = set()
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.queued = 0
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def submit(self, job_id):
+        # Running jobs need their heartbeats refreshed
+        self._start_sweeper()
+        with self._lock:
+            self.queued += 1
+        return self._executor.submit(self._run, job_id)
+
+    def _stale_before(self):
+        return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+            seconds=self.stale_after
+        )
+
+    def resume(self):
+        """Queue the jobs left queued or interrupted by a previous process.
+
+        Also starts the sweeper that keeps heartbeats fresh and requeues
+        jobs that go stale later on.
+        """
+        with SessionLocal() as db:
+            job_ids = crud.report_jobs.requeue_report_jobs(db, self._stale_before())
+        for job_id in job_ids:
+            self.submit(job_id)
+        self._start_sweeper()
+        return job_ids
+
+    def sweep(self):
+        """Refresh this process's heartbeats and requeue stale jobs."""
+        with self._lock:
+            active = list(self._active)
+        with SessionLocal() as db:
+            if active:
+                crud.report_jobs.beat_report_jobs(db, active)
+            job_ids = crud.report_jobs.requeue_stale_report_jobs(
+                db, self._stale_before()
+            )
+        for job_id in job_ids:
+            logger.warning("Requeued report job %s after a stale heartbeat", job_id)
+            self.submit(job_id)
+        return job_ids
+
+    def _start_sweeper(self):
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._stop.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop, name="report-job-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Report job sweep failed")
+
+    def stop(self):
+        """Stop the sweeper; running jobs are left to finish."""
+        with self._lock:
+            sweeper, self._sweeper = self._sweeper, None
+        self._stop.set()
+        if sweeper is not None:
+            sweeper.join()
+
+    def _run(self, job_id):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            with SessionLocal() as db:
+                if not crud.report_jobs.claim_report_job(db, job_id):
+                    return
+                with self._lock:
+                    self._active.add(job_id)
+                job = crud.report_jobs.get_report_job(db, job_id)
+                compute, _ = REPORTS[job.report]
+                try:
+                    result = jsonable_encoder(compute(db, job.params))
+                    crud.report_jobs.set_report_job_progress(
+                        db, job_id, crud.report_jobs.PROGRESS_COMPUTED
+                    )
+                except Exception as exc:
+                    logger.exception("Report job %s failed", job_id)
+                    db.rollback()
+                    crud.report_jobs.finish_report_job(db, job_id, error=str(exc))
+                    with self._lock:
+                        self.failed += 1
+                    return
+                crud.report_jobs.finish_report_job(db, job_id, result=result)
+                with self._lock:
+                    self.succeeded += 1
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+                self.running -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": self.running,
+                "queued": self.queued,
+                "utilization": round(self.running / self.max_workers, 3),
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+            }
+
+
+report_job_runner = ReportJobRunner(
+    max_workers=int(os.getenv("REPORT_JOB_WORKERS", "2")),
+    stale_after=int(os.getenv("REPORT_JOB_STALE_SECONDS", "60")),
+    heartbeat_interval=int(os.getenv("REPORT_JOB_HEARTBEAT_SECONDS", "10")),
+)
@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from .. import crud, models, schemas
-from ..dependencies import get_db
+from .. import crud, schemas
+from ..dependencies import get_async_db
 from ..auth_utils import (
-    get_current_user_by_email,
+    get_optional_principal_async,
+    get_principal_async,
     check_general_manager,
     check_doctor_or_manager,
     check_assistant,
 )
+from ..principal_cache import Principal
+from ..pagination import decode_cursor, set_next_cursor
+from ..bulk import (
+    BULK_REQUEST_BODY,
+    bulk_errors,
+    bulk_result,
+    read_bulk_rows,
+    validate_bulk_rows,
+)
 
 router = APIRouter(
     prefix="/assistants",
@@ -19,122 +29,130 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[schemas.AssistantList])
-def read_assistants(
+async def read_assistants(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get all assistants.
+    Get all assistants, ordered by id.
+
+    Pass the X-Next-Cursor header of a full page as `after` to fetch the next one.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
-    assistants = crud.assistants.get_assistants(db, skip=skip, limit=limit)
+    assistants = await crud.aio.assistants.get_assistants(
+        db, skip=skip, limit=limit, after_id=decode_cursor(after)
+    )
+    set_next_cursor(response, assistants, limit)
     return assistants
 
 
 @router.post("/", response_model=schemas.Assistant)
-def create_assistant(
+async def create_assistant(
     assistant: schemas.AssistantCreate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a new assistant.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
     # Check if email already exists
-    db_user = crud.users.get_user_by_email(db, email=assistant.email)
+    db_user = await crud.aio.users.get_user_by_email(db, email=assistant.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    return crud.assistants.create_assistant(db=db, assistant=assistant)
+    return await crud.aio.assistants.create_assistant(db=db, assistant=assistant)
 
 
 @router.get("/{assistant_id}", response_model=schemas.Assistant)
-def read_assistant(
-    assistant_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+async def read_assistant(
+    assistant_id: int,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get a specific assistant by ID.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
-    db_assistant = crud.assistants.get_assistant(db, assistant_id=assistant_id)
+    db_assistant = await crud.aio.assistants.get_assistant(
+        db, assistant_id=assistant_id
+    )
     if db_assistant is None:
         raise HTTPException(status_code=404, detail="Assistant not found")
     return db_assistant
 
 
 @router.put("/{assistant_id}", response_model=schemas.Assistant)
-def update_assistant(
+async def update_assistant(
     assistant_id: int,
     assistant: schemas.AssistantUpdate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update an assistant's information.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
-    db_assistant = crud.assistants.get_assistant(db, assistant_id=assistant_id)
-    if db_assistant is None:
-        raise HTTPException(status_code=404, detail="Assistant not found")
-
-    updated_assistant = crud.assistants.update_assistant(
+    updated_assistant = await crud.aio.assistants.update_assistant(
         db, assistant_id=assistant_id, assistant=assistant
     )
+    if updated_assistant is None:
+        raise HTTPException(status_code=404, detail="Assistant not found")
     return updated_assistant
 
 
 @router.delete("/{assistant_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_assistant(
-    assistant_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+async def delete_assistant(
+    assistant_id: int,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete (deactivate) an assistant.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
-    db_assistant = crud.assistants.get_assistant(db, assistant_id=assistant_id)
+    db_assistant = await crud.aio.assistants.get_assistant(
+        db, assistant_id=assistant_id
+    )
     if db_assistant is None:
         raise HTTPException(status_code=404, detail="Assistant not found")
 
-    success = crud.assistants.delete_assistant(db, assistant_id=assistant_id)
+    success = await crud.aio.assistants.delete_assistant(db, assistant_id=assistant_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete assistant")
 
 
 # Patient Assignment endpoints
 @router.get("/patients/assignments", response_model=List[schemas.PatientAssistant])
-def get_patient_assignments(
+async def get_patient_assignments(
     patient_id: int = None,
     assistant_id: int = None,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get all patient-assistant assignments.
@@ -143,72 +161,58 @@ def get_patient_assignments(
     Only doctors and general managers have full access.
     Assistants can only view their own assignments.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-
-        # If assistant, they can only see their own assignments
-        if current_user.role == "assistant":
-            db_assistant = (
-                db.query(models.Assistant)
-                .filter(models.Assistant.user_id == current_user.id)
-                .first()
-            )
-            if not db_assistant:
-                raise HTTPException(
-                    status_code=404, detail="Assistant profile not found"
-                )
-            assistant_id = db_assistant.id
+    # If assistant, they can only see their own assignments
+    if principal and principal.role == "assistant":
+        if principal.assistant_id is None:
+            raise HTTPException(status_code=404, detail="Assistant profile not found")
+        assistant_id = principal.assistant_id
 
-    assignments = crud.assistants.get_patient_assistants(
+    assignments = await crud.aio.assistants.get_patient_assistants(
         db, patient_id=patient_id, assistant_id=assistant_id
     )
     return assignments
 
 
 @router.post("/patients/assign", response_model=schemas.PatientAssistant)
-def assign_patient_to_assistant(
+async def assign_patient_to_assistant(
     assignment: schemas.PatientAssistantCreate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Assign a patient to an assistant.
     Only doctors and general managers can make assignments.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_doctor_or_manager(current_user)
+    doctor_id = None
+    if principal:
+        check_doctor_or_manager(principal)
 
         # Get doctor ID if it's a doctor making the assignment
-        doctor_id = None
-        if current_user.role == "doctor":
-            db_doctor = (
-                db.query(models.Doctor)
-                .filter(models.Doctor.user_id == current_user.id)
-                .first()
-            )
-            if not db_doctor:
+        if principal.role == "doctor":
+            if principal.doctor_id is None:
                 raise HTTPException(status_code=404, detail="Doctor profile not found")
-            doctor_id = db_doctor.id
-        elif current_user.role == "general_manager":
+            doctor_id = principal.doctor_id
+        elif principal.role == "general_manager":
             # For general manager, use first available doctor or create a system doctor
-            db_doctor = db.query(models.Doctor).first()
-            if not db_doctor:
+            db_doctors = await crud.aio.doctors.get_doctors(db, limit=1)
+            if not db_doctors:
                 # Create a system doctor if none exists
                 raise HTTPException(status_code=404, detail="No doctors in system")
-            doctor_id = db_doctor.id
+            doctor_id = db_doctors[0].id
 
     # Verify patient exists
-    patient = crud.patients.get_patient(db, patient_id=assignment.patient_id)
+    patient = await crud.aio.patients.get_patient(db, patient_id=assignment.patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
 
     # Verify assistant exists
-    assistant = crud.assistants.get_assistant(db, assistant_id=assignment.assistant_id)
+    assistant = await crud.aio.assistants.get_assistant(
+        db, assistant_id=assignment.assistant_id
+    )
     if not assistant:
         raise HTTPException(status_code=404, detail="Assistant not found")
 
-    return crud.assistants.assign_patient_to_assistant(
+    return await crud.aio.assistants.assign_patient_to_assistant(
         db, assignment=assignment, doctor_id=doctor_id
     )
 
@@ -216,21 +220,20 @@ def assign_patient_to_assistant(
 @router.put(
     "/patients/assignments/{assignment_id}", response_model=schemas.PatientAssistant
 )
-def update_assignment(
+async def update_assignment(
     assignment_id: int,
     update: schemas.PatientAssistantUpdate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update a patient-assistant assignment.
     Only doctors and general managers can update assignments.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_doctor_or_manager(current_user)
+    if principal:
+        check_doctor_or_manager(principal)
 
-    updated_assignment = crud.assistants.update_patient_assistant_assignment(
+    updated_assignment = await crud.aio.assistants.update_patient_assistant_assignment(
         db, assignment_id, update
     )
     if not updated_assignment:
@@ -241,46 +244,31 @@ def update_assignment(
 
 # Treatment application endpoints
 @router.post("/treatments/apply", response_model=schemas.TreatmentApplication)
-def apply_treatment(
+async def apply_treatment(
     application: schemas.TreatmentApplicationCreate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Record a treatment application by an assistant.
     Only assistants can apply treatments.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_assistant(current_user)
-
-        # Get assistant ID
-        db_assistant = (
-            db.query(models.Assistant)
-            .filter(models.Assistant.user_id == current_user.id)
-            .first()
-        )
-        if not db_assistant:
+    if principal:
+        check_assistant(principal)
+
+        if principal.assistant_id is None:
             raise HTTPException(status_code=404, detail="Assistant profile not found")
 
         # Verify the assistant is assigned to the patient receiving this treatment
-        treatment = (
-            db.query(models.Treatment)
-            .filter(models.Treatment.id == application.treatment_id)
-            .first()
+        treatment = await crud.aio.treatments.get_treatment(
+            db, application.treatment_id
         )
         if not treatment:
             raise HTTPException(status_code=404, detail="Treatment not found")
 
         # Check if assistant is assigned to this patient
-        assignment = (
-            db.query(models.PatientAssistant)
-            .filter(
-                models.PatientAssistant.assistant_id == db_assistant.id,
-                models.PatientAssistant.patient_id == treatment.patient_id,
-                models.PatientAssistant.is_active == True,
-            )
-            .first()
+        assignment = await crud.aio.assistants.get_active_assignment(
+            db, principal.assistant_id, treatment.patient_id
         )
 
         if not assignment:
@@ -289,39 +277,72 @@ def apply_treatment(
                 detail="You are not assigned to the patient receiving this treatment",
             )
 
-        return crud.treatments.apply_treatment(db, application, db_assistant.id)
+        return await crud.aio.treatments.apply_treatment(
+            db, application, principal.assistant_id
+        )
+
+
+@router.post(
+    "/treatments/apply/bulk",
+    response_model=schemas.BulkResult,
+    openapi_extra=BULK_REQUEST_BODY,
+)
+async def apply_treatments_bulk(
+    request: Request,
+    all_or_nothing: bool = False,
+    principal: Principal = Depends(get_principal_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Record many treatment applications at once, e.g. after a ward round, from
+    a JSON array or an NDJSON stream of TreatmentApplicationCreate objects.
+
+    Every assignment is checked with a single query and the accepted rows are
+    inserted in one transaction. Rows for unknown treatments or for patients not
+    assigned to the caller are reported per row. With all_or_nothing=true any
+    rejected row rejects the batch.
+
+    Only assistants can apply treatments.
+    """
+    check_assistant(principal)
+    if principal.assistant_id is None:
+        raise HTTPException(status_code=404, detail="Assistant profile not found")
+
+    rows, errors = await read_bulk_rows(request)
+    valid, errors = validate_bulk_rows(schemas.TreatmentApplicationCreate, rows, errors)
+    if errors and all_or_nothing:
+        raise HTTPException(status_code=422, detail=bulk_errors(errors))
+
+    created, ids, rejected = await crud.aio.treatments.apply_treatments_bulk(
+        db, valid, principal.assistant_id, all_or_nothing
+    )
+    errors.update(rejected)
+    if errors and all_or_nothing:
+        raise HTTPException(status_code=422, detail=bulk_errors(errors))
+
+    return bulk_result(len(rows), created, ids, errors)
 
 
 @router.get(
     "/treatments/applications", response_model=List[schemas.TreatmentApplication]
 )
-def get_treatment_applications(
+async def get_treatment_applications(
     treatment_id: int = None,
     assistant_id: int = None,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get treatment applications.
     Filter by treatment_id or assistant_id if provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-
-        # If assistant, they can only see their own applications
-        if current_user.role == "assistant":
-            db_assistant = (
-                db.query(models.Assistant)
-                .filter(models.Assistant.user_id == current_user.id)
-                .first()
-            )
-            if not db_assistant:
-                raise HTTPException(
-                    status_code=404, detail="Assistant profile not found"
-                )
-            assistant_id = db_assistant.id
+    # If assistant, they can only see their own applications
+    if principal and principal.role == "assistant":
+        if principal.assistant_id is None:
+            raise HTTPException(status_code=404, detail="Assistant profile not found")
+        assistant_id = principal.assistant_id
 
-    applications = crud.treatments.get_treatment_applications(
+    applications = await crud.aio.treatments.get_treatment_applications(
         db, treatment_id=treatment_id, assistant_id=assistant_id
     )
     return applications
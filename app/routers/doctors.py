@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from .. import crud, schemas
-from ..dependencies import get_db
-from ..auth_utils import get_current_user_by_email, check_general_manager
+from ..dependencies import get_async_db
+from ..auth_utils import get_optional_principal_async, check_general_manager
+from ..principal_cache import Principal
+from ..pagination import decode_cursor, set_next_cursor
 
 router = APIRouter(
     prefix="/doctors",
@@ -14,108 +16,114 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[schemas.DoctorList])
-def read_doctors(
+async def read_doctors(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get all doctors.
+    Get all doctors, ordered by id.
+
+    Pass the X-Next-Cursor header of a full page as `after` to fetch the next one.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
-    doctors = crud.doctors.get_doctors(db, skip=skip, limit=limit)
+    doctors = await crud.aio.doctors.get_doctors(
+        db, skip=skip, limit=limit, after_id=decode_cursor(after)
+    )
+    set_next_cursor(response, doctors, limit)
     return doctors
 
 
 @router.post("/", response_model=schemas.Doctor)
-def create_doctor(
+async def create_doctor(
     doctor: schemas.DoctorCreate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a new doctor.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
     # Check if email already exists
-    db_user = crud.users.get_user_by_email(db, email=doctor.email)
+    db_user = await crud.aio.users.get_user_by_email(db, email=doctor.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    return crud.doctors.create_doctor(db=db, doctor=doctor)
+    return await crud.aio.doctors.create_doctor(db=db, doctor=doctor)
 
 
 @router.get("/{doctor_id}", response_model=schemas.Doctor)
-def read_doctor(
-    doctor_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+async def read_doctor(
+    doctor_id: int,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get a specific doctor by ID.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
-    db_doctor = crud.doctors.get_doctor(db, doctor_id=doctor_id)
+    db_doctor = await crud.aio.doctors.get_doctor(db, doctor_id=doctor_id)
     if db_doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
     return db_doctor
 
 
 @router.put("/{doctor_id}", response_model=schemas.Doctor)
-def update_doctor(
+async def update_doctor(
     doctor_id: int,
     doctor: schemas.DoctorUpdate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update a doctor's information.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
-    db_doctor = crud.doctors.get_doctor(db, doctor_id=doctor_id)
-    if db_doctor is None:
+    updated_doctor = await crud.aio.doctors.update_doctor(
+        db, doctor_id=doctor_id, doctor=doctor
+    )
+    if updated_doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
-
-    updated_doctor = crud.doctors.update_doctor(db, doctor_id=doctor_id, doctor=doctor)
     return updated_doctor
 
 
 @router.delete("/{doctor_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_doctor(
-    doctor_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+async def delete_doctor(
+    doctor_id: int,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete (deactivate) a doctor.
 
     Only general managers have access to this endpoint if current_user_email is provided.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_general_manager(current_user)
+    if principal:
+        check_general_manager(principal)
 
-    db_doctor = crud.doctors.get_doctor(db, doctor_id=doctor_id)
+    db_doctor = await crud.aio.doctors.get_doctor(db, doctor_id=doctor_id)
     if db_doctor is None:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    success = crud.doctors.delete_doctor(db, doctor_id=doctor_id)
+    success = await crud.aio.doctors.delete_doctor(db, doctor_id=doctor_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete doctor")
@@ -0,0 +1,107 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from .. import crud
+from ..auth_utils import get_principal, check_doctor_or_manager
+from ..exports import stream_export
+from ..principal_cache import Principal
+
+router = APIRouter(
+    prefix="/exports",
+    tags=["exports"],
+    responses={403: {"description": "Not enough permissions"}},
+)
+
+ExportFormat = Literal["csv", "ndjson"]
+
+
+def _own_doctor_id(principal: Principal):
+    """None for general managers, the doctor's id for doctors."""
+    if principal.role == "general_manager":
+        return None
+    if principal.role == "doctor":
+        if principal.doctor_id is None:
+            raise HTTPException(status_code=404, detail="Doctor profile not found")
+        return principal.doctor_id
+    raise HTTPException(
+        status_code=403,
+        detail="Only doctors and general managers can export this data",
+    )
+
+
+@router.get("/patients")
+def export_patients(
+    format: ExportFormat = "csv",
+    principal: Principal = Depends(get_principal),
+):
+    """
+    Stream every patient as CSV or NDJSON, ordered by id.
+    Only doctors and general managers have access to this endpoint.
+    """
+    check_doctor_or_manager(principal)
+    return stream_export(crud.exports.export_patients, format, "patients")
+
+
+@router.get("/treatments")
+def export_treatments(
+    format: ExportFormat = "csv",
+    principal: Principal = Depends(get_principal),
+):
+    """
+    Stream treatments as CSV or NDJSON, ordered by id.
+    General managers get every treatment, doctors the ones they prescribed.
+    """
+    doctor_id = _own_doctor_id(principal)
+    return stream_export(
+        lambda db: crud.exports.export_treatments(db, doctor_id=doctor_id),
+        format,
+        "treatments",
+    )
+
+
+@router.get("/applications")
+def export_treatment_applications(
+    format: ExportFormat = "csv",
+    principal: Principal = Depends(get_principal),
+):
+    """
+    Stream treatment applications as CSV or NDJSON, ordered by id.
+    General managers get every application, doctors those of their
+    treatments and assistants their own.
+    """
+    assistant_id = None
+    if principal.role == "assistant":
+        if principal.assistant_id is None:
+            raise HTTPException(status_code=404, detail="Assistant profile not found")
+        assistant_id = principal.assistant_id
+        doctor_id = None
+    else:
+        doctor_id = _own_doctor_id(principal)
+
+    return stream_export(
+        lambda db: crud.exports.export_treatment_applications(
+            db, doctor_id=doctor_id, assistant_id=assistant_id
+        ),
+        format,
+        "applications",
+    )
+
+
+@router.get("/reports/doctors-patients")
+def export_doctors_patients_report(
+    format: ExportFormat = "csv",
+    principal: Principal = Depends(get_principal),
+):
+    """
+    Stream the doctors-patients report as CSV or NDJSON, one row per active
+    doctor with their patient and treatment counts.
+    Only accessible by general managers.
+    """
+    if principal.role != "general_manager":
+        raise HTTPException(
+            status_code=403, detail="Only general managers can access this report"
+        )
+    return stream_export(
+        crud.exports.export_doctors_patients, format, "doctors-patients"
+    )
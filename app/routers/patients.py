@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from .. import crud, schemas
-from ..dependencies import get_db
-from ..auth_utils import get_current_user_by_email, check_doctor_or_manager
+from ..dependencies import get_async_db
+from ..auth_utils import get_optional_principal_async, check_doctor_or_manager
+from ..principal_cache import Principal
+from ..pagination import decode_cursor, set_next_cursor
+from ..bulk import (
+    BULK_REQUEST_BODY,
+    bulk_errors,
+    bulk_result,
+    read_bulk_rows,
+    validate_bulk_rows,
+)
 
 router = APIRouter(
     prefix="/patients",
@@ -14,105 +23,141 @@ router = APIRouter(
 
 
 @router.get("/", response_model=List[schemas.Patient])
-def read_patients(
+async def read_patients(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get all patients.
+    Get all patients, ordered by id.
+
+    Pass the X-Next-Cursor header of a full page as `after` to fetch the next one.
 
     Only doctors and general managers have access to this endpoint.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_doctor_or_manager(current_user)
+    if principal:
+        check_doctor_or_manager(principal)
 
-    patients = crud.patients.get_patients(db, skip=skip, limit=limit)
+    patients = await crud.aio.patients.get_patients(
+        db, skip=skip, limit=limit, after_id=decode_cursor(after)
+    )
+    set_next_cursor(response, patients, limit)
     return patients
 
 
 @router.post("/", response_model=schemas.Patient)
-def create_patient(
+async def create_patient(
     patient: schemas.PatientCreate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a new patient record.
 
     Only doctors and general managers have access to this endpoint.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_doctor_or_manager(current_user)
+    if principal:
+        check_doctor_or_manager(principal)
 
-    return crud.patients.create_patient(db=db, patient=patient)
+    return await crud.aio.patients.create_patient(db=db, patient=patient)
+
+
+@router.post(
+    "/bulk", response_model=schemas.BulkResult, openapi_extra=BULK_REQUEST_BODY
+)
+async def create_patients_bulk(
+    request: Request,
+    all_or_nothing: bool = False,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Create many patients at once from a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson) of PatientCreate objects.
+
+    Valid rows are inserted in a single transaction and invalid ones are
+    reported per row. With all_or_nothing=true any invalid row rejects the batch.
+
+    Only doctors and general managers have access to this endpoint.
+    """
+    if principal:
+        check_doctor_or_manager(principal)
+
+    rows, errors = await read_bulk_rows(request)
+    valid, errors = validate_bulk_rows(schemas.PatientCreate, rows, errors)
+    if errors and all_or_nothing:
+        raise HTTPException(status_code=422, detail=bulk_errors(errors))
+
+    ids = await crud.aio.patients.create_patients_bulk(
+        db, [patient for _, patient in valid]
+    )
+    return bulk_result(len(rows), valid, ids, errors)
 
 
 @router.get("/{patient_id}", response_model=schemas.Patient)
-def read_patient(
-    patient_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+async def read_patient(
+    patient_id: int,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get a specific patient by ID.
 
     Only doctors and general managers have access to this endpoint.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_doctor_or_manager(current_user)
+    if principal:
+        check_doctor_or_manager(principal)
 
-    db_patient = crud.patients.get_patient(db, patient_id=patient_id)
+    db_patient = await crud.aio.patients.get_patient(db, patient_id=patient_id)
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     return db_patient
 
 
 @router.put("/{patient_id}", response_model=schemas.Patient)
-def update_patient(
+async def update_patient(
     patient_id: int,
     patient: schemas.PatientUpdate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update a patient's information.
 
     Only doctors and general managers have access to this endpoint.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_doctor_or_manager(current_user)
+    if principal:
+        check_doctor_or_manager(principal)
 
-    db_patient = crud.patients.get_patient(db, patient_id=patient_id)
-    if db_patient is None:
-        raise HTTPException(status_code=404, detail="Patient not found")
-
-    updated_patient = crud.patients.update_patient(
+    updated_patient = await crud.aio.patients.update_patient(
         db, patient_id=patient_id, patient=patient
     )
+    if updated_patient is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
     return updated_patient
 
 
 @router.delete("/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_patient(
-    patient_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+async def delete_patient(
+    patient_id: int,
+    principal: Optional[Principal] = Depends(get_optional_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete (deactivate) a patient record.
 
     Only doctors and general managers have access to this endpoint.
     """
-    if current_user_email:
-        current_user = get_current_user_by_email(db, current_user_email)
-        check_doctor_or_manager(current_user)
+    if principal:
+        check_doctor_or_manager(principal)
 
-    db_patient = crud.patients.get_patient(db, patient_id=patient_id)
+    db_patient = await crud.aio.patients.get_patient(db, patient_id=patient_id)
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    success = crud.patients.delete_patient(db, patient_id=patient_id)
+    success = await crud.aio.patients.delete_patient(db, patient_id=patient_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete patient")
@@ -0,0 +1,35 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from ..auth_utils import get_principal, check_general_manager
+from ..principal_cache import Principal
+from ..profiling import load_profile
+
+router = APIRouter(
+    prefix="/profiles",
+    tags=["profiles"],
+    responses={404: {"description": "Profile not found"}},
+)
+
+
+@router.get("/{profile_id}")
+def read_profile(
+    profile_id: str,
+    format: Literal["json", "folded"] = "json",
+    principal: Principal = Depends(get_principal),
+):
+    """
+    Get a stored request profile.
+    `json` returns the time per layer and the call tree; `folded` returns
+    collapsed stacks for flame graph tools.
+    Only general managers have access to this endpoint.
+    """
+    check_general_manager(principal)
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse("\n".join(profile["folded"]) + "\n")
+    return profile
@@ -1,11 +1,14 @@
-from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import List, Dict, Any, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from collections import defaultdict
 
 from .. import crud, models, schemas
 from ..dependencies import get_db
-from ..auth_utils import get_current_user_by_email, check_general_manager
+from ..auth_utils import get_principal
+from ..principal_cache import Principal
+from ..report_cache import report_cache
+from ..report_jobs import REPORTS, report_job_runner
 
 router = APIRouter(
     prefix="/reports",
@@ -13,153 +16,266 @@ router = APIRouter(
     responses={404: {"description": "Report not found"}},
 )
 
+# Tables each report reads; a committed write to any of them drops the
+# report's cached results. The maintained tables are written alongside the
+# tables they summarize, which are listed too.
+DOCTORS_PATIENTS_TABLES = (
+    "doctor_stats",
+    "doctors",
+    "users",
+    "patients",
+    "treatments",
+)
+PATIENT_TREATMENTS_TABLES = (
+    "patients",
+    "treatments",
+    "treatment_applications",
+    "doctors",
+    "assistants",
+    "users",
+)
+APPLICATIONS_ROLLUP_TABLES = (
+    "treatment_application_rollups",
+    "treatment_applications",
+)
+report_cache.register_tables(
+    DOCTORS_PATIENTS_TABLES + PATIENT_TREATMENTS_TABLES + APPLICATIONS_ROLLUP_TABLES
+)
+
+
+def check_general_manager_report(principal: Principal):
+    if principal.role != "general_manager":
+        raise HTTPException(
+            status_code=403, detail="Only general managers can access this report"
+        )
+
+
+def check_patient_report_access(db: Session, principal: Principal, patient_id: int):
+    # Check if patient exists
+    patient = crud.patients.get_patient(db, patient_id)
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    # Check permissions
+    if principal.role == "doctor":
+        # If user is a doctor, they can only access their own patients
+        if principal.doctor_id is None:
+            raise HTTPException(status_code=404, detail="Doctor profile not found")
+
+        # The key fix: check if this patient belongs to this doctor
+        if patient.doctor_id != principal.doctor_id:
+            raise HTTPException(
+                status_code=403,
+                detail="You can only access treatment reports for your own patients",
+            )
+    elif principal.role != "general_manager":
+        raise HTTPException(
+            status_code=403,
+            detail="Only doctors and general managers can access this report",
+        )
+
 
 @router.get("/doctors-patients", response_model=Dict[str, Any])
 def get_doctors_patients_report(
-    current_user_email: str = None, db: Session = Depends(get_db)
+    include_patients: bool = True,
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
 ):
     """
     Get a report of all doctors and their associated patients with statistics.
     Only accessible by general managers.
-    """
-    if not current_user_email:
-        raise HTTPException(status_code=401, detail="Authentication required")
-
-    current_user = get_current_user_by_email(db, current_user_email)
 
+    Counts come from the maintained doctor_stats table. Pass
+    include_patients=false to leave out the patient lists, so the report
+    reads one row per doctor.
+    """
     # Check if user is general_manager
-    if current_user.role != "general_manager":
-        raise HTTPException(
-            status_code=403, detail="Only general managers can access this report"
-        )
+    check_general_manager_report(principal)
 
-    # Get all active doctors with their user information
-    doctors_query = (
-        db.query(models.Doctor, models.User)
-        .join(models.User, models.Doctor.user_id == models.User.id)
-        .filter(models.User.is_active == True)
-        .all()
+    return report_cache.get_or_compute(
+        "doctors-patients",
+        {"include_patients": include_patients},
+        DOCTORS_PATIENTS_TABLES,
+        lambda: crud.reports.get_doctor_patient_report(
+            db, include_patients=include_patients
+        ),
+        db=db,
     )
 
-    report = {
-        "doctors": [],
-        "statistics": {
-            "total_doctors": 0,
-            "total_patients": 0,
-            "patients_per_doctor": {},
-            "treatments_per_doctor": {},
-            "avg_patients_per_doctor": 0,
+
+@router.get("/patients/{patient_id}/treatments", response_model=List[Dict[str, Any]])
+def get_patient_treatments_report(
+    patient_id: int,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    applications_limit: int = Query(
+        crud.reports.APPLICATIONS_PER_TREATMENT,
+        ge=0,
+        le=crud.reports.MAX_APPLICATIONS_PER_TREATMENT,
+    ),
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Get a report with all treatments applied to a specific patient.
+    Only accessible by general managers and the patient's doctor.
+
+    Long histories can be paged through with skip and limit, which count
+    treatments. Each treatment lists its first applications_limit
+    applications and gives the full number in application_count.
+    """
+    check_patient_report_access(db, principal, patient_id)
+
+    # Get patient treatment report from crud
+    return report_cache.get_or_compute(
+        "patient-treatments",
+        {
+            "patient_id": patient_id,
+            "skip": skip,
+            "limit": limit,
+            "applications_limit": applications_limit,
         },
-    }
+        PATIENT_TREATMENTS_TABLES,
+        lambda: crud.reports.get_patient_treatment_report(
+            db,
+            patient_id,
+            skip=skip,
+            limit=limit,
+            applications_limit=applications_limit,
+        ),
+        db=db,
+    )
 
-    doctor_treatment_counts = {}
-    all_patients_count = 0
 
-    # Process each doctor and their patients
-    for doctor_obj, user_obj in doctors_query:
-        doctor_id = doctor_obj.id
+@router.get(
+    "/applications/rollup", response_model=List[schemas.ApplicationRollupBucket]
+)
+def get_applications_rollup(
+    granularity: Literal["hour", "day", "week"] = "day",
+    group_by: Literal["treatment", "assistant", "doctor"] = "treatment",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    treatment_id: Optional[int] = None,
+    assistant_id: Optional[int] = None,
+    doctor_id: Optional[int] = None,
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Get treatment application counts per hour, day or week, grouped by
+    treatment, assistant or doctor, between start and end (exclusive).
+    Counts come from a maintained hourly aggregate, not the raw applications.
+    Weeks start on Monday and times are UTC.
 
-        # Get patients for this doctor
-        patients = (
-            db.query(models.Patient)
-            .filter(
-                models.Patient.doctor_id == doctor_id, models.Patient.is_active == True
-            )
-            .all()
+    Only accessible by general managers, and by doctors for their own treatments.
+    """
+    if principal.role == "doctor":
+        if principal.doctor_id is None:
+            raise HTTPException(status_code=404, detail="Doctor profile not found")
+        doctor_id = principal.doctor_id
+    elif principal.role != "general_manager":
+        raise HTTPException(
+            status_code=403,
+            detail="Only doctors and general managers can access this report",
         )
 
-        # Get treatments created by this doctor
-        treatments = (
-            db.query(models.Treatment)
-            .filter(models.Treatment.doctor_id == doctor_id)
-            .all()
-        )
+    params = {
+        "granularity": granularity,
+        "group_by": group_by,
+        "start": start,
+        "end": end,
+        "treatment_id": treatment_id,
+        "assistant_id": assistant_id,
+        "doctor_id": doctor_id,
+    }
+    return report_cache.get_or_compute(
+        "applications-rollup",
+        params,
+        APPLICATIONS_ROLLUP_TABLES,
+        lambda: crud.rollups.get_application_rollup(db, **params),
+        db=db,
+    )
 
-        doctor_data = {
-            "id": doctor_id,
-            "name": user_obj.full_name,
-            "email": user_obj.email,
-            "specialization": (
-                doctor_obj.specialization
-                if hasattr(doctor_obj, "specialization")
-                else ""
-            ),
-            "patients": [],
-            "patient_count": len(patients),
-            "treatment_count": len(treatments),
-        }
-
-        # Add patient details
-        for patient in patients:
-            doctor_data["patients"].append(
-                {
-                    "id": patient.id,
-                    "name": f"{patient.first_name} {patient.last_name}",
-                }
-            )
 
-        report["doctors"].append(doctor_data)
-        doctor_treatment_counts[doctor_id] = len(treatments)
-        all_patients_count += len(patients)
+def report_job_response(job: models.ReportJob):
+    response = schemas.ReportJob.model_validate(job)
+    if job.status == "succeeded":
+        response.result_url = f"/reports/jobs/{job.id}/result"
+    return response
 
-    # Calculate statistics
-    total_doctors = len(doctors_query)
-    report["statistics"]["total_doctors"] = total_doctors
-    report["statistics"]["total_patients"] = all_patients_count
 
-    if total_doctors > 0:
-        report["statistics"]["avg_patients_per_doctor"] = round(
-            all_patients_count / total_doctors, 2
+def get_own_report_job(db: Session, principal: Principal, job_id: int):
+    job = crud.report_jobs.get_report_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if principal.role != "general_manager" and job.requested_by != principal.id:
+        raise HTTPException(
+            status_code=403, detail="You can only access your own report jobs"
         )
-
-    # Add patient count per doctor
-    for doc in report["doctors"]:
-        report["statistics"]["patients_per_doctor"][str(doc["id"])] = doc[
-            "patient_count"
-        ]
-        report["statistics"]["treatments_per_doctor"][str(doc["id"])] = doc[
-            "treatment_count"
-        ]
-
-    return report
+    return job
 
 
-@router.get("/patients/{patient_id}/treatments", response_model=List[Dict[str, Any]])
-def get_patient_treatments_report(
-    patient_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+@router.post(
+    "/jobs", response_model=schemas.ReportJob, status_code=status.HTTP_202_ACCEPTED
+)
+def create_report_job(
+    job: schemas.ReportJobCreate,
+    response: Response,
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
 ):
     """
-    Get a report with all treatments applied to a specific patient.
-    Only accessible by general managers and the patient's doctor.
+    Queue a report run on the background report workers and return at once.
+    Poll the job at the Location header until its status is succeeded, then
+    download the stored result from result_url.
+
+    Access rules are those of the report being run.
     """
-    if not current_user_email:
-        raise HTTPException(status_code=401, detail="Authentication required")
+    if job.report == "doctors-patients":
+        check_general_manager_report(principal)
+    else:
+        if job.patient_id is None:
+            raise HTTPException(
+                status_code=422, detail="patient_id is required for this report"
+            )
+        check_patient_report_access(db, principal, job.patient_id)
 
-    current_user = get_current_user_by_email(db, current_user_email)
+    _, parameters = REPORTS[job.report]
+    db_job = crud.report_jobs.create_report_job(
+        db, job.report, job.model_dump(include=set(parameters)), principal.id
+    )
+    report_job_runner.submit(db_job.id)
 
-    # Check if patient exists
-    patient = crud.patients.get_patient(db, patient_id)
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
+    response.headers["Location"] = f"/reports/jobs/{db_job.id}"
+    return report_job_response(db_job)
 
-    # Check permissions
-    if current_user.role == "doctor":
-        # If user is a doctor, they can only access their own patients
-        doctor = crud.doctors.get_doctor_by_user_id(db, current_user.id)
-        if not doctor:
-            raise HTTPException(status_code=404, detail="Doctor profile not found")
 
-        # The key fix: check if this patient belongs to this doctor
-        if patient.doctor_id != doctor.id:
-            raise HTTPException(
-                status_code=403,
-                detail="You can only access treatment reports for your own patients",
-            )
-    elif current_user.role != "general_manager":
+@router.get("/jobs/{job_id}", response_model=schemas.ReportJob)
+def get_report_job(
+    job_id: int,
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the status and progress of a report job.
+    Only accessible by the user who queued it and by general managers.
+    """
+    return report_job_response(get_own_report_job(db, principal, job_id))
+
+
+@router.get("/jobs/{job_id}/result")
+def get_report_job_result(
+    job_id: int,
+    principal: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Download the result of a finished report job.
+    Only accessible by the user who queued it and by general managers.
+    """
+    job = get_own_report_job(db, principal, job_id)
+    if job.status != "succeeded":
         raise HTTPException(
-            status_code=403,
-            detail="Only doctors and general managers can access this report",
+            status_code=409, detail=f"Report job is {job.status}, not succeeded"
         )
-
-    # Get patient treatment report from crud
-    return crud.reports.get_patient_treatment_report(db, patient_id)
+    return job.result
@@ -0,0 +1,62 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from ..dependencies import get_db
+from ..auth_utils import get_optional_principal, check_general_manager
+from ..principal_cache import Principal
+from ..bulk import (
+    BULK_REQUEST_BODY,
+    bulk_errors,
+    bulk_result,
+    read_bulk_rows,
+    validate_bulk_rows,
+)
+
+router = APIRouter(
+    prefix="/staff",
+    tags=["staff"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.post(
+    "/bulk", response_model=schemas.BulkResult, openapi_extra=BULK_REQUEST_BODY
+)
+async def onboard_staff(
+    request: Request,
+    all_or_nothing: bool = False,
+    principal: Optional[Principal] = Depends(get_optional_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Onboard many doctors and assistants at once from a JSON array or an NDJSON
+    stream. Each row is a DoctorCreate or AssistantCreate object with a `role`
+    of "doctor" or "assistant".
+
+    Duplicate emails are checked with a single query, passwords are hashed in
+    parallel and all rows are written in one transaction. The returned ids are
+    the doctor/assistant profile ids.
+
+    Only general managers have access to this endpoint if current_user_email is provided.
+    """
+    if principal:
+        check_general_manager(principal)
+
+    rows, errors = await read_bulk_rows(request)
+    valid, errors = validate_bulk_rows(schemas.StaffOnboarding, rows, errors)
+    if errors and all_or_nothing:
+        raise HTTPException(status_code=422, detail=bulk_errors(errors))
+
+    # Hashing and the sync session block, so they run off the event loop
+    created, ids, duplicates = await run_in_threadpool(
+        crud.staff.onboard_staff, db, valid, all_or_nothing
+    )
+    errors.update(duplicates)
+    if errors and all_or_nothing:
+        raise HTTPException(status_code=422, detail=bulk_errors(errors))
+
+    return bulk_result(len(rows), created, ids, errors)
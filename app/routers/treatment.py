@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from .. import crud, schemas
-from ..dependencies import get_db
-from ..auth_utils import get_current_user_by_email, check_doctor_or_manager
+from ..dependencies import get_async_db
+from ..auth_utils import get_principal_async, check_doctor_or_manager
+from ..principal_cache import Principal
+from ..pagination import decode_cursor, set_next_cursor
 
 router = APIRouter(
     prefix="/treatments",
@@ -14,49 +16,45 @@ router = APIRouter(
 
 
 @router.post("/", response_model=schemas.Treatment)
-def create_treatment(
+async def create_treatment(
     treatment: schemas.TreatmentCreate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a new treatment.
     Doctors can only create treatments for their own patients.
     General managers can create treatments for any patient.
     """
-    if not current_user_email:
-        raise HTTPException(status_code=401, detail="Authentication required")
-
-    current_user = get_current_user_by_email(db, current_user_email)
-
     # Check if user is doctor or general manager
-    if current_user.role == "doctor":
-        # If user is doctor, get their doctor profile
-        doctor = crud.doctors.get_doctor_by_user_id(db, current_user.id)
-        if not doctor:
+    if principal.role == "doctor":
+        # If user is doctor, use their doctor profile
+        if principal.doctor_id is None:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
 
         # Check if patient belongs to this doctor
-        patient = crud.patients.get_patient(db, treatment.patient_id)
+        patient = await crud.aio.patients.get_patient(db, treatment.patient_id)
         if not patient:
             raise HTTPException(status_code=404, detail="Patient not found")
 
         # Print debug info to help diagnose issues
-        print(f"Patient doctor_id: {patient.doctor_id}, Doctor id: {doctor.id}")
+        print(
+            f"Patient doctor_id: {patient.doctor_id}, Doctor id: {principal.doctor_id}"
+        )
 
-        if patient.doctor_id != doctor.id:
+        if patient.doctor_id != principal.doctor_id:
             raise HTTPException(
                 status_code=403,
                 detail="You can only create treatments for your own patients",
             )
 
-        return crud.treatments.create_treatment(
-            db=db, treatment=treatment, doctor_id=doctor.id
+        return await crud.aio.treatments.create_treatment(
+            db=db, treatment=treatment, doctor_id=principal.doctor_id
         )
-    elif current_user.role == "general_manager":
+    elif principal.role == "general_manager":
         # Get first doctor to assign as creator (this is temporary)
-        doctor = crud.doctors.get_doctors(db, limit=1)[0]
-        return crud.treatments.create_treatment(
+        doctor = (await crud.aio.doctors.get_doctors(db, limit=1))[0]
+        return await crud.aio.treatments.create_treatment(
             db=db, treatment=treatment, doctor_id=doctor.id
         )
     else:
@@ -67,143 +65,140 @@ def create_treatment(
 
 
 @router.get("/", response_model=List[schemas.Treatment])
-def read_treatments(
+async def read_treatments(
+    response: Response,
     patient_id: Optional[int] = None,
     doctor_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    principal: Principal = Depends(get_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get all treatments with optional filtering.
+    Get all treatments with optional filtering, ordered by id.
     Only doctors and general managers have access to this endpoint.
+    Pass the X-Next-Cursor header of a full page as `after` to fetch the next one.
     """
-    if not current_user_email:
-        raise HTTPException(status_code=401, detail="Authentication required")
-
-    current_user = get_current_user_by_email(db, current_user_email)
-
     # Get treatments with filters
-    treatments = crud.treatments.get_treatments(
+    treatments = await crud.aio.treatments.get_treatments(
         db=db,
         patient_id=patient_id,
         doctor_id=doctor_id,
         skip=skip,
         limit=limit,
-        current_user=current_user,
+        current_user=principal,
+        after_id=decode_cursor(after),
     )
+    set_next_cursor(response, treatments, limit)
 
     return treatments
 
 
 @router.get("/{treatment_id}", response_model=schemas.Treatment)
-def read_treatment(
-    treatment_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+async def read_treatment(
+    treatment_id: int,
+    principal: Principal = Depends(get_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get a specific treatment by ID.
     """
-    if not current_user_email:
-        raise HTTPException(status_code=401, detail="Authentication required")
-
-    current_user = get_current_user_by_email(db, current_user_email)
-
-    treatment = crud.treatments.get_treatment(db, treatment_id)
+    treatment = await crud.aio.treatments.get_treatment(db, treatment_id)
     if treatment is None:
         raise HTTPException(status_code=404, detail="Treatment not found")
 
     # Check permissions
-    if current_user.role == "doctor":
-        doctor = crud.doctors.get_doctor_by_user_id(db, current_user.id)
-        if doctor and treatment.doctor_id != doctor.id:
+    if principal.role == "doctor":
+        if (
+            principal.doctor_id is not None
+            and treatment.doctor_id != principal.doctor_id
+        ):
             raise HTTPException(
                 status_code=403,
                 detail="You can only view treatments for your own patients",
             )
-    elif current_user.role == "assistant":
-        assistant = crud.assistants.get_assistant_by_user_id(db, current_user.id)
-        if assistant:
-            assigned_patients = crud.assistants.get_patients_by_assistant(
-                db, assistant.id
+    elif principal.role == "assistant":
+        if principal.assistant_id is not None and not (
+            await crud.aio.assistants.get_active_assignment(
+                db, principal.assistant_id, treatment.patient_id
+            )
+        ):
+            raise HTTPException(
+                status_code=403,
+                detail="You can only view treatments for patients assigned to you",
             )
-            patient_ids = [p.id for p in assigned_patients]
-            if treatment.patient_id not in patient_ids:
-                raise HTTPException(
-                    status_code=403,
-                    detail="You can only view treatments for patients assigned to you",
-                )
-    elif current_user.role != "general_manager":
+    elif principal.role != "general_manager":
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     return treatment
 
 
 @router.put("/{treatment_id}", response_model=schemas.Treatment)
-def update_treatment(
+async def update_treatment(
     treatment_id: int,
     treatment: schemas.TreatmentUpdate,
-    current_user_email: str = None,
-    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update a treatment.
     Only doctors and general managers have access to this endpoint.
     """
-    if not current_user_email:
-        raise HTTPException(status_code=401, detail="Authentication required")
-
-    current_user = get_current_user_by_email(db, current_user_email)
-    check_doctor_or_manager(current_user)
+    check_doctor_or_manager(principal)
 
     # Get treatment
-    db_treatment = crud.treatments.get_treatment(db, treatment_id)
+    db_treatment = await crud.aio.treatments.get_treatment(db, treatment_id)
     if db_treatment is None:
         raise HTTPException(status_code=404, detail="Treatment not found")
 
     # If doctor, check if treatment was created by this doctor
-    if current_user.role == "doctor":
-        doctor = crud.doctors.get_doctor_by_user_id(db, current_user.id)
-        if doctor and db_treatment.doctor_id != doctor.id:
+    if principal.role == "doctor":
+        if (
+            principal.doctor_id is not None
+            and db_treatment.doctor_id != principal.doctor_id
+        ):
             raise HTTPException(
                 status_code=403, detail="You can only update treatments you created"
             )
 
-    return crud.treatments.update_treatment(db, treatment_id, treatment)
+    return await crud.aio.treatments.update_treatment(db, treatment_id, treatment)
 
 
 @router.delete("/{treatment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_treatment(
-    treatment_id: int, current_user_email: str = None, db: Session = Depends(get_db)
+async def delete_treatment(
+    treatment_id: int,
+    principal: Principal = Depends(get_principal_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete a treatment.
     Only doctors and general managers have access to this endpoint.
     """
-    if not current_user_email:
-        raise HTTPException(status_code=401, detail="Authentication required")
-
-    current_user = get_current_user_by_email(db, current_user_email)
-    check_doctor_or_manager(current_user)
+    check_doctor_or_manager(principal)
 
     # Get treatment
-    db_treatment = crud.treatments.get_treatment(db, treatment_id)
+    db_treatment = await crud.aio.treatments.get_treatment(db, treatment_id)
     if db_treatment is None:
         raise HTTPException(status_code=404, detail="Treatment not found")
 
     # If doctor, check if treatment was created by this doctor
-    if current_user.role == "doctor":
-        doctor = crud.get_doctor_by_user_id(db, current_user.id)
-        if doctor and db_treatment.doctor_id != doctor.id:
+    if principal.role == "doctor":
+        if (
+            principal.doctor_id is not None
+            and db_treatment.doctor_id != principal.doctor_id
+        ):
             raise HTTPException(
                 status_code=403, detail="You can only delete treatments you created"
             )
 
     # Check if treatment has been applied
-    applications = crud.treatments.get_treatment_applications(db, treatment_id)
+    applications = await crud.aio.treatments.get_treatment_applications(
+        db, treatment_id
+    )
     if applications:
         raise HTTPException(
             status_code=400, detail="Cannot delete treatment that has been applied"
         )
 
-    crud.treatments.delete_treatment(db, treatment_id)
+    await crud.aio.treatments.delete_treatment(db, treatment_id)
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from datetime import datetime
+
+from pydantic import BaseModel, EmailStr, Field
+from typing import Annotated, List, Literal, Optional, Union
 
 
 # User schemas
@@ -130,6 +132,21 @@ class AssistantList(AssistantBase):
         from_attributes = True
 
 
+# Staff onboarding schemas
+class DoctorOnboarding(DoctorCreate):
+    role: Literal["doctor"]
+
+
+class AssistantOnboarding(AssistantCreate):
+    role: Literal["assistant"]
+
+
+# One row of a bulk onboarding batch, told apart by its role
+StaffOnboarding = Annotated[
+    Union[DoctorOnboarding, AssistantOnboarding], Field(discriminator="role")
+]
+
+
 # Patient - Assistant Assignment schemas
 class PatientAssistantBase(BaseModel):
     patient_id: int
@@ -183,11 +200,10 @@ class Treatment(TreatmentBase):
 class TreatmentApplicationBase(BaseModel):
     treatment_id: int
     notes: Optional[str] = None
-    application_date: str
 
 
 class TreatmentApplicationCreate(TreatmentApplicationBase):
-    pass
+    application_date: datetime
 
 
 class TreatmentApplicationUpdate(BaseModel):
@@ -197,6 +213,8 @@ class TreatmentApplicationUpdate(BaseModel):
 class TreatmentApplication(TreatmentApplicationBase):
     id: int
     assistant_id: int
+    # Applications recorded before the date was stored have none
+    application_date: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -209,3 +227,53 @@ class TreatmentReport(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# Bulk operation schemas
+class BulkRowError(BaseModel):
+    index: int
+    errors: List[dict]
+
+
+class BulkResult(BaseModel):
+    created: int
+    # One entry per input row, None where the row was rejected
+    ids: List[Optional[int]]
+    errors: List[BulkRowError] = []
+
+
+# Rollup schemas
+class ApplicationRollupBucket(BaseModel):
+    bucket_start: datetime
+    # Id of the treatment, assistant or doctor the count is grouped by
+    key: int
+    count: int
+
+
+# Report job schemas
+class ReportJobCreate(BaseModel):
+    report: Literal["doctors-patients", "patient-treatments"]
+    # doctors-patients
+    include_patients: bool = True
+    # patient-treatments
+    patient_id: Optional[int] = None
+    skip: int = 0
+    limit: Optional[int] = None
+    applications_limit: int = Field(100, ge=0, le=1000)
+
+
+class ReportJob(BaseModel):
+    id: int
+    report: str
+    params: dict
+    status: str
+    progress: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Set once the job has succeeded
+    result_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,106 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TOKEN_TTL_SECONDS = int(os.getenv("TOKEN_TTL_SECONDS", "3600"))
+
+_secret = os.getenv("TOKEN_SECRET_KEY")
+if not _secret:
+    # Tokens will not survive a restart or work across worker processes
+    logger.warning("TOKEN_SECRET_KEY is not set, using a random per-process key")
+    _secret = secrets.token_urlsafe(32)
+SECRET_KEY = _secret.encode()
+
+
+class InvalidToken(Exception):
+    """Raised when a token is malformed, tampered with, expired or revoked."""
+
+
+class RevocationList:
+    """Users whose tokens issued before a given moment must be rejected.
+
+    Reactivating a user does not lift the entry: the tokens it covers stay
+    rejected and the user logs in again for a new one. Entries are only
+    needed until every token issued before the revocation has expired, so
+    they are dropped after one token lifetime.
+    """
+
+    def __init__(self, ttl=TOKEN_TTL_SECONDS):
+        self.ttl = ttl
+        self._revoked_at = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, user_id):
+        now = time.time()
+        with self._lock:
+            self._revoked_at[user_id] = now
+            self._prune(now)
+
+    def is_revoked(self, user_id, issued_at):
+        with self._lock:
+            revoked_at = self._revoked_at.get(user_id)
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def clear(self):
+        with self._lock:
+            self._revoked_at.clear()
+
+    def __len__(self):
+        return len(self._revoked_at)
+
+    def _prune(self, now):
+        for user_id, revoked_at in list(self._revoked_at.items()):
+            if revoked_at + self.ttl < now:
+                del self._revoked_at[user_id]
+
+
+revocation_list = RevocationList()
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload):
+    return hmac.new(SECRET_KEY, payload.encode(), hashlib.sha256).digest()
+
+
+def create_token(user_id, role, profile_id=None, ttl=TOKEN_TTL_SECONDS):
+    """Issue a signed token carrying the user id, role and profile id."""
+    # iat keeps sub-second precision so a token issued just after a
+    # revocation is told apart from the ones it revoked
+    now = time.time()
+    claims = {"sub": user_id, "role": role, "pid": profile_id, "iat": now}
+    claims["exp"] = int(now) + ttl
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_b64encode(_sign(payload))}"
+
+
+def decode_token(token):
+    """Verify a token's signature, expiry and revocation and return its claims."""
+    try:
+        payload, signature = token.split(".")
+        expected = _sign(payload)
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise InvalidToken("Invalid token signature")
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError) as exc:
+        raise InvalidToken("Malformed token") from exc
+
+    if claims["exp"] < time.time():
+        raise InvalidToken("Token has expired")
+    if revocation_list.is_revoked(claims["sub"], claims["iat"]):
+        raise InvalidToken("Token has been revoked")
+    return claims
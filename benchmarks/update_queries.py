@@ -0,0 +1,151 @@
+"""Queries and time per update, before and after the UPDATE ... RETURNING path.
+
+The "before" flows replay what the routers and crud writers used to do: fetch
+the row in the router, fetch it again in crud, mutate, commit, refresh, and
+let the response lazy load whatever the refresh expired. The "after" flows call
+the current crud writers. Each flow ends by building the response model, so
+the counts are what a request pays.
+
+Runs against a scratch SQLite database:
+
+    python benchmarks/update_queries.py [--iterations 500]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch}"
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.database import Base, SessionLocal, engine
+
+# The session settings the writers used before expire_on_commit was tuned
+LegacySession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = models.User(
+            email="bench@hospital.com",
+            hashed_password="x",
+            full_name="Bench Doctor",
+            role="doctor",
+        )
+        doctor = models.Doctor(user=user, specialization="Bench", experience=1)
+        patient = models.Patient(first_name="Bench", last_name="Patient", age=1)
+        treatment = models.Treatment(name="Bench", doctor=doctor, patient=patient)
+        db.add_all([user, doctor, patient, treatment])
+        db.commit()
+        return doctor.id, patient.id, treatment.id
+
+
+def legacy_update_patient(db, patient_id, i):
+    get = lambda: db.query(models.Patient).filter(models.Patient.id == patient_id)
+    get().first()  # router existence check
+    db_patient = get().first()
+    db_patient.age = i
+    db.commit()
+    db.refresh(db_patient)
+    return schemas.Patient.model_validate(db_patient)
+
+
+def legacy_update_doctor(db, doctor_id, i):
+    get = lambda: db.query(models.Doctor).filter(models.Doctor.id == doctor_id)
+    get().first()  # router existence check
+    db_doctor = get().first()
+    db_doctor.experience = i
+    db.commit()
+    db.refresh(db_doctor)
+    return schemas.Doctor.model_validate(db_doctor)
+
+
+def legacy_update_treatment(db, treatment_id, i):
+    get = lambda: db.query(models.Treatment).filter(models.Treatment.id == treatment_id)
+    get().first()  # router permission check
+    db_treatment = get().first()
+    db_treatment.description = str(i)
+    db.commit()
+    db.refresh(db_treatment)
+    return schemas.Treatment.model_validate(db_treatment)
+
+
+def update_patient(db, patient_id, i):
+    db_patient = crud.patients.update_patient(
+        db, patient_id, schemas.PatientUpdate(age=i)
+    )
+    return schemas.Patient.model_validate(db_patient)
+
+
+def update_doctor(db, doctor_id, i):
+    db_doctor = crud.doctors.update_doctor(
+        db, doctor_id, schemas.DoctorUpdate(experience=i)
+    )
+    return schemas.Doctor.model_validate(db_doctor)
+
+
+def update_treatment(db, treatment_id, i):
+    crud.treatments.get_treatment(db, treatment_id)  # router permission check
+    db_treatment = crud.treatments.update_treatment(
+        db, treatment_id, schemas.TreatmentUpdate(description=str(i))
+    )
+    return schemas.Treatment.model_validate(db_treatment)
+
+
+def measure(session_factory, flow, ident, iterations):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        start = time.perf_counter()
+        for i in range(iterations):
+            # One session per update, as in a request
+            with session_factory() as db:
+                flow(db, ident, i)
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return len(statements) / iterations, elapsed / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    doctor_id, patient_id, treatment_id = seed()
+    cases = [
+        ("patient", patient_id, legacy_update_patient, update_patient),
+        ("doctor", doctor_id, legacy_update_doctor, update_doctor),
+        ("treatment", treatment_id, legacy_update_treatment, update_treatment),
+    ]
+
+    print(f"{'update':<10} {'queries before':>15} {'queries after':>14}", end="")
+    print(f" {'us before':>10} {'us after':>9}")
+    for name, ident, legacy, current in cases:
+        before = measure(LegacySession, legacy, ident, args.iterations)
+        after = measure(SessionLocal, current, ident, args.iterations)
+        print(f"{name:<10} {before[0]:>15.1f} {after[0]:>14.1f}", end="")
+        print(f" {before[1]:>10.0f} {after[1]:>9.0f}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(_scratch + suffix):
+                os.unlink(_scratch + suffix)
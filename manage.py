@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from app import crud, schemas
+from app.bulk import bulk_errors, bulk_result, validate_bulk_rows
+from app.database import SessionLocal
+
+
+def read_rows(path):
+    """Read rows from a JSON array file or an NDJSON file ("-" for stdin)."""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with stream:
+        text = stream.read()
+
+    if text.lstrip().startswith("["):
+        return json.loads(text), {}
+
+    rows, errors = [], {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            errors[len(rows)] = [
+                {"loc": [], "msg": "Invalid JSON", "type": "json_invalid"}
+            ]
+            rows.append(None)
+    return rows, errors
+
+
+def onboard_staff(args):
+    rows, errors = read_rows(args.file)
+    valid, errors = validate_bulk_rows(schemas.StaffOnboarding, rows, errors)
+    if errors and args.all_or_nothing:
+        print(json.dumps({"errors": bulk_errors(errors)}, indent=2))
+        return 1
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        with SessionLocal() as db:
+            created, ids, duplicates = crud.staff.onboard_staff(
+                db, valid, all_or_nothing=args.all_or_nothing, executor=executor
+            )
+    errors.update(duplicates)
+    if errors and args.all_or_nothing:
+        print(json.dumps({"errors": bulk_errors(errors)}, indent=2))
+        return 1
+
+    print(json.dumps(bulk_result(len(rows), created, ids, errors), indent=2))
+    return 1 if errors else 0
+
+
+def rebuild_rollups(args):
+    with SessionLocal() as db:
+        buckets = crud.rollups.rebuild_application_rollups(db)
+    print(f"Rebuilt {buckets} hourly application buckets")
+    return 0
+
+
+def rebuild_doctor_stats(args):
+    with SessionLocal() as db:
+        doctors = crud.doctor_stats.rebuild_doctor_stats(db)
+    print(f"Rebuilt statistics for {doctors} doctors")
+    return 0
+
+
+def check_doctor_stats(args):
+    with SessionLocal() as db:
+        mismatches = crud.doctor_stats.check_doctor_stats(db)
+    if mismatches:
+        print(json.dumps(mismatches, indent=2))
+        print(f"{len(mismatches)} mismatches; fix with: manage.py rebuild-doctor-stats")
+        return 1
+    print("doctor_stats is consistent")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hospital REST API management")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    onboard = commands.add_parser(
+        "onboard-staff", help="Create doctors and assistants from a file"
+    )
+    onboard.add_argument(
+        "file", help='JSON array or NDJSON file of staff rows, or "-" for stdin'
+    )
+    onboard.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Processes used to hash passwords (default: CPU count)",
+    )
+    onboard.add_argument(
+        "--all-or-nothing",
+        action="store_true",
+        help="Create nothing if any row is invalid or already registered",
+    )
+    onboard.set_defaults(handler=onboard_staff)
+
+    rollups = commands.add_parser(
+        "rebuild-rollups",
+        help="Recompute the treatment application rollups from the raw rows",
+    )
+    rollups.set_defaults(handler=rebuild_rollups)
+
+    rebuild_stats = commands.add_parser(
+        "rebuild-doctor-stats",
+        help="Recompute the per-doctor patient and treatment counts",
+    )
+    rebuild_stats.set_defaults(handler=rebuild_doctor_stats)
+
+    check_stats = commands.add_parser(
+        "check-doctor-stats",
+        help="Compare the per-doctor counts with the raw rows (exit 1 on drift)",
+    )
+    check_stats.set_defaults(handler=check_doctor_stats)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
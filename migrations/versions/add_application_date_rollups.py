@@ -0,0 +1,101 @@
+"""Store treatment application dates and add the hourly rollup table
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "003"
+down_revision = "002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Applications recorded before this revision keep a NULL date
+    op.add_column(
+        "treatment_applications",
+        sa.Column("application_date", sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        op.f("ix_treatment_applications_application_date"),
+        "treatment_applications",
+        ["application_date"],
+        unique=False,
+    )
+
+    # Applications per hour, treatment and assistant, kept up to date by the
+    # application writers (rebuild with: python manage.py rebuild-rollups)
+    op.create_table(
+        "treatment_application_rollups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("treatment_id", sa.Integer(), nullable=False),
+        sa.Column("assistant_id", sa.Integer(), nullable=False),
+        sa.Column("doctor_id", sa.Integer(), nullable=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["treatment_id"], ["treatments.id"]),
+        sa.ForeignKeyConstraint(["assistant_id"], ["assistants.id"]),
+        sa.ForeignKeyConstraint(["doctor_id"], ["doctors.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "bucket_start",
+            "treatment_id",
+            "assistant_id",
+            name="uq_treatment_application_rollups_bucket",
+        ),
+    )
+    op.create_index(
+        op.f("ix_treatment_application_rollups_id"),
+        "treatment_application_rollups",
+        ["id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_treatment_application_rollups_treatment_id",
+        "treatment_application_rollups",
+        ["treatment_id", "bucket_start"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_treatment_application_rollups_assistant_id",
+        "treatment_application_rollups",
+        ["assistant_id", "bucket_start"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_treatment_application_rollups_doctor_id",
+        "treatment_application_rollups",
+        ["doctor_id", "bucket_start"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_treatment_application_rollups_doctor_id",
+        table_name="treatment_application_rollups",
+    )
+    op.drop_index(
+        "ix_treatment_application_rollups_assistant_id",
+        table_name="treatment_application_rollups",
+    )
+    op.drop_index(
+        "ix_treatment_application_rollups_treatment_id",
+        table_name="treatment_application_rollups",
+    )
+    op.drop_index(
+        op.f("ix_treatment_application_rollups_id"),
+        table_name="treatment_application_rollups",
+    )
+    op.drop_table("treatment_application_rollups")
+    op.drop_index(
+        op.f("ix_treatment_applications_application_date"),
+        table_name="treatment_applications",
+    )
+    op.drop_column("treatment_applications", "application_date")
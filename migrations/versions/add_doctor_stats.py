@@ -0,0 +1,56 @@
+"""Add the doctor_stats table
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Counters per doctor, kept up to date by the patient, treatment and
+    # doctor writers (check with: python manage.py check-doctor-stats)
+    op.create_table(
+        "doctor_stats",
+        sa.Column("doctor_id", sa.Integer(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("active_patient_count", sa.Integer(), nullable=False),
+        sa.Column("treatment_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["doctor_id"], ["doctors.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("doctor_id"),
+    )
+    op.create_index(
+        op.f("ix_doctor_stats_is_active"),
+        "doctor_stats",
+        ["is_active"],
+        unique=False,
+    )
+
+    # Backfill from the existing rows
+    op.execute("""
+        INSERT INTO doctor_stats
+            (doctor_id, is_active, active_patient_count, treatment_count)
+        SELECT
+            doctors.id,
+            COALESCE(users.is_active, FALSE),
+            (SELECT COUNT(*) FROM patients
+             WHERE patients.doctor_id = doctors.id AND patients.is_active),
+            (SELECT COUNT(*) FROM treatments
+             WHERE treatments.doctor_id = doctors.id)
+        FROM doctors
+        LEFT OUTER JOIN users ON users.id = doctors.user_id
+        """)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_doctor_stats_is_active"), table_name="doctor_stats")
+    op.drop_table("doctor_stats")
@@ -0,0 +1,90 @@
+"""Add indexes for foreign key and filter columns
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers
+revision = "002"
+down_revision = "001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # doctors.user_id and assistants.user_id are already covered by the
+    # indexes backing their unique constraints
+
+    # Patients of a doctor, usually restricted to active ones
+    op.create_index(
+        "ix_patients_doctor_id_is_active",
+        "patients",
+        ["doctor_id", "is_active"],
+        unique=False,
+    )
+
+    # Treatments of a patient or by a doctor, usually restricted to active ones
+    op.create_index(
+        "ix_treatments_patient_id_is_active",
+        "treatments",
+        ["patient_id", "is_active"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_treatments_doctor_id_is_active",
+        "treatments",
+        ["doctor_id", "is_active"],
+        unique=False,
+    )
+
+    # Assignment checks look up (assistant, patient, active) and cover the
+    # assistant-only filter as a prefix
+    op.create_index(
+        "ix_patient_assistants_assistant_id_patient_id_is_active",
+        "patient_assistants",
+        ["assistant_id", "patient_id", "is_active"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_patient_assistants_patient_id",
+        "patient_assistants",
+        ["patient_id"],
+        unique=False,
+    )
+
+    # Applications of a treatment or by an assistant
+    op.create_index(
+        op.f("ix_treatment_applications_treatment_id"),
+        "treatment_applications",
+        ["treatment_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_treatment_applications_assistant_id"),
+        "treatment_applications",
+        ["assistant_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f("ix_treatment_applications_assistant_id"),
+        table_name="treatment_applications",
+    )
+    op.drop_index(
+        op.f("ix_treatment_applications_treatment_id"),
+        table_name="treatment_applications",
+    )
+    op.drop_index("ix_patient_assistants_patient_id", table_name="patient_assistants")
+    op.drop_index(
+        "ix_patient_assistants_assistant_id_patient_id_is_active",
+        table_name="patient_assistants",
+    )
+    op.drop_index("ix_treatments_doctor_id_is_active", table_name="treatments")
+    op.drop_index("ix_treatments_patient_id_is_active", table_name="treatments")
+    op.drop_index("ix_patients_doctor_id_is_active", table_name="patients")
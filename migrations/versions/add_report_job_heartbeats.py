@@ -0,0 +1,27 @@
+"""Add heartbeat_at to report_jobs
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Refreshed while a worker runs the job, so stale runs can be requeued
+    op.add_column(
+        "report_jobs", sa.Column("heartbeat_at", sa.DateTime(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("report_jobs", "heartbeat_at")
@@ -0,0 +1,46 @@
+"""Add the report_jobs table
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Background report runs; results are stored with the job
+    op.create_table(
+        "report_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("report", sa.String(), nullable=False),
+        sa.Column("params", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("requested_by", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["requested_by"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_report_jobs_id"), "report_jobs", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_report_jobs_status"), "report_jobs", ["status"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_report_jobs_status"), table_name="report_jobs")
+    op.drop_index(op.f("ix_report_jobs_id"), table_name="report_jobs")
+    op.drop_table("report_jobs")
@@ -0,0 +1,30 @@
+"""Add the table_versions table
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Per-table write counters the report caches of all workers compare against
+    op.create_table(
+        "table_versions",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade():
+    op.drop_table("table_versions")
@@ -0,0 +1,241 @@
+from fastapi.testclient import TestClient
+import os
+import sys
+import threading
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from app.main import app
+from app.database import SessionLocal, track_queries
+from app import crud, models, schemas
+from app.crud.base import (
+    PasswordHashingPool,
+    PasswordPoolFull,
+    get_password_hash_async,
+    password_pool,
+    pwd_context,
+)
+from app.tokens import InvalidToken, create_token, decode_token
+from tests.test_treatment import create_test_admin, create_test_doctor
+
+# Create test client
+client = TestClient(app)
+
+
+def test_login():
+    create_test_admin()
+
+    response = client.post(
+        "/login", data={"email": "testadmin@hospital.com", "password": "admin123"}
+    )
+    assert response.status_code == 200
+    assert response.json()["role"] == "general_manager"
+
+    response = client.post(
+        "/login", data={"email": "testadmin@hospital.com", "password": "wrong"}
+    )
+    assert response.status_code == 401
+
+
+def test_password_pool_rejects_when_full():
+    pool = PasswordHashingPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    running = pool.submit(release.wait)
+    queued = pool.submit(release.wait)
+    try:
+        pool.submit(release.wait)
+        assert False, "expected the pool to be full"
+    except PasswordPoolFull:
+        pass
+    finally:
+        release.set()
+
+    assert running.result() and queued.result()
+    stats = pool.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["queued"] == 0
+
+
+def test_login_returns_503_when_pool_is_full():
+    create_test_admin()
+    slots = password_pool.max_workers + password_pool.max_queue
+    release = threading.Event()
+    blockers = [password_pool.submit(release.wait) for _ in range(slots)]
+    try:
+        response = client.post(
+            "/login", data={"email": "testadmin@hospital.com", "password": "admin123"}
+        )
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_password_pool_stats_endpoint():
+    response = client.get("/health/pools")
+    assert response.status_code == 200
+    stats = response.json()["password_hashing"]
+    assert {"max_workers", "running", "queued", "utilization", "rejected"} <= set(stats)
+
+
+def test_async_password_hash_runs_on_pool():
+    completed = password_pool.stats()["completed"]
+    hashed = asyncio.run(get_password_hash_async("secret"))
+    assert pwd_context.verify("secret", hashed)
+    assert password_pool.stats()["completed"] == completed + 1
+
+
+def login(email, password):
+    response = client.post("/login", data={"email": email, "password": password})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+def test_token_round_trip():
+    token = create_token(7, "doctor", 3)
+    claims = decode_token(token)
+    assert (claims["sub"], claims["role"], claims["pid"]) == (7, "doctor", 3)
+
+    payload, signature = token.split(".")
+    for bad in [
+        f"{payload}x.{signature}",
+        "garbage",
+        create_token(7, "doctor", ttl=-1),
+    ]:
+        try:
+            decode_token(bad)
+            assert False, "expected the token to be rejected"
+        except InvalidToken:
+            pass
+
+
+def test_token_authenticates_without_database():
+    create_test_admin()
+    doctor = create_test_doctor()
+    token = login("testdoctor@hospital.com", "doctor123")
+
+    with track_queries(all_threads=True) as stats:
+        response = client.get(
+            "/treatments/", headers={"Authorization": f"Bearer {token}"}
+        )
+
+    assert response.status_code == 200
+    assert not any("FROM users" in statement for statement in stats.statements)
+    assert all(t["doctor_id"] == doctor.id for t in response.json())
+
+    response = client.get("/treatments/", headers={"Authorization": "Bearer bad.x"})
+    assert response.status_code == 401
+
+
+def test_deactivation_revokes_tokens():
+    create_test_admin()
+    doctor = create_test_doctor()
+    token = login("testdoctor@hospital.com", "doctor123")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/treatments/", headers=headers).status_code == 200
+    try:
+        with SessionLocal() as db:
+            crud.doctors.delete_doctor(db, doctor.id)
+        response = client.get("/treatments/", headers=headers)
+        assert response.status_code == 401
+    finally:
+        with SessionLocal() as db:
+            crud.doctors.update_doctor(
+                db, doctor.id, schemas.DoctorUpdate(is_active=True)
+            )
+
+
+def test_deactivated_user_cannot_log_in():
+    create_test_admin()
+    email = "deactivated.login@hospital.com"
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        doctor = user and crud.doctors.get_doctor_by_user_id(db, user.id)
+        if doctor is None:
+            doctor = crud.doctors.create_doctor(
+                db,
+                schemas.DoctorCreate(
+                    email=email,
+                    full_name="Deactivated Login",
+                    password="secret",
+                    specialization="Auth",
+                    experience=1,
+                ),
+            )
+    admin = {"current_user_email": "testadmin@hospital.com"}
+    token = login(email, "secret")
+
+    try:
+        response = client.put(
+            f"/doctors/{doctor.id}", json={"is_active": False}, params=admin
+        )
+        assert response.status_code == 200
+
+        response = client.post("/login", data={"email": email, "password": "secret"})
+        assert response.status_code == 401
+        assert "access_token" not in response.json()
+
+        response = client.get(
+            "/treatments/", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 401
+    finally:
+        response = client.put(
+            f"/doctors/{doctor.id}", json={"is_active": True}, params=admin
+        )
+        assert response.status_code == 200
+
+    assert login(email, "secret")
+
+
+def test_reactivation_does_not_restore_revoked_tokens():
+    create_test_admin()
+    doctor = create_test_doctor()
+    token = login("testdoctor@hospital.com", "doctor123")
+    headers = {"Authorization": f"Bearer {token}"}
+    admin = {"current_user_email": "testadmin@hospital.com"}
+
+    response = client.put(
+        f"/doctors/{doctor.id}", json={"is_active": False}, params=admin
+    )
+    assert response.status_code == 200
+    response = client.put(
+        f"/doctors/{doctor.id}", json={"is_active": True}, params=admin
+    )
+    assert response.status_code == 200
+
+    # The token from before the deactivation stays revoked
+    assert client.get("/treatments/", headers=headers).status_code == 401
+
+    # A fresh login, even within the same second, is accepted
+    token = login("testdoctor@hospital.com", "doctor123")
+    response = client.get("/treatments/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+
+def run_auth_tests():
+    """Run all authentication tests"""
+    print("\nRunning authentication tests...")
+    test_login()
+    test_password_pool_rejects_when_full()
+    test_login_returns_503_when_pool_is_full()
+    test_password_pool_stats_endpoint()
+    test_async_password_hash_runs_on_pool()
+    test_token_round_trip()
+    test_token_authenticates_without_database()
+    test_deactivation_revokes_tokens()
+    test_deactivated_user_cannot_log_in()
+    test_reactivation_does_not_restore_revoked_tokens()
+    print("All authentication tests passed!")
+
+
+if __name__ == "__main__":
+    run_auth_tests()
@@ -0,0 +1,290 @@
+from fastapi.testclient import TestClient
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app import crud, models, schemas
+from app.crud.base import unit_of_work
+from app.database import (
+    SessionLocal,
+    TimedQueuePool,
+    create_async_db_engine,
+    create_db_engine,
+    get_async_database_url,
+    get_engine_settings,
+    get_pool_status,
+    get_sqlite_pragmas,
+    raise_on_lazy_load,
+    track_queries,
+)
+
+# Create test client
+client = TestClient(app)
+
+
+def test_engine_settings_use_dialect_defaults():
+    sqlite_settings = get_engine_settings("sqlite:///./other.db")
+    assert sqlite_settings["dialect"] == "sqlite"
+    assert sqlite_settings["pool_pre_ping"] is False
+
+    postgres_settings = get_engine_settings("postgresql://user:pw@localhost/db")
+    assert postgres_settings["dialect"] == "postgresql"
+    assert postgres_settings["pool_pre_ping"] is True
+    assert postgres_settings["pool_recycle"] == 1800
+
+
+def test_engine_settings_read_environment():
+    os.environ["DB_POOL_SIZE"] = "3"
+    os.environ["DB_POOL_PRE_PING"] = "true"
+    try:
+        settings = get_engine_settings("sqlite:///./other.db")
+        assert settings["pool_size"] == 3
+        assert settings["pool_pre_ping"] is True
+    finally:
+        del os.environ["DB_POOL_SIZE"]
+        del os.environ["DB_POOL_PRE_PING"]
+
+
+def test_sqlite_pool_strategy():
+    memory_engine = create_db_engine("sqlite://")
+    assert isinstance(memory_engine.pool, StaticPool)
+
+    file_engine = create_db_engine("sqlite:///./hospital.db", pool_size=2)
+    assert isinstance(file_engine.pool, TimedQueuePool)
+    assert file_engine.pool.size() == 2
+    file_engine.dispose()
+
+
+def test_pool_status_reports_checkouts():
+    with SessionLocal() as db:
+        db.execute(text("SELECT 1"))
+        status = get_pool_status()
+        assert status["checked_out"] >= 1
+        assert 0 < status["saturation"] <= 1
+
+    assert get_pool_status()["wait"]["checkouts"] >= 1
+
+    response = client.get("/health/pools")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["database"]["pool"] == "TimedQueuePool"
+    assert data["threads"]["total"] > 0
+
+
+def test_sqlite_pragma_profile_is_applied():
+    pragmas = get_sqlite_pragmas()
+    assert pragmas["journal_mode"] == "wal"
+    assert pragmas["synchronous"] == 1  # NORMAL
+    assert pragmas["busy_timeout"] == 5000
+    assert pragmas["temp_store"] == 2  # MEMORY
+    assert pragmas["foreign_keys"] == 0
+
+    response = client.get("/health/database")
+    assert response.status_code == 200
+    assert response.json()["pragmas"]["journal_mode"] == "wal"
+
+
+def test_sqlite_pragma_profile_reads_environment():
+    os.environ["SQLITE_SYNCHRONOUS"] = "FULL"
+    os.environ["SQLITE_FOREIGN_KEYS"] = "ON"
+    try:
+        memory_engine = create_db_engine("sqlite://")
+        pragmas = get_sqlite_pragmas(memory_engine)
+        assert pragmas["synchronous"] == 2
+        assert pragmas["foreign_keys"] == 1
+    finally:
+        del os.environ["SQLITE_SYNCHRONOUS"]
+        del os.environ["SQLITE_FOREIGN_KEYS"]
+
+
+def test_async_database_url_uses_async_driver():
+    assert get_async_database_url("sqlite:///./hospital.db") == (
+        "sqlite+aiosqlite:///./hospital.db"
+    )
+    assert get_async_database_url("postgresql://user:pw@localhost/db") == (
+        "postgresql+asyncpg://user:pw@localhost/db"
+    )
+
+
+def test_async_crud_reads_same_data():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    with SessionLocal() as db:
+        expected = [patient.id for patient in crud.patients.get_patients(db)]
+
+    async def read_patients():
+        async_engine = create_async_db_engine()
+        try:
+            async with async_sessionmaker(async_engine)() as db:
+                patients = await crud.aio.patients.get_patients(db)
+                doctors = await crud.aio.doctors.get_doctors(db)
+                # The nested user is loaded eagerly, so no lazy load is needed
+                emails = [doctor.user.email for doctor in doctors]
+                return [patient.id for patient in patients], emails
+        finally:
+            await async_engine.dispose()
+
+    patient_ids, emails = asyncio.run(read_patients())
+    assert patient_ids == expected
+    assert all(emails)
+
+
+def count_queries(call):
+    # TestClient runs the app on another thread
+    with track_queries(all_threads=True) as stats:
+        call()
+    return stats.count
+
+
+def test_profile_lists_load_user_in_one_query():
+    with raise_on_lazy_load():
+        for path in ["/doctors/", "/assistants/"]:
+            queries = count_queries(lambda: client.get(path, params={"limit": 1}))
+            response = client.get(path, params={"limit": 100})
+            assert response.status_code == 200
+            assert all(item["user"]["email"] for item in response.json())
+            assert (
+                count_queries(lambda: client.get(path, params={"limit": 100}))
+                == queries
+            )
+
+
+def test_lazy_load_guard_raises():
+    email = "lazy.guard@hospital.com"
+    delete_user_with_profile(email)
+    with SessionLocal() as db:
+        doctor_id = crud.doctors.create_doctor(db, doctor_create(email)).id
+
+    try:
+        with SessionLocal() as db, raise_on_lazy_load():
+            doctor = db.get(models.Doctor, doctor_id)
+            try:
+                doctor.patients
+                assert False, "expected the lazy load to raise"
+            except InvalidRequestError:
+                pass
+
+        with SessionLocal() as db, raise_on_lazy_load(False):
+            # Without the guard the same access lazy loads as before
+            doctor = db.get(models.Doctor, doctor_id)
+            assert isinstance(doctor.patients, list)
+    finally:
+        delete_user_with_profile(email)
+
+
+def doctor_create(email):
+    return schemas.DoctorCreate(
+        email=email,
+        full_name="Unit Of Work",
+        password="secret",
+        specialization="Atomic",
+        experience=1,
+    )
+
+
+def delete_user_with_profile(email):
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user:
+            db.query(models.Doctor).filter(models.Doctor.user_id == user.id).delete()
+            db.delete(user)
+            db.commit()
+
+
+def test_create_doctor_commits_once():
+    email = "uow.single@hospital.com"
+    delete_user_with_profile(email)
+
+    commits = []
+    with SessionLocal() as db:
+        event.listen(db, "after_commit", lambda session: commits.append(session))
+        doctor = crud.doctors.create_doctor(db, doctor_create(email))
+        assert doctor.user.email == email
+        assert doctor.user_id == doctor.user.id
+    assert len(commits) == 1
+    delete_user_with_profile(email)
+
+
+def test_unit_of_work_is_atomic():
+    email = "uow.rollback@hospital.com"
+    delete_user_with_profile(email)
+
+    commits = []
+    with SessionLocal() as db:
+        event.listen(db, "after_commit", lambda session: commits.append(session))
+        try:
+            with unit_of_work(db):
+                # The inner writer joins the outer unit instead of committing
+                crud.doctors.create_doctor(db, doctor_create(email))
+                crud.patients.create_patient(
+                    db, schemas.PatientCreate(first_name="Uow", last_name="Patient")
+                )
+                raise RuntimeError("abort the whole unit")
+        except RuntimeError:
+            pass
+    assert commits == []
+
+    with SessionLocal() as db:
+        # Neither the user, its profile nor the patient were written
+        assert crud.users.get_user_by_email(db, email) is None
+        assert (
+            db.query(models.Patient).filter(models.Patient.first_name == "Uow").count()
+            == 0
+        )
+
+
+def test_update_is_single_round_trip():
+    with SessionLocal() as db:
+        patient = crud.patients.create_patient(
+            db, schemas.PatientCreate(first_name="Returning", last_name="Update")
+        )
+        patient_id = patient.id
+
+    with SessionLocal() as db:
+        with track_queries() as stats:
+            updated = crud.patients.update_patient(
+                db, patient_id, schemas.PatientUpdate(age=77)
+            )
+        # The response is built from the UPDATE ... RETURNING row
+        assert schemas.Patient.model_validate(updated).age == 77
+        assert stats.count == 1
+
+    with SessionLocal() as db:
+        assert (
+            crud.patients.update_patient(db, 10**9, schemas.PatientUpdate(age=1))
+            is None
+        )
+        assert db.get(models.Patient, patient_id).age == 77
+
+    response = client.put(f"/patients/{10**9}", json={"age": 1})
+    assert response.status_code == 404
+
+
+def run_database_tests():
+    """Run all database configuration tests"""
+    print("\nRunning database tests...")
+    test_engine_settings_use_dialect_defaults()
+    test_engine_settings_read_environment()
+    test_sqlite_pool_strategy()
+    test_pool_status_reports_checkouts()
+    test_sqlite_pragma_profile_is_applied()
+    test_sqlite_pragma_profile_reads_environment()
+    test_async_database_url_uses_async_driver()
+    test_async_crud_reads_same_data()
+    test_profile_lists_load_user_in_one_query()
+    test_lazy_load_guard_raises()
+    test_create_doctor_commits_once()
+    test_unit_of_work_is_atomic()
+    test_update_is_single_round_trip()
+    print("All database tests passed!")
+
+
+if __name__ == "__main__":
+    run_database_tests()
@@ -0,0 +1,167 @@
+from fastapi.testclient import TestClient
+import csv
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.database import SessionLocal
+from app import crud, models
+from tests.test_treatment import (
+    create_test_admin,
+    create_test_assistant,
+    create_test_doctor,
+    create_test_patient,
+)
+
+# Create test client
+client = TestClient(app)
+
+
+def count_rows(model):
+    with SessionLocal() as db:
+        return db.query(model).count()
+
+
+def test_export_patients_csv():
+    create_test_admin()
+    create_test_patient()
+
+    with client.stream(
+        "GET",
+        "/exports/patients",
+        params={"current_user_email": "testadmin@hospital.com"},
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "patients.csv" in response.headers["content-disposition"]
+        body = response.read().decode()
+
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert len(rows) == count_rows(models.Patient)
+    assert list(rows[0]) == [
+        "id",
+        "first_name",
+        "last_name",
+        "age",
+        "is_active",
+        "doctor_id",
+    ]
+    ids = [int(row["id"]) for row in rows]
+    assert ids == sorted(ids)
+
+
+def test_export_treatments_ndjson():
+    create_test_admin()
+    doctor = create_test_doctor()
+    patient = create_test_patient(doctor_id=doctor.id)
+    with SessionLocal() as db:
+        treatment = models.Treatment(
+            name="Export", doctor_id=doctor.id, patient_id=patient.id
+        )
+        db.add(treatment)
+        db.commit()
+
+    try:
+        response = client.get(
+            "/exports/treatments",
+            params={
+                "format": "ndjson",
+                "current_user_email": "testadmin@hospital.com",
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) == count_rows(models.Treatment)
+        assert {"id", "name", "doctor_id", "patient_id"} <= rows[0].keys()
+        assert treatment.id in {row["id"] for row in rows}
+    finally:
+        with SessionLocal() as db:
+            db.delete(db.get(models.Treatment, treatment.id))
+            db.commit()
+
+
+def test_export_scoping_and_permissions():
+    doctor = create_test_doctor()
+    create_test_assistant()
+
+    response = client.get(
+        "/exports/treatments",
+        params={"format": "ndjson", "current_user_email": "testdoctor@hospital.com"},
+    )
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert all(row["doctor_id"] == doctor.id for row in rows)
+
+    response = client.get(
+        "/exports/patients",
+        params={"current_user_email": "testassistant@hospital.com"},
+    )
+    assert response.status_code == 403
+
+    response = client.get(
+        "/exports/reports/doctors-patients",
+        params={"current_user_email": "testdoctor@hospital.com"},
+    )
+    assert response.status_code == 403
+
+    response = client.get(
+        "/exports/applications",
+        params={"format": "xml", "current_user_email": "testdoctor@hospital.com"},
+    )
+    assert response.status_code == 422
+
+
+def test_export_doctors_patients_report_matches_report():
+    create_test_admin()
+    params = {"current_user_email": "testadmin@hospital.com"}
+    report = client.get("/reports/doctors-patients", params=params).json()
+    response = client.get(
+        "/exports/reports/doctors-patients", params={"format": "ndjson", **params}
+    )
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {row["doctor_id"]: row["patient_count"] for row in rows} == {
+        entry["id"]: entry["patient_count"] for entry in report["doctors"]
+    }
+
+
+def test_exports_are_read_in_batches():
+    with SessionLocal() as db:
+        patients = [
+            models.Patient(first_name="Export", last_name=f"Batch {i}")
+            for i in range(3)
+        ]
+        db.add_all(patients)
+        db.commit()
+
+    try:
+        with SessionLocal() as db:
+            batches = list(crud.exports.export_patients(db, batch_size=2).partitions())
+        assert len(batches) > 1
+        assert all(len(batch) <= 2 for batch in batches)
+        assert sum(len(batch) for batch in batches) == count_rows(models.Patient)
+    finally:
+        with SessionLocal() as db:
+            for patient in patients:
+                db.delete(db.get(models.Patient, patient.id))
+            db.commit()
+
+
+def run_export_tests():
+    """Run all export tests"""
+    print("\nRunning export tests...")
+    test_export_patients_csv()
+    test_export_treatments_ndjson()
+    test_export_scoping_and_permissions()
+    test_export_doctors_patients_report_matches_report()
+    test_exports_are_read_in_batches()
+    print("All export tests passed!")
+
+
+if __name__ == "__main__":
+    run_export_tests()
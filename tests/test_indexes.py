@@ -0,0 +1,287 @@
+from fastapi.testclient import TestClient
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.database import SessionLocal, engine, track_queries
+from app import crud, models, schemas
+
+# Create test client
+client = TestClient(app)
+
+
+def seed_patient_records():
+    """A doctor's patient with a treatment, an assignment and applications.
+
+    The rows are created here rather than shared with other tests, so they
+    are active and present whatever order the suite runs in.
+    """
+    with SessionLocal() as db:
+        doctor = models.Doctor(
+            user=models.User(
+                email="indexes.doctor@hospital.com",
+                hashed_password="unused",
+                full_name="Index Doctor",
+                role="doctor",
+            )
+        )
+        assistant = models.Assistant(
+            user=models.User(
+                email="indexes.assistant@hospital.com",
+                hashed_password="unused",
+                full_name="Index Assistant",
+                role="assistant",
+            )
+        )
+        db.add_all([doctor, assistant])
+        db.flush()
+        patient = models.Patient(
+            first_name="Index", last_name="Patient", age=40, doctor_id=doctor.id
+        )
+        db.add(patient)
+        db.flush()
+        treatment = models.Treatment(
+            name="Indexed Treatment", doctor_id=doctor.id, patient_id=patient.id
+        )
+        assignment = models.PatientAssistant(
+            patient_id=patient.id,
+            assistant_id=assistant.id,
+            assigned_by_doctor_id=doctor.id,
+        )
+        db.add_all([treatment, assignment])
+        db.flush()
+        applications = [
+            models.TreatmentApplication(
+                treatment_id=treatment.id, assistant_id=assistant.id, notes=notes
+            )
+            for notes in ("Morning", "Evening")
+        ]
+        db.add_all(applications)
+        db.commit()
+        return {
+            "doctor_id": doctor.id,
+            "patient_id": patient.id,
+            "assistant_id": assistant.id,
+            "user_id": doctor.user_id,
+            "assistant_user_id": assistant.user_id,
+            "treatment_id": treatment.id,
+            "assignment_id": assignment.id,
+            "application_ids": [application.id for application in applications],
+        }
+
+
+def delete_patient_records(records):
+    with SessionLocal() as db:
+        for application_id in records["application_ids"]:
+            db.delete(db.get(models.TreatmentApplication, application_id))
+        db.delete(db.get(models.PatientAssistant, records["assignment_id"]))
+        db.delete(db.get(models.Treatment, records["treatment_id"]))
+        db.flush()
+        db.delete(db.get(models.Patient, records["patient_id"]))
+        db.delete(db.get(models.Doctor, records["doctor_id"]))
+        db.delete(db.get(models.Assistant, records["assistant_id"]))
+        db.flush()
+        db.delete(db.get(models.User, records["user_id"]))
+        db.delete(db.get(models.User, records["assistant_user_id"]))
+        db.commit()
+
+
+def capture_selects(call):
+    """Run a crud call; return the SELECT statements it issued and its result."""
+    with SessionLocal() as db, track_queries() as stats:
+        result = call(db)
+    statements = [
+        statement
+        for statement in stats.statements
+        if statement.lstrip().upper().startswith("SELECT")
+    ]
+    return statements, result
+
+
+def explain(connection, statement):
+    """The EXPLAIN QUERY PLAN details of a captured statement."""
+    # SQLite plans before binding, so the values do not matter
+    parameters = (None,) * statement.count("?")
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    ).fetchall()
+    return [row[-1] for row in plan]
+
+
+def assert_no_table_scans(call, tables):
+    """Fail if EXPLAIN QUERY PLAN shows a full scan of any of the given tables.
+
+    Returns what the call returned, so the test can check it found the
+    seeded rows rather than planning against empty tables.
+    """
+    statements, result = capture_selects(call)
+    assert statements, "the call issued no SELECT statements"
+
+    with engine.connect() as connection:
+        for statement in statements:
+            details = explain(connection, statement)
+            for detail in details:
+                for table in tables:
+                    assert not (
+                        detail.startswith(f"SCAN {table}") and "INDEX" not in detail
+                    ), f"{statement} scans {table}: {details}"
+    return result
+
+
+def test_patient_filters_use_indexes():
+    records = seed_patient_records()
+    try:
+        # Keyset pagination seeks past the cursor instead of walking the table
+        patients = assert_no_table_scans(
+            lambda db: crud.patients.get_patients(
+                db, after_id=records["patient_id"] - 1, limit=1
+            ),
+            ["patients"],
+        )
+        assert [patient.id for patient in patients] == [records["patient_id"]]
+
+        # The doctor report lists each doctor's active patients
+        report = assert_no_table_scans(
+            lambda db: crud.reports.get_doctor_patient_report(db), ["patients"]
+        )
+        assert any(
+            patient["id"] == records["patient_id"]
+            for doctor in report["doctors"]
+            for patient in doctor["patients"]
+        )
+    finally:
+        delete_patient_records(records)
+
+
+def test_treatment_filters_use_indexes():
+    records = seed_patient_records()
+    try:
+        treatments = assert_no_table_scans(
+            lambda db: crud.treatments.get_treatments(
+                db, patient_id=records["patient_id"]
+            ),
+            ["treatments"],
+        )
+        assert records["treatment_id"] in [treatment.id for treatment in treatments]
+        treatments = assert_no_table_scans(
+            lambda db: crud.treatments.get_treatments(
+                db, doctor_id=records["doctor_id"]
+            ),
+            ["treatments"],
+        )
+        assert records["treatment_id"] in [treatment.id for treatment in treatments]
+    finally:
+        delete_patient_records(records)
+
+
+def test_assignment_filters_use_indexes():
+    records = seed_patient_records()
+    assistant_id, patient_id = records["assistant_id"], records["patient_id"]
+    try:
+        assignments = assert_no_table_scans(
+            lambda db: crud.assistants.get_patient_assistants(
+                db, assistant_id=assistant_id
+            ),
+            ["patient_assistants"],
+        )
+        assert records["assignment_id"] in [a.id for a in assignments]
+        assignments = assert_no_table_scans(
+            lambda db: crud.assistants.get_patient_assistants(
+                db, patient_id=patient_id
+            ),
+            ["patient_assistants"],
+        )
+        assert records["assignment_id"] in [a.id for a in assignments]
+        patients = assert_no_table_scans(
+            lambda db: crud.assistants.get_patients_by_assistant(db, assistant_id),
+            ["patient_assistants", "patients"],
+        )
+        assert patient_id in [patient.id for patient in patients]
+        assignment = assert_no_table_scans(
+            lambda db: crud.assistants.get_active_assignment(
+                db, assistant_id, patient_id
+            ),
+            ["patient_assistants"],
+        )
+        assert assignment is not None
+    finally:
+        delete_patient_records(records)
+
+
+def test_application_filters_use_indexes():
+    records = seed_patient_records()
+    try:
+        applications = assert_no_table_scans(
+            lambda db: crud.treatments.get_treatment_applications(
+                db, treatment_id=records["treatment_id"]
+            ),
+            ["treatment_applications"],
+        )
+        assert sorted(a.id for a in applications) == records["application_ids"]
+        applications = assert_no_table_scans(
+            lambda db: crud.treatments.get_treatment_applications(
+                db, assistant_id=records["assistant_id"]
+            ),
+            ["treatment_applications"],
+        )
+        assert set(records["application_ids"]) <= {a.id for a in applications}
+    finally:
+        delete_patient_records(records)
+
+
+def test_profile_lookups_use_indexes():
+    records = seed_patient_records()
+    try:
+        doctor = assert_no_table_scans(
+            lambda db: crud.doctors.get_doctor_by_user_id(db, records["user_id"]),
+            ["doctors"],
+        )
+        assert doctor.id == records["doctor_id"]
+        assistant = assert_no_table_scans(
+            lambda db: crud.assistants.get_assistant_by_user_id(
+                db, records["assistant_user_id"]
+            ),
+            ["assistants"],
+        )
+        assert assistant.id == records["assistant_id"]
+    finally:
+        delete_patient_records(records)
+
+
+def test_patient_treatment_report_uses_indexes():
+    records = seed_patient_records()
+    try:
+        report = assert_no_table_scans(
+            lambda db: crud.reports.get_patient_treatment_report(
+                db, records["patient_id"]
+            ),
+            [
+                "treatments",
+                "treatment_applications",
+                "doctors",
+                "assistants",
+                "users",
+            ],
+        )
+        entry = next(e for e in report if e["id"] == records["treatment_id"])
+        assert entry["application_count"] == 2
+    finally:
+        delete_patient_records(records)
+
+
+def run_index_tests():
+    """Run all query plan tests"""
+    print("\nRunning index tests...")
+    test_patient_filters_use_indexes()
+    test_treatment_filters_use_indexes()
+    test_assignment_filters_use_indexes()
+    test_application_filters_use_indexes()
+    test_profile_lookups_use_indexes()
+    test_patient_treatment_report_uses_indexes()
+    print("All index tests passed!")
+
+
+if __name__ == "__main__":
+    run_index_tests()
@@ -0,0 +1,144 @@
+from fastapi.testclient import TestClient
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.database import SessionLocal, track_queries
+from app import crud, models, schemas
+from app.instrumentation import assert_max_queries
+from tests.test_treatment import create_test_admin, create_test_doctor
+
+# Create test client
+client = TestClient(app)
+
+ADMIN = {"current_user_email": "testadmin@hospital.com"}
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_response_headers_count_queries():
+    create_test_admin()
+    with assert_max_queries(10) as stats:
+        response = client.get("/doctors/", params=ADMIN)
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Queries"]) == stats.count
+    assert float(response.headers["X-DB-Time-ms"]) >= 0
+    assert "X-DB-N-Plus-One" not in response.headers
+
+
+def test_query_budgets():
+    create_test_admin()
+    create_test_doctor()
+    # Warm the principal cache so the budgets cover the endpoints themselves
+    client.get("/doctors/", params=ADMIN)
+
+    with assert_max_queries(1):
+        client.get("/doctors/", params=ADMIN)
+    with assert_max_queries(1):
+        client.get("/patients/", params=ADMIN)
+    with assert_max_queries(1):
+        client.get("/treatments/", params=ADMIN)
+    # The report's two queries; shared cache versions are off by default
+    with assert_max_queries(2):
+        client.get("/reports/doctors-patients", params=ADMIN)
+
+
+def test_assert_max_queries_fails_over_budget():
+    try:
+        with assert_max_queries(0):
+            with SessionLocal() as db:
+                db.query(models.User).first()
+    except AssertionError as exc:
+        assert "Expected at most 0 queries, 1 were executed" in str(exc)
+        assert "FROM users" in str(exc)
+    else:
+        assert False, "expected the query budget to be exceeded"
+
+
+def delete_doctors(emails):
+    with SessionLocal() as db:
+        users = db.query(models.User).filter(models.User.email.in_(emails)).all()
+        for user in users:
+            db.query(models.Doctor).filter(models.Doctor.user_id == user.id).delete()
+            db.delete(user)
+        db.commit()
+
+
+def test_repeated_statements_are_flagged():
+    # The per-doctor statements only repeat with at least two doctors
+    emails = [f"repeated{i}@hospital.com" for i in range(2)]
+    delete_doctors(emails)
+    with SessionLocal() as db:
+        for email in emails:
+            crud.doctors.create_doctor(
+                db,
+                schemas.DoctorCreate(
+                    email=email,
+                    full_name="Repeated Statements",
+                    password="secret",
+                    specialization="Profiling",
+                    experience=1,
+                ),
+            )
+
+    try:
+        with track_queries() as stats:
+            with SessionLocal() as db:
+                # Issues the same per-doctor statements once for every doctor
+                crud.reports.get_doctor_patient_statistics(db)
+
+        repeated = stats.suspected_n_plus_one(threshold=2)
+        assert repeated
+        statement, count = repeated[0]
+        assert "WHERE" in statement and count >= 2
+
+        with track_queries() as stats:
+            with SessionLocal() as db:
+                crud.reports.get_doctor_patient_report(db)
+        assert stats.suspected_n_plus_one(threshold=2) == []
+    finally:
+        delete_doctors(emails)
+
+
+def test_request_is_logged_with_query_fields():
+    create_test_admin()
+    handler = RecordingHandler()
+    logger = logging.getLogger("app.instrumentation")
+    logger.addHandler(handler)
+    previous_level = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        response = client.get("/treatments/", params=ADMIN)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(previous_level)
+
+    record = handler.records[-1]
+    assert record.http_path == "/treatments/"
+    assert record.db_queries == int(response.headers["X-DB-Queries"])
+    assert record.db_time_ms >= 0
+
+
+def run_instrumentation_tests():
+    """Run all SQL instrumentation tests"""
+    print("\nRunning instrumentation tests...")
+    test_response_headers_count_queries()
+    test_query_budgets()
+    test_assert_max_queries_fails_over_budget()
+    test_repeated_statements_are_flagged()
+    test_request_is_logged_with_query_fields()
+    print("All instrumentation tests passed!")
+
+
+if __name__ == "__main__":
+    run_instrumentation_tests()
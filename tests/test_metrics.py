@@ -0,0 +1,141 @@
+from fastapi.testclient import TestClient
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prometheus_client import REGISTRY
+from app.main import app
+from app.database import SessionLocal
+from app import crud, models, schemas
+from tests.test_treatment import create_test_admin
+
+# Create test client
+client = TestClient(app)
+
+ADMIN = {"current_user_email": "testadmin@hospital.com"}
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def latency_count(method, route, status):
+    labels = {"method": method, "route": route, "status": status}
+    return REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) or 0
+
+
+def delete_doctor_user(email):
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user:
+            db.query(models.Doctor).filter(models.Doctor.user_id == user.id).delete()
+            db.delete(user)
+            db.commit()
+
+
+def test_latency_is_labelled_by_route_template():
+    create_test_admin()
+    # A complete profile, so GET /doctors/{doctor_id} validates
+    email = "metrics.doctor@hospital.com"
+    delete_doctor_user(email)
+    with SessionLocal() as db:
+        doctor = crud.doctors.create_doctor(
+            db,
+            schemas.DoctorCreate(
+                email=email,
+                full_name="Metrics Doctor",
+                password="secret",
+                specialization="Metrics",
+                experience=1,
+            ),
+        )
+    before = latency_count("GET", "/doctors/{doctor_id}", "200")
+    missing_before = latency_count("GET", "/doctors/{doctor_id}", "404")
+
+    try:
+        assert client.get(f"/doctors/{doctor.id}", params=ADMIN).status_code == 200
+        assert client.get("/doctors/999999", params=ADMIN).status_code == 404
+    finally:
+        delete_doctor_user(email)
+
+    assert latency_count("GET", "/doctors/{doctor_id}", "200") == before + 1
+    assert latency_count("GET", "/doctors/{doctor_id}", "404") == missing_before + 1
+
+    unmatched = latency_count("GET", "unmatched", "404")
+    assert client.get("/no/such/path/123").status_code == 404
+    assert latency_count("GET", "unmatched", "404") == unmatched + 1
+
+
+def test_metrics_endpoint_exposes_gauges():
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for name in (
+        "http_request_duration_seconds_bucket",
+        "http_requests_in_progress",
+        "threadpool_threads_in_use",
+        "threadpool_threads_total",
+        "db_pool_checked_out",
+        "db_pool_overflow",
+        "password_hash_queue_depth",
+        "password_hash_running",
+    ):
+        assert name in body, name
+    assert REGISTRY.get_sample_value("threadpool_threads_total") > 0
+    # Every request made so far has finished
+    assert (
+        REGISTRY.get_sample_value("http_requests_in_progress", {"method": "GET"}) == 0
+    )
+
+
+def test_metrics_aggregate_across_processes():
+    # Two "workers" record requests into one shared directory; a scrape from
+    # a third process sees the sum of both
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory}
+        worker = (
+            "from fastapi.testclient import TestClient\n"
+            "from app.main import app\n"
+            "client = TestClient(app)\n"
+            "for _ in range(3):\n"
+            "    client.get('/health')\n"
+        )
+        for _ in range(2):
+            subprocess.run(
+                [sys.executable, "-c", worker], cwd=ROOT, env=env, check=True
+            )
+
+        scrape = (
+            "from fastapi.testclient import TestClient\n"
+            "from app.main import app\n"
+            "print(TestClient(app).get('/metrics').text)\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", scrape],
+            cwd=ROOT,
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+
+    line = (
+        "http_request_duration_seconds_count"
+        '{method="GET",route="/health",status="200"} 6.0'
+    )
+    assert line in output
+
+
+def run_metrics_tests():
+    """Run all metrics tests"""
+    print("\nRunning metrics tests...")
+    test_latency_is_labelled_by_route_template()
+    test_metrics_endpoint_exposes_gauges()
+    test_metrics_aggregate_across_processes()
+    print("All metrics tests passed!")
+
+
+if __name__ == "__main__":
+    run_metrics_tests()
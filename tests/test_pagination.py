@@ -0,0 +1,104 @@
+from fastapi.testclient import TestClient
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.database import SessionLocal, engine
+from app import crud, schemas
+from app.pagination import decode_cursor, encode_cursor
+from tests.test_indexes import capture_selects, explain
+
+# Create test client
+client = TestClient(app)
+
+
+def create_test_patients(count):
+    with SessionLocal() as db:
+        for i in range(count):
+            crud.patients.create_patient(
+                db,
+                schemas.PatientCreate(
+                    first_name="Paged", last_name=f"Patient {i}", age=30 + i
+                ),
+            )
+
+
+def walk_pages(path, limit):
+    """Follow X-Next-Cursor from the first page and return every id seen."""
+    ids = []
+    params = {"limit": limit}
+    while True:
+        response = client.get(path, params=params)
+        assert response.status_code == 200
+        ids.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+        params = {"limit": limit, "after": cursor}
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor(None) is None
+
+
+def test_cursor_pages_cover_all_rows():
+    create_test_patients(5)
+
+    response = client.get("/patients/", params={"limit": 1000})
+    all_ids = [patient["id"] for patient in response.json()]
+    assert all_ids == sorted(all_ids)
+
+    assert walk_pages("/patients/", limit=2) == all_ids
+    assert walk_pages("/users/", limit=3) == sorted(walk_pages("/users/", limit=3))
+
+
+def test_cursor_is_stable_under_inserts():
+    create_test_patients(4)
+
+    first = client.get("/patients/", params={"limit": 2})
+    cursor = first.headers["X-Next-Cursor"]
+    last_seen = first.json()[-1]["id"]
+
+    # Rows added after the first page do not shift the following page
+    create_test_patients(1)
+    second = client.get("/patients/", params={"limit": 2, "after": cursor})
+    assert [p["id"] for p in second.json()][0] > last_seen
+
+    # skip keeps working for existing clients
+    skipped = client.get("/patients/", params={"skip": 1, "limit": 1})
+    assert skipped.json()[0]["id"] == first.json()[1]["id"]
+
+
+def test_invalid_cursor_is_rejected():
+    for cursor in ["not-a-cursor", encode_cursor(1)[:-2] + "!!", "e30"]:
+        response = client.get("/doctors/", params={"after": cursor})
+        assert response.status_code == 400
+
+
+def test_cursor_query_seeks_primary_key():
+    statements, _ = capture_selects(
+        lambda db: crud.patients.get_patients(db, limit=10, after_id=1000)
+    )
+    assert statements
+    with engine.connect() as connection:
+        for statement in statements:
+            details = " ".join(explain(connection, statement))
+            assert "SEARCH patients USING INTEGER PRIMARY KEY" in details, details
+
+
+def run_pagination_tests():
+    """Run all pagination tests"""
+    print("\nRunning pagination tests...")
+    test_cursor_round_trip()
+    test_cursor_pages_cover_all_rows()
+    test_cursor_is_stable_under_inserts()
+    test_invalid_cursor_is_rejected()
+    test_cursor_query_seeks_primary_key()
+    print("All pagination tests passed!")
+
+
+if __name__ == "__main__":
+    run_pagination_tests()
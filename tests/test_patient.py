@@ -1,12 +1,14 @@
 from fastapi.testclient import TestClient
+import json
 import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.main import app
-from app.database import SessionLocal
-from app import models
+
+from app.database import SessionLocal, track_queries
+from app import bulk, models
 from app.auth_utils import get_password_hash
 
 # Create test client
@@ -162,6 +164,103 @@ def test_delete_patient():
     assert patient["is_active"] == False
 
 
+def test_bulk_create_patients():
+    create_test_doctor()
+    rows = [
+        {"first_name": "Bulk", "last_name": "One", "age": 40},
+        {"first_name": "Bulk"},
+        {"first_name": "Bulk", "last_name": "Three"},
+    ]
+
+    with track_queries(all_threads=True) as stats:
+        response = client.post(
+            "/patients/bulk",
+            json=rows,
+            params={"current_user_email": "testdoctor@hospital.com"},
+        )
+    inserts = [
+        statement
+        for statement in stats.statements.elements()
+        if statement.startswith("INSERT")
+    ]
+
+    assert response.status_code == 200
+    result = response.json()
+    print(f"Bulk result: {result}")
+    assert result["created"] == 2
+    assert result["ids"][1] is None
+    assert [error["index"] for error in result["errors"]] == [1]
+    assert result["errors"][0]["errors"][0]["loc"] == ["last_name"]
+    # Both valid rows go to the database as one statement shape, in one
+    # transaction; SQLite runs it once per row to keep ids in input order
+    assert len(set(inserts)) == 1
+    assert result["ids"][0] < result["ids"][2]
+
+    with SessionLocal() as db:
+        first = db.get(models.Patient, result["ids"][0])
+        assert (first.last_name, first.age, first.is_active) == ("One", 40, True)
+        assert db.get(models.Patient, result["ids"][2]).last_name == "Three"
+
+
+def test_bulk_create_patients_ndjson():
+    body = b'{"first_name": "Stream", "last_name": "One"}\nnot json\n\n'
+    body += b'{"first_name": "Stream", "last_name": "Two"}\n'
+    response = client.post(
+        "/patients/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created"] == 2
+    assert result["ids"][1] is None
+    assert result["errors"][0]["errors"][0]["type"] == "json_invalid"
+
+
+def test_bulk_create_patients_all_or_nothing():
+    with SessionLocal() as db:
+        before = db.query(models.Patient).count()
+
+    response = client.post(
+        "/patients/bulk",
+        json=[{"first_name": "Atomic", "last_name": "One"}, {"age": "old"}],
+        params={"all_or_nothing": True},
+    )
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["index"] == 1
+    with SessionLocal() as db:
+        assert db.query(models.Patient).count() == before
+
+    response = client.post("/patients/bulk", json={"first_name": "Not a list"})
+    assert response.status_code == 400
+
+
+def test_bulk_create_patients_rejects_oversized_body():
+    rows = [{"first_name": "Large", "last_name": "Batch"}] * 10
+    original = bulk.BULK_MAX_BYTES
+    bulk.BULK_MAX_BYTES = 64
+    try:
+        # Content-Length is checked before the body is read
+        response = client.post("/patients/bulk", json=rows)
+        assert response.status_code == 413
+
+        # Streamed bodies are counted as the chunks arrive
+        def chunks():
+            for row in rows:
+                yield (json.dumps(row) + "\n").encode()
+
+        response = client.post(
+            "/patients/bulk",
+            content=chunks(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 413
+    finally:
+        bulk.BULK_MAX_BYTES = original
+
+
 def run_patient_tests():
     print("Running patient management tests...\n")
 
@@ -180,6 +279,12 @@ def run_patient_tests():
     print("\n5. Testing deleting patient:")
     test_delete_patient()
 
+    print("\n6. Testing bulk patient creation:")
+    test_bulk_create_patients()
+    test_bulk_create_patients_ndjson()
+    test_bulk_create_patients_all_or_nothing()
+    test_bulk_create_patients_rejects_oversized_body()
+
     print("\nAll patient management tests completed successfully!")
 
 
@@ -0,0 +1,146 @@
+from fastapi.testclient import TestClient
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from app.main import app
+from app.database import SessionLocal, track_queries
+from app import crud, models, schemas
+from app.auth_utils import get_current_user_by_email
+from app.principal_cache import Principal, PrincipalCache, principal_cache
+from tests.test_treatment import create_test_admin, create_test_doctor
+
+# Create test client
+client = TestClient(app)
+
+
+def make_principal(user_id, email):
+    return Principal(
+        id=user_id, email=email, full_name="X", role="doctor", is_active=True
+    )
+
+
+def test_lru_eviction():
+    cache = PrincipalCache(maxsize=2, ttl=60)
+    cache.set(make_principal(1, "a@x.com"))
+    cache.set(make_principal(2, "b@x.com"))
+    assert cache.get("a@x.com") is not None  # a is now most recently used
+    cache.set(make_principal(3, "c@x.com"))
+
+    assert cache.get("b@x.com") is None
+    assert cache.get("a@x.com") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_ttl_expiry():
+    cache = PrincipalCache(maxsize=10, ttl=0.01)
+    cache.set(make_principal(1, "a@x.com"))
+    time.sleep(0.02)
+    assert cache.get("a@x.com") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_by_user_id():
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    cache.set(make_principal(1, "a@x.com"))
+    cache.invalidate(user_id=1)
+    assert cache.get("a@x.com") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_lookup_is_served_from_cache():
+    create_test_admin()
+    doctor = create_test_doctor()
+    principal_cache.clear()
+
+    with SessionLocal() as db:
+        first = get_current_user_by_email(db, "testdoctor@hospital.com")
+        hits = principal_cache.hits
+        second = get_current_user_by_email(db, "testdoctor@hospital.com")
+
+    assert second == first
+    assert principal_cache.hits == hits + 1
+    assert first.role == "doctor"
+    assert first.doctor_id == doctor.id
+    assert first.assistant_id is None
+
+
+def test_doctor_update_invalidates_entry():
+    doctor = create_test_doctor()
+    with SessionLocal() as db:
+        get_current_user_by_email(db, "testdoctor@hospital.com")
+    assert principal_cache.get("testdoctor@hospital.com") is not None
+
+    with SessionLocal() as db:
+        crud.doctors.update_doctor(db, doctor.id, schemas.DoctorUpdate(is_active=True))
+    assert principal_cache.get("testdoctor@hospital.com") is None
+
+    # Writes made directly through a session are picked up as well
+    with SessionLocal() as db:
+        get_current_user_by_email(db, "testdoctor@hospital.com")
+        user = (
+            db.query(models.User)
+            .filter(models.User.email == "testdoctor@hospital.com")
+            .first()
+        )
+        user_id, original_name = user.id, user.full_name
+        user.full_name = "Renamed Doctor"
+        db.commit()
+    assert principal_cache.get("testdoctor@hospital.com") is None
+
+    with SessionLocal() as db:
+        assert (
+            get_current_user_by_email(db, "testdoctor@hospital.com").full_name
+            == "Renamed Doctor"
+        )
+        user = db.get(models.User, user_id)
+        user.full_name = original_name
+        db.commit()
+
+
+def test_cache_stats_endpoint():
+    response = client.get("/health/caches")
+    assert response.status_code == 200
+    stats = response.json()["principals"]
+    assert {"hits", "misses", "evictions", "size"} <= set(stats)
+
+
+def test_principal_dependency_resolves_identity_in_one_query():
+    create_test_admin()
+    create_test_doctor()
+    principal_cache.clear()
+
+    with track_queries(all_threads=True) as stats:
+        response = client.get(
+            "/treatments/", params={"current_user_email": "testdoctor@hospital.com"}
+        )
+
+    assert response.status_code == 200
+    statements = list(stats.statements.elements())
+    identity_queries = [s for s in statements if "FROM users" in s]
+    assert len(identity_queries) == 1
+    assert "LEFT OUTER JOIN doctors" in identity_queries[0]
+    assert not any("FROM doctors" in s for s in statements)
+
+
+def run_principal_cache_tests():
+    """Run all principal cache tests"""
+    print("\nRunning principal cache tests...")
+    test_lru_eviction()
+    test_ttl_expiry()
+    test_invalidate_by_user_id()
+    test_lookup_is_served_from_cache()
+    test_doctor_update_invalidates_entry()
+    test_cache_stats_endpoint()
+    test_principal_dependency_resolves_identity_in_one_query()
+    print("All principal cache tests passed!")
+
+
+if __name__ == "__main__":
+    run_principal_cache_tests()
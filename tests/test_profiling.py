@@ -0,0 +1,114 @@
+from fastapi.testclient import TestClient
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anyio
+from app.main import app
+from app.profiling import RequestProfile, _active_profile
+from tests.test_treatment import create_test_admin, create_test_doctor
+
+# Create test client
+client = TestClient(app)
+
+ADMIN = {"current_user_email": "testadmin@hospital.com"}
+DOCTOR = {"current_user_email": "testdoctor@hospital.com"}
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_general_manager_can_profile_a_request():
+    create_test_admin()
+    plain = client.get("/patients/", params=ADMIN)
+    assert "X-Profile" not in plain.headers
+
+    response = client.get("/patients/", params={"profile": "1", **ADMIN})
+    assert response.status_code == 200
+    assert response.json() == plain.json()
+    location = response.headers["X-Profile"]
+    assert location.startswith("/profiles/")
+
+    profile = client.get(location, params=ADMIN).json()
+    assert profile["method"] == "GET" and profile["path"] == "/patients/"
+    assert profile["duration_ms"] > 0
+    assert "waiting" in profile["categories_ms"]
+    assert profile["tree"]["name"] == "request"
+
+    folded = client.get(location, params={"format": "folded", **ADMIN})
+    assert folded.headers["content-type"].startswith("text/plain")
+
+    # The header works as well as the query flag
+    response = client.get("/doctors/", params=ADMIN, headers={"X-Profile": "1"})
+    assert client.get(response.headers["X-Profile"], params=ADMIN).status_code == 200
+
+
+def test_profiling_is_general_manager_only():
+    create_test_admin()
+    create_test_doctor()
+    response = client.get("/patients/", params={"profile": "1", **DOCTOR})
+    assert response.status_code == 403
+    response = client.get("/patients/", params={"profile": "1"})
+    assert response.status_code == 403
+    response = client.get("/patients/", params={"profile": "0", **DOCTOR})
+    assert response.status_code == 200
+
+    location = client.get("/patients/", params={"profile": "1", **ADMIN}).headers[
+        "X-Profile"
+    ]
+    assert client.get(location, params=DOCTOR).status_code == 403
+    assert client.get("/profiles/" + "0" * 32, params=ADMIN).status_code == 404
+    assert client.get("/profiles/..%2Fsecret", params=ADMIN).status_code == 404
+
+
+def test_profile_only_samples_the_request():
+    stop = threading.Event()
+
+    def unrelated():
+        while not stop.is_set():
+            busy(0.001)
+
+    async def handle_request():
+        profile = RequestProfile(sys._getframe(), interval=0.001)
+        token = _active_profile.set(profile)
+        profile.start()
+        try:
+            # Work on the worker threads, as sync endpoints run
+            await anyio.to_thread.run_sync(busy, 0.1)
+        finally:
+            _active_profile.reset(token)
+            profile.stop()
+        return profile.report("GET", "/test")
+
+    other = threading.Thread(target=unrelated)
+    other.start()
+    try:
+        report = anyio.run(handle_request)
+    finally:
+        stop.set()
+        other.join()
+
+    assert report["samples"] > 0
+    stacks = [line.rsplit(" ", 1)[0] for line in report["folded"]]
+    assert any(stack.endswith("busy") for stack in stacks)
+    assert not any("unrelated" in stack for stack in stacks)
+    assert report["tree"]["children"][0]["name"].endswith(".busy")
+
+
+def run_profiling_tests():
+    """Run all request profiling tests"""
+    print("\nRunning profiling tests...")
+    test_general_manager_can_profile_a_request()
+    test_profiling_is_general_manager_only()
+    test_profile_only_samples_the_request()
+    print("All profiling tests passed!")
+
+
+if __name__ == "__main__":
+    run_profiling_tests()
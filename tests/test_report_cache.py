@@ -0,0 +1,262 @@
+from fastapi.testclient import TestClient
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.database import SessionLocal, engine, track_queries
+from app import models
+from app.report_cache import ReportCache, bump_table_versions, report_cache
+from tests.test_treatment import (
+    create_test_admin,
+    create_test_doctor,
+    create_test_patient,
+    create_test_assistant,
+)
+
+# Create test client
+client = TestClient(app)
+
+
+def test_hit_after_miss():
+    cache = ReportCache(maxsize=10, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    first = cache.get_or_compute("report", {"a": 1}, ["patients"], compute)
+    second = cache.get_or_compute("report", {"a": 1}, ["patients"], compute)
+    other = cache.get_or_compute("report", {"a": 2}, ["patients"], compute)
+
+    assert first == second == {"value": 1}
+    assert other == {"value": 2}
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["reports"]["report"]["computations"] == 2
+
+
+def test_table_write_invalidates():
+    cache = ReportCache(maxsize=10, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute("report", {}, ["patients"], compute) == 1
+    cache.invalidate_tables(["treatments"])  # not read by the report
+    assert cache.get_or_compute("report", {}, ["patients"], compute) == 1
+    cache.invalidate_tables(["patients"])
+    assert cache.get_or_compute("report", {}, ["patients"], compute) == 2
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_write_during_computation_is_not_cached():
+    cache = ReportCache(maxsize=10, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            cache.invalidate_tables(["patients"])
+        return len(calls)
+
+    assert cache.get_or_compute("report", {}, ["patients"], compute) == 1
+    assert cache.get_or_compute("report", {}, ["patients"], compute) == 2
+    assert cache.get_or_compute("report", {}, ["patients"], compute) == 2
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ReportCache(maxsize=10, ttl=60)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "report"
+
+    results = []
+
+    def request():
+        results.append(cache.get_or_compute("report", {}, ["patients"], compute))
+
+    leader = threading.Thread(target=request)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=request) for _ in range(8)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["report"] * 9
+    stats = cache.stats()["reports"]["report"]
+    assert stats["shared"] + stats["hits"] == 8
+    assert stats["hit_rate"] == round(8 / 9, 3)
+
+
+def test_failed_computation_is_not_cached():
+    cache = ReportCache(maxsize=10, ttl=60)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    for _ in range(2):
+        try:
+            cache.get_or_compute("report", {}, ["patients"], fail)
+            assert False, "expected the computation error"
+        except RuntimeError:
+            pass
+    assert cache.stats()["misses"] == 2
+    assert cache.get_or_compute("report", {}, ["patients"], lambda: 1) == 1
+
+
+def get_report():
+    response = client.get(
+        "/reports/doctors-patients",
+        params={
+            "include_patients": "false",
+            "current_user_email": "testadmin@hospital.com",
+        },
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def count_queries(fn):
+    """Run fn; return its result and the report queries it issued."""
+    with track_queries(all_threads=True) as stats:
+        result = fn()
+    return result, [s for s in stats.statements.elements() if "doctor_stats" in s]
+
+
+def test_report_endpoint_is_cached_until_a_write_commits():
+    create_test_admin()
+    doctor = create_test_doctor()
+    get_report()
+
+    report, queries = count_queries(get_report)
+    assert queries == []
+    before = report["statistics"]["patients_per_doctor"][str(doctor.id)]
+
+    # A rolled back write keeps the cached report
+    with SessionLocal() as db:
+        db.add(
+            models.Patient(
+                first_name="Cache", last_name="Rollback", doctor_id=doctor.id
+            )
+        )
+        db.flush()
+        db.rollback()
+    _, queries = count_queries(get_report)
+    assert queries == []
+
+    with SessionLocal() as db:
+        patient = models.Patient(
+            first_name="Cache", last_name="Test", doctor_id=doctor.id
+        )
+        db.add(patient)
+        db.commit()
+    try:
+        report, queries = count_queries(get_report)
+        assert len(queries) == 1
+        assert report["statistics"]["patients_per_doctor"][str(doctor.id)] == before + 1
+    finally:
+        with SessionLocal() as db:
+            db.delete(db.get(models.Patient, patient.id))
+            db.commit()
+
+    response = client.get("/health/caches")
+    assert response.status_code == 200
+    reports = response.json()["reports"]
+    assert reports["reports"]["doctors-patients"]["hits"] >= 2
+    assert "avg_compute_ms" in reports["reports"]["doctors-patients"]
+
+
+@contextmanager
+def shared_versions():
+    previous, report_cache.shared_versions = report_cache.shared_versions, True
+    try:
+        yield
+    finally:
+        report_cache.shared_versions = previous
+
+
+def test_write_from_another_worker_invalidates():
+    create_test_admin()
+    create_test_doctor()
+    with shared_versions():
+        get_report()
+        _, queries = count_queries(get_report)
+        assert queries == []
+
+        # Another worker's commit bumps only the shared versions, never this
+        # process's own counters
+        with engine.begin() as connection:
+            bump_table_versions(connection, ["doctor_stats"])
+        _, queries = count_queries(get_report)
+        assert len(queries) == 1
+        _, queries = count_queries(get_report)
+        assert queries == []
+
+
+def get_table_versions():
+    with SessionLocal() as db:
+        return dict(db.query(models.TableVersion.name, models.TableVersion.version))
+
+
+def test_only_report_tables_get_shared_versions():
+    create_test_doctor()
+    assistant = create_test_assistant()
+    patient = create_test_patient()
+    with shared_versions():
+        before = get_table_versions()
+        # No report reads patient assignments
+        with SessionLocal() as db, track_queries() as stats:
+            db.add(
+                models.PatientAssistant(
+                    patient_id=patient.id, assistant_id=assistant.id
+                )
+            )
+            db.commit()
+        assert not any("table_versions" in s for s in stats.statements)
+        assert get_table_versions() == before
+
+        with SessionLocal() as db:
+            db.query(models.PatientAssistant).filter(
+                models.PatientAssistant.patient_id == patient.id,
+                models.PatientAssistant.assistant_id == assistant.id,
+            ).delete()
+            db.get(models.Patient, patient.id).age = 99
+            db.commit()
+        after = get_table_versions()
+        assert after["patients"] == before.get("patients", 0) + 1
+        assert "patient_assistants" not in after
+
+
+def run_report_cache_tests():
+    """Run all report cache tests"""
+    print("\nRunning report cache tests...")
+    test_hit_after_miss()
+    test_table_write_invalidates()
+    test_write_during_computation_is_not_cached()
+    test_concurrent_misses_share_one_computation()
+    test_failed_computation_is_not_cached()
+    test_report_endpoint_is_cached_until_a_write_commits()
+    test_write_from_another_worker_invalidates()
+    test_only_report_tables_get_shared_versions()
+    print("All report cache tests passed!")
+
+
+if __name__ == "__main__":
+    run_report_cache_tests()
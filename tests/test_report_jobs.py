@@ -0,0 +1,190 @@
+from fastapi.testclient import TestClient
+from datetime import datetime, timedelta
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.database import SessionLocal
+from app import crud, models
+from app.report_jobs import ReportJobRunner, report_job_runner
+from tests.test_treatment import (
+    create_test_admin,
+    create_test_assistant,
+    create_test_doctor,
+    create_test_patient,
+)
+
+# Create test client
+client = TestClient(app)
+
+ADMIN = {"current_user_email": "testadmin@hospital.com"}
+
+
+def wait_for_job(job_id, params=ADMIN, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(f"/reports/jobs/{job_id}", params=params)
+        assert response.status_code == 200
+        job = response.json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_doctors_patients_job():
+    create_test_admin()
+    response = client.post(
+        "/reports/jobs",
+        params=ADMIN,
+        json={"report": "doctors-patients", "include_patients": False},
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["location"] == f"/reports/jobs/{job['id']}"
+    assert job["params"] == {"include_patients": False}
+
+    job = wait_for_job(job["id"])
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 100
+    assert job["result_url"] == f"/reports/jobs/{job['id']}/result"
+
+    result = client.get(job["result_url"], params=ADMIN)
+    assert result.status_code == 200
+    report = client.get(
+        "/reports/doctors-patients", params={"include_patients": False, **ADMIN}
+    )
+    assert result.json() == report.json()
+
+
+def test_patient_treatments_job_permissions():
+    create_test_admin()
+    doctor = create_test_doctor()
+    patient = create_test_patient(doctor_id=doctor.id)
+    create_test_assistant()
+
+    doctor_params = {"current_user_email": "testdoctor@hospital.com"}
+    response = client.post(
+        "/reports/jobs",
+        params=doctor_params,
+        json={"report": "patient-treatments", "patient_id": patient.id},
+    )
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["id"], params=doctor_params)
+    assert job["status"] == "succeeded"
+    assert isinstance(client.get(job["result_url"], params=doctor_params).json(), list)
+
+    # Other users cannot read it; general managers can
+    response = client.get(
+        f"/reports/jobs/{job['id']}",
+        params={"current_user_email": "testassistant@hospital.com"},
+    )
+    assert response.status_code == 403
+    assert client.get(f"/reports/jobs/{job['id']}", params=ADMIN).status_code == 200
+
+    response = client.post(
+        "/reports/jobs", params=doctor_params, json={"report": "doctors-patients"}
+    )
+    assert response.status_code == 403
+    response = client.post(
+        "/reports/jobs", params=ADMIN, json={"report": "patient-treatments"}
+    )
+    assert response.status_code == 422
+    assert client.get("/reports/jobs/999999", params=ADMIN).status_code == 404
+
+
+def test_jobs_resume_after_restart():
+    admin = create_test_admin()
+    with SessionLocal() as db:
+        # A job queued and one interrupted mid-run by a previous process
+        queued = crud.report_jobs.create_report_job(
+            db, "doctors-patients", {"include_patients": True}, admin.id
+        )
+        interrupted = crud.report_jobs.create_report_job(
+            db, "doctors-patients", {"include_patients": False}, admin.id
+        )
+        crud.report_jobs.claim_report_job(db, interrupted.id)
+        an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+        db.query(models.ReportJob).filter(models.ReportJob.id == interrupted.id).update(
+            {"started_at": an_hour_ago, "heartbeat_at": an_hour_ago}
+        )
+        db.commit()
+
+    resumed = report_job_runner.resume()
+    assert {queued.id, interrupted.id} <= set(resumed)
+    for job_id in (queued.id, interrupted.id):
+        assert wait_for_job(job_id)["status"] == "succeeded"
+
+
+def test_job_interrupted_just_before_restart_finishes():
+    admin = create_test_admin()
+    with SessionLocal() as db:
+        # Claimed by a process that died right away: its heartbeat is fresh
+        job = crud.report_jobs.create_report_job(
+            db, "doctors-patients", {"include_patients": False}, admin.id
+        )
+        crud.report_jobs.claim_report_job(db, job.id)
+
+    # The restarted process does not take the job over at startup ...
+    runner = ReportJobRunner(max_workers=1, stale_after=0.2, heartbeat_interval=0.05)
+    try:
+        assert job.id not in runner.resume()
+        assert wait_for_job(job.id, timeout=0)["status"] == "running"
+        # ... but its sweeper requeues it once the heartbeat goes stale
+        assert wait_for_job(job.id)["status"] == "succeeded"
+    finally:
+        runner.stop()
+
+
+def test_running_job_keeps_its_heartbeat():
+    runner = ReportJobRunner(max_workers=1, stale_after=0.2, heartbeat_interval=0.05)
+    admin = create_test_admin()
+    with SessionLocal() as db:
+        job = crud.report_jobs.create_report_job(
+            db, "doctors-patients", {"include_patients": False}, admin.id
+        )
+        crud.report_jobs.claim_report_job(db, job.id)
+    # Pretend this process is running it
+    runner._active.add(job.id)
+    try:
+        time.sleep(0.2)
+        runner.sweep()
+        with SessionLocal() as db:
+            assert crud.report_jobs.get_report_job(db, job.id).status == "running"
+    finally:
+        runner._active.discard(job.id)
+        with SessionLocal() as db:
+            db.delete(crud.report_jobs.get_report_job(db, job.id))
+            db.commit()
+
+
+def test_unfinished_job_has_no_result():
+    admin = create_test_admin()
+    with SessionLocal() as db:
+        job = crud.report_jobs.create_report_job(
+            db, "doctors-patients", {"include_patients": True}, admin.id
+        )
+    response = client.get(f"/reports/jobs/{job.id}/result", params=ADMIN)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Report job is queued, not succeeded"
+    with SessionLocal() as db:
+        db.delete(crud.report_jobs.get_report_job(db, job.id))
+        db.commit()
+
+
+def run_report_job_tests():
+    """Run all report job tests"""
+    print("\nRunning report job tests...")
+    test_doctors_patients_job()
+    test_patient_treatments_job_permissions()
+    test_jobs_resume_after_restart()
+    test_job_interrupted_just_before_restart_finishes()
+    test_running_job_keeps_its_heartbeat()
+    test_unfinished_job_has_no_result()
+    print("All report job tests passed!")
+
+
+if __name__ == "__main__":
+    run_report_job_tests()
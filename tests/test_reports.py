@@ -4,7 +4,13 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy.orm import selectinload
+
 from app.main import app
+from app.database import SessionLocal, engine, track_queries
+from app import models, crud, schemas
+from app.crud.base import unit_of_work
+from app.report_cache import report_cache
 from tests.test_treatment import (
     create_test_admin,
     create_test_doctor,
@@ -126,11 +132,325 @@ def test_patient_treatment_report():
     print("GM view of patient treatment report:", gm_data)
 
 
+def record_report_queries(**kwargs):
+    with SessionLocal() as db, track_queries() as stats:
+        crud.reports.get_doctor_patient_report(db, **kwargs)
+    return list(stats.statements.elements())
+
+
+def count_report_queries():
+    return len(record_report_queries())
+
+
+def test_doctor_patient_report_query_count_is_flat():
+    create_test_doctor()
+    baseline = count_report_queries()
+
+    # Add a few more doctors, each with a patient and a treatment
+    with SessionLocal() as db:
+        for i in range(3):
+            user = models.User(
+                email=f"reportload{i}@hospital.com",
+                hashed_password="x",
+                full_name=f"Report Load {i}",
+                role="doctor",
+                is_active=True,
+            )
+            doctor = models.Doctor(user=user, specialization="Load", experience=1)
+            patient = models.Patient(first_name="Load", last_name=str(i), doctor=doctor)
+            treatment = models.Treatment(name="Load", doctor=doctor, patient=patient)
+            db.add_all([user, doctor, patient, treatment])
+        db.commit()
+
+    try:
+        assert count_report_queries() == baseline
+    finally:
+        with SessionLocal() as db:
+            users = (
+                db.query(models.User)
+                .options(
+                    selectinload(models.User.doctor)
+                    .selectinload(models.Doctor.patients)
+                    .selectinload(models.Patient.treatments)
+                )
+                .filter(models.User.email.like("reportload%@hospital.com"))
+                .all()
+            )
+            for user in users:
+                doctor = user.doctor
+                for patient in doctor.patients:
+                    for treatment in patient.treatments:
+                        db.delete(treatment)
+                    db.delete(patient)
+                db.delete(doctor)
+                db.delete(user)
+            db.commit()
+
+
+def test_patient_treatment_report_pagination():
+    create_test_admin()
+    doctor = create_test_doctor()
+    patient = create_test_patient(doctor_id=doctor.id)
+
+    with SessionLocal() as db:
+        for i in range(3):
+            db.add(
+                models.Treatment(
+                    name=f"Paged Treatment {i}",
+                    doctor_id=doctor.id,
+                    patient_id=patient.id,
+                )
+            )
+        db.commit()
+
+    try:
+        full = client.get(
+            f"/reports/patients/{patient.id}/treatments",
+            params={"current_user_email": "testadmin@hospital.com"},
+        ).json()
+        assert len(full) >= 3
+        paged = [entry for entry in full if entry["name"].startswith("Paged")]
+        assert all(entry["prescribed_by"] != "Unknown" for entry in paged)
+
+        page = client.get(
+            f"/reports/patients/{patient.id}/treatments",
+            params={
+                "current_user_email": "testadmin@hospital.com",
+                "skip": 1,
+                "limit": 2,
+            },
+        ).json()
+        assert [entry["id"] for entry in page] == [entry["id"] for entry in full[1:3]]
+    finally:
+        with SessionLocal() as db:
+            db.query(models.Treatment).filter(
+                models.Treatment.name.like("Paged Treatment %")
+            ).delete(synchronize_session=False)
+            db.commit()
+
+
+def test_patient_treatment_report_caps_applications():
+    create_test_admin()
+    doctor = create_test_doctor()
+    patient = create_test_patient(doctor_id=doctor.id)
+    assistant = create_test_assistant()
+
+    with SessionLocal() as db:
+        treatment = models.Treatment(
+            name="Capped Treatment", doctor_id=doctor.id, patient_id=patient.id
+        )
+        db.add(treatment)
+        db.flush()
+        for i in range(3):
+            db.add(
+                models.TreatmentApplication(
+                    treatment_id=treatment.id,
+                    assistant_id=assistant.id,
+                    notes=f"Round {i}",
+                )
+            )
+        db.commit()
+
+    def get_entry(**params):
+        response = client.get(
+            f"/reports/patients/{patient.id}/treatments",
+            params={"current_user_email": "testadmin@hospital.com", **params},
+        )
+        assert response.status_code == 200
+        return next(e for e in response.json() if e["id"] == treatment.id)
+
+    try:
+        entry = get_entry()
+        assert entry["application_count"] == 3
+        assert [a["notes"] for a in entry["applications"]] == [
+            "Round 0",
+            "Round 1",
+            "Round 2",
+        ]
+
+        entry = get_entry(applications_limit=2)
+        assert entry["application_count"] == 3
+        assert [a["notes"] for a in entry["applications"]] == ["Round 0", "Round 1"]
+
+        entry = get_entry(applications_limit=0)
+        assert entry["application_count"] == 3
+        assert entry["applications"] == []
+
+        response = client.get(
+            f"/reports/patients/{patient.id}/treatments",
+            params={
+                "current_user_email": "testadmin@hospital.com",
+                "applications_limit": 5000,
+            },
+        )
+        assert response.status_code == 422
+    finally:
+        with SessionLocal() as db:
+            for application in db.query(models.TreatmentApplication).filter(
+                models.TreatmentApplication.treatment_id == treatment.id
+            ):
+                db.delete(application)
+            db.delete(db.get(models.Treatment, treatment.id))
+            db.commit()
+
+
+def get_stats(doctor_id):
+    with SessionLocal() as db:
+        row = db.get(models.DoctorStat, doctor_id)
+        return (row.is_active, row.active_patient_count, row.treatment_count)
+
+
+def test_doctor_stats_follow_writes():
+    with SessionLocal() as db:
+        user = models.User(
+            email="statsdoctor@hospital.com",
+            hashed_password="x",
+            full_name="Stats Doctor",
+            role="doctor",
+            is_active=True,
+        )
+        doctor = models.Doctor(user=user, specialization="Stats", experience=1)
+        patients = [
+            models.Patient(first_name="Stats", last_name=str(i), doctor=doctor)
+            for i in range(3)
+        ]
+        db.add_all([user, doctor, *patients])
+        db.commit()
+        doctor_id, patient_ids = doctor.id, [patient.id for patient in patients]
+
+    try:
+        assert get_stats(doctor_id) == (True, 3, 0)
+
+        with SessionLocal() as db:
+            crud.treatments.create_treatment(
+                db,
+                schemas.TreatmentCreate(name="Stats", patient_id=patient_ids[0]),
+                doctor_id,
+            )
+            crud.patients.delete_patient(db, patient_ids[1])
+        assert get_stats(doctor_id) == (True, 2, 1)
+
+        # A failed transaction leaves the counters untouched
+        with SessionLocal() as db:
+            try:
+                with unit_of_work(db):
+                    crud.patients.delete_patient(db, patient_ids[2])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        assert get_stats(doctor_id) == (True, 2, 1)
+
+        with SessionLocal() as db:
+            crud.doctors.update_doctor(
+                db, doctor_id, schemas.DoctorUpdate(is_active=False)
+            )
+        assert get_stats(doctor_id) == (False, 2, 1)
+        with SessionLocal() as db:
+            report = crud.reports.get_doctor_patient_report(db)
+        assert doctor_id not in [entry["id"] for entry in report["doctors"]]
+
+        with SessionLocal() as db:
+            crud.doctors.update_doctor(
+                db, doctor_id, schemas.DoctorUpdate(is_active=True)
+            )
+            db.query(models.Treatment).filter(
+                models.Treatment.doctor_id == doctor_id
+            ).delete(synchronize_session=False)
+            db.commit()
+        assert get_stats(doctor_id) == (True, 2, 0)
+
+        with SessionLocal() as db:
+            mismatches = crud.doctor_stats.check_doctor_stats(db)
+        assert [m for m in mismatches if m["doctor_id"] == doctor_id] == []
+    finally:
+        with SessionLocal() as db:
+            db.query(models.Treatment).filter(
+                models.Treatment.doctor_id == doctor_id
+            ).delete(synchronize_session=False)
+            db.query(models.Patient).filter(models.Patient.id.in_(patient_ids)).delete(
+                synchronize_session=False
+            )
+            db.query(models.Doctor).filter(models.Doctor.id == doctor_id).delete()
+            db.query(models.User).filter(
+                models.User.email == "statsdoctor@hospital.com"
+            ).delete()
+            db.commit()
+
+
+def test_doctor_stats_check_and_rebuild():
+    doctor = create_test_doctor()
+    with SessionLocal() as db:
+        # Simulate drift
+        db.query(models.DoctorStat).filter(
+            models.DoctorStat.doctor_id == doctor.id
+        ).update({"treatment_count": models.DoctorStat.treatment_count + 5})
+        db.commit()
+
+        mismatches = crud.doctor_stats.check_doctor_stats(db)
+        assert any(
+            m["doctor_id"] == doctor.id and m["field"] == "treatment_count"
+            for m in mismatches
+        )
+
+        crud.doctor_stats.rebuild_doctor_stats(db)
+        assert crud.doctor_stats.check_doctor_stats(db) == []
+
+
+def test_doctor_stats_backfilled_for_doctors_predating_the_table():
+    create_test_admin()
+    doctor = create_test_doctor()
+    stats_table = models.DoctorStat.__table__
+
+    # A database whose doctors were written before create_all added the table
+    stats_table.drop(engine)
+    stats_table.create(engine)
+    with SessionLocal() as db:
+        assert crud.doctor_stats.get_doctor_stats(db, active_only=False) == []
+
+        assert crud.doctor_stats.ensure_doctor_stats(db) > 0
+        assert crud.doctor_stats.check_doctor_stats(db) == []
+        # Populated tables are left alone
+        assert crud.doctor_stats.ensure_doctor_stats(db) == 0
+
+    report_cache.clear()
+    response = client.get(
+        "/reports/doctors-patients",
+        params={"current_user_email": "testadmin@hospital.com"},
+    )
+    assert response.status_code == 200
+    assert doctor.id in [entry["id"] for entry in response.json()["doctors"]]
+
+
+def test_doctor_patient_report_without_patients_reads_stats_only():
+    create_test_admin()
+    statements = record_report_queries(include_patients=False)
+    assert len(statements) == 1
+    assert "doctor_stats" in statements[0]
+    assert "FROM patients" not in statements[0]
+
+    response = client.get(
+        "/reports/doctors-patients",
+        params={
+            "include_patients": "false",
+            "current_user_email": "testadmin@hospital.com",
+        },
+    )
+    assert response.status_code == 200
+    assert all("patients" not in entry for entry in response.json()["doctors"])
+
+
 def run_report_tests():
     """Run all report tests"""
     print("\nRunning report tests...")
     test_doctor_patient_report()
     test_patient_treatment_report()
+    test_doctor_patient_report_query_count_is_flat()
+    test_patient_treatment_report_pagination()
+    test_patient_treatment_report_caps_applications()
+    test_doctor_stats_follow_writes()
+    test_doctor_stats_check_and_rebuild()
+    test_doctor_stats_backfilled_for_doctors_predating_the_table()
+    test_doctor_patient_report_without_patients_reads_stats_only()
     print("All report tests passed!")
 
 
@@ -0,0 +1,152 @@
+from fastapi.testclient import TestClient
+from datetime import datetime, timedelta, timezone
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.database import SessionLocal, track_queries
+from app import crud, models, schemas
+from tests.test_treatment import (
+    create_test_admin,
+    create_test_assistant,
+    create_test_doctor,
+    create_test_patient,
+)
+
+# Create test client
+client = TestClient(app)
+
+# A window no other test writes to
+WINDOW_START = datetime(2031, 3, 3)  # a Monday
+WINDOW_END = WINDOW_START + timedelta(days=14)
+
+
+def create_rollup_treatment():
+    doctor = create_test_doctor()
+    patient = create_test_patient(doctor_id=doctor.id)
+    with SessionLocal() as db:
+        treatment = models.Treatment(
+            name="Rollup", doctor_id=doctor.id, patient_id=patient.id
+        )
+        db.add(treatment)
+        db.commit()
+        return treatment
+
+
+def apply_at(db, treatment_id, assistant_id, when):
+    return crud.treatments.apply_treatment(
+        db,
+        schemas.TreatmentApplicationCreate(
+            treatment_id=treatment_id, application_date=when
+        ),
+        assistant_id,
+    )
+
+
+def rollup(**params):
+    with SessionLocal() as db:
+        return crud.rollups.get_application_rollup(
+            db, start=WINDOW_START, end=WINDOW_END, **params
+        )
+
+
+def test_application_date_is_stored():
+    treatment = create_rollup_treatment()
+    assistant = create_test_assistant()
+    when = datetime(2031, 1, 1, 9, 30, tzinfo=timezone(timedelta(hours=2)))
+
+    with SessionLocal() as db:
+        application = apply_at(db, treatment.id, assistant.id, when)
+        application_id = application.id
+
+    with SessionLocal() as db:
+        stored = db.get(models.TreatmentApplication, application_id)
+        # Stored as UTC
+        assert stored.application_date == datetime(2031, 1, 1, 7, 30)
+
+
+def test_rollup_counts_per_granularity():
+    treatment = create_rollup_treatment()
+    assistant = create_test_assistant()
+    times = [
+        WINDOW_START + timedelta(hours=8, minutes=5),
+        WINDOW_START + timedelta(hours=8, minutes=50),
+        WINDOW_START + timedelta(hours=9),
+        WINDOW_START + timedelta(days=1, hours=10),
+        WINDOW_START + timedelta(days=8),
+    ]
+    with SessionLocal() as db:
+        for when in times:
+            apply_at(db, treatment.id, assistant.id, when)
+
+    hourly = rollup(granularity="hour", treatment_id=treatment.id)
+    assert [bucket["count"] for bucket in hourly] == [2, 1, 1, 1]
+    assert hourly[0]["bucket_start"] == WINDOW_START + timedelta(hours=8)
+
+    daily = rollup(granularity="day", treatment_id=treatment.id)
+    assert [bucket["count"] for bucket in daily] == [3, 1, 1]
+
+    weekly = rollup(granularity="week", treatment_id=treatment.id)
+    assert [(b["bucket_start"], b["count"]) for b in weekly] == [
+        (WINDOW_START, 4),
+        (WINDOW_START + timedelta(days=7), 1),
+    ]
+
+    by_assistant = rollup(granularity="week", group_by="assistant")
+    assert {b["key"] for b in by_assistant} == {assistant.id}
+
+    # A rebuild from the raw rows gives the same answer
+    with SessionLocal() as db:
+        crud.rollups.rebuild_application_rollups(db)
+    assert rollup(granularity="hour", treatment_id=treatment.id) == hourly
+
+
+def test_rollup_endpoint_reads_aggregate_only():
+    create_test_admin()
+    treatment = create_rollup_treatment()
+
+    with track_queries(all_threads=True) as stats:
+        response = client.get(
+            "/reports/applications/rollup",
+            params={
+                "granularity": "day",
+                "group_by": "doctor",
+                "start": WINDOW_START.isoformat(),
+                "end": WINDOW_END.isoformat(),
+                "current_user_email": "testadmin@hospital.com",
+            },
+        )
+
+    assert response.status_code == 200
+    assert all(bucket["key"] == treatment.doctor_id for bucket in response.json())
+    assert not any("FROM treatment_applications" in s for s in stats.statements)
+
+    response = client.get(
+        "/reports/applications/rollup",
+        params={
+            "granularity": "month",
+            "current_user_email": "testadmin@hospital.com",
+        },
+    )
+    assert response.status_code == 422
+
+    response = client.get(
+        "/reports/applications/rollup",
+        params={"current_user_email": "testassistant@hospital.com"},
+    )
+    assert response.status_code == 403
+
+
+def run_rollup_tests():
+    """Run all application rollup tests"""
+    print("\nRunning rollup tests...")
+    test_application_date_is_stored()
+    test_rollup_counts_per_granularity()
+    test_rollup_endpoint_reads_aggregate_only()
+    print("All rollup tests passed!")
+
+
+if __name__ == "__main__":
+    run_rollup_tests()
@@ -0,0 +1,158 @@
+from fastapi.testclient import TestClient
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import manage
+from app.main import app
+from app.database import SessionLocal, track_queries
+from app import crud, models
+from app.crud.base import pwd_context
+
+# Create test client
+client = TestClient(app)
+
+
+def staff_rows(prefix, count):
+    rows = []
+    for i in range(count):
+        if i % 2 == 0:
+            rows.append(
+                {
+                    "role": "doctor",
+                    "email": f"{prefix}{i}@hospital.com",
+                    "full_name": f"Onboarded Doctor {i}",
+                    "password": f"secret{i}",
+                    "specialization": "Onboarding",
+                    "experience": i,
+                }
+            )
+        else:
+            rows.append(
+                {
+                    "role": "assistant",
+                    "email": f"{prefix}{i}@hospital.com",
+                    "full_name": f"Onboarded Assistant {i}",
+                    "password": f"secret{i}",
+                    "age": 20 + i,
+                    "specialization": "Onboarding",
+                }
+            )
+    return rows
+
+
+def cleanup_staff(prefix):
+    with SessionLocal() as db:
+        users = (
+            db.query(models.User)
+            .filter(models.User.email.like(f"{prefix}%@hospital.com"))
+            .all()
+        )
+        for user in users:
+            db.query(models.Doctor).filter(models.Doctor.user_id == user.id).delete()
+            db.query(models.Assistant).filter(
+                models.Assistant.user_id == user.id
+            ).delete()
+            db.delete(user)
+        db.commit()
+
+
+def test_bulk_onboarding():
+    cleanup_staff("onboard")
+    rows = staff_rows("onboard", 4)
+    # A repeat of an earlier email and a row with an unknown role
+    rows.append({**rows[0], "full_name": "Duplicate"})
+    rows.append({"role": "nurse", "email": "onboardnurse@hospital.com"})
+
+    with track_queries(all_threads=True) as stats:
+        response = client.post("/staff/bulk", json=rows)
+    user_selects = [
+        statement
+        for statement in stats.statements.elements()
+        if statement.startswith("SELECT") and "FROM users" in statement
+    ]
+
+    assert response.status_code == 200
+    result = response.json()
+    print(f"Onboarding result: {result}")
+    assert result["created"] == 4
+    assert result["ids"][4:] == [None, None]
+    assert [error["index"] for error in result["errors"]] == [4, 5]
+    assert result["errors"][0]["errors"][0]["type"] == "duplicate_email"
+    # Duplicate emails are found with a single IN query
+    assert len(user_selects) == 1
+
+    with SessionLocal() as db:
+        doctor = crud.doctors.get_doctor(db, result["ids"][0])
+        assert doctor.user.email == "onboard0@hospital.com"
+        assert doctor.user.role == "doctor"
+        assert pwd_context.verify("secret0", doctor.user.hashed_password)
+        assistant = crud.assistants.get_assistant(db, result["ids"][1])
+        assert (assistant.user.email, assistant.age) == ("onboard1@hospital.com", 21)
+
+    # Everything is now registered, so a retry creates nothing
+    response = client.post("/staff/bulk", json=rows[:4])
+    assert response.json()["created"] == 0
+    cleanup_staff("onboard")
+
+
+def test_bulk_onboarding_all_or_nothing():
+    cleanup_staff("atomic")
+    client.post("/staff/bulk", json=staff_rows("atomic", 1))
+
+    response = client.post(
+        "/staff/bulk",
+        json=staff_rows("atomic", 3),
+        params={"all_or_nothing": True},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["index"] == 0
+
+    with SessionLocal() as db:
+        count = (
+            db.query(models.User)
+            .filter(models.User.email.like("atomic%@hospital.com"))
+            .count()
+        )
+        assert count == 1
+    cleanup_staff("atomic")
+
+
+def test_onboarding_cli():
+    cleanup_staff("cli")
+    with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False) as f:
+        for row in staff_rows("cli", 3):
+            f.write(json.dumps(row) + "\n")
+
+    try:
+        assert manage.main(["onboard-staff", f.name, "--workers", "2"]) == 0
+        # Running it again reports every row as a duplicate
+        assert manage.main(["onboard-staff", f.name, "--workers", "2"]) == 1
+    finally:
+        os.unlink(f.name)
+
+    with SessionLocal() as db:
+        emails = {
+            email
+            for (email,) in db.query(models.User.email).filter(
+                models.User.email.like("cli%@hospital.com")
+            )
+        }
+        assert emails == {f"cli{i}@hospital.com" for i in range(3)}
+    cleanup_staff("cli")
+
+
+def run_staff_tests():
+    """Run all staff onboarding tests"""
+    print("\nRunning staff onboarding tests...")
+    test_bulk_onboarding()
+    test_bulk_onboarding_all_or_nothing()
+    test_onboarding_cli()
+    print("All staff onboarding tests passed!")
+
+
+if __name__ == "__main__":
+    run_staff_tests()
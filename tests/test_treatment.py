@@ -6,7 +6,8 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.main import app
-from app.database import SessionLocal
+
+from app.database import SessionLocal, track_queries
 from app import models
 from app.auth_utils import get_password_hash
 
@@ -426,6 +427,91 @@ def test_apply_treatment():
     return applied["id"]
 
 
+def test_apply_treatments_bulk():
+    doctor = create_test_doctor()
+    assistant = create_test_assistant()
+    assigned_patient = create_test_patient(doctor_id=doctor.id)
+
+    with SessionLocal() as db:
+        other_patient = models.Patient(
+            first_name="Unassigned", last_name="Patient", doctor_id=doctor.id
+        )
+        db.add(other_patient)
+        db.flush()
+        db.add(
+            models.PatientAssistant(
+                patient_id=assigned_patient.id,
+                assistant_id=assistant.id,
+                assigned_by_doctor_id=doctor.id,
+            )
+        )
+        assigned = models.Treatment(
+            name="Ward round", doctor_id=doctor.id, patient_id=assigned_patient.id
+        )
+        unassigned = models.Treatment(
+            name="Ward round", doctor_id=doctor.id, patient_id=other_patient.id
+        )
+        db.add_all([assigned, unassigned])
+        db.commit()
+        assigned_id, unassigned_id = assigned.id, unassigned.id
+
+    now = datetime.now().isoformat()
+    rows = [
+        {"treatment_id": assigned_id, "application_date": now, "notes": "Morning"},
+        {"treatment_id": assigned_id, "application_date": now, "notes": "Evening"},
+        {"treatment_id": unassigned_id, "application_date": now},
+        {"treatment_id": 10**9, "application_date": now},
+        {"application_date": now, "notes": "No treatment"},
+    ]
+
+    with track_queries(all_threads=True) as stats:
+        response = client.post(
+            "/assistants/treatments/apply/bulk",
+            json=rows,
+            params={"current_user_email": "testassistant@hospital.com"},
+        )
+    assignment_checks = [
+        statement
+        for statement in stats.statements.elements()
+        if statement.startswith("SELECT") and "patient_assistants" in statement
+    ]
+
+    assert response.status_code == 200
+    result = response.json()
+    print(f"Bulk application result: {result}")
+    assert result["created"] == 2
+    assert result["ids"][2:] == [None, None, None]
+    errors = {error["index"]: error["errors"][0] for error in result["errors"]}
+    assert errors[2]["type"] == "not_assigned"
+    assert errors[3]["type"] == "not_found"
+    assert errors[4]["loc"] == ["treatment_id"]
+    # All assignments are checked with one joined query
+    assert len(assignment_checks) == 1
+
+    with SessionLocal() as db:
+        application = db.get(models.TreatmentApplication, result["ids"][1])
+        assert application.notes == "Evening"
+        assert application.assistant_id == assistant.id
+
+    response = client.post(
+        "/assistants/treatments/apply/bulk",
+        json=rows[:3],
+        params={
+            "current_user_email": "testassistant@hospital.com",
+            "all_or_nothing": True,
+        },
+    )
+    assert response.status_code == 422
+
+    # Only assistants may record applications
+    response = client.post(
+        "/assistants/treatments/apply/bulk",
+        json=rows[:1],
+        params={"current_user_email": "testdoctor@hospital.com"},
+    )
+    assert response.status_code == 403
+
+
 def run_treatment_tests():
     print("Running treatment management tests...\n")
 
@@ -460,6 +546,9 @@ def run_treatment_tests():
     except Exception as e:
         print(f"Treatment application test failed: {e}")
 
+    print("\n9. Testing bulk treatment applications:")
+    test_apply_treatments_bulk()
+
     print("\nAll treatment management tests completed!")
 
 